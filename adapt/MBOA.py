@@ -1,9 +1,13 @@
 import sys
 import os
 sys.path.append(os.path.abspath("."))
+import time
+from collections import OrderedDict
 from copy import copy
 import numpy as np
-import GPy as GPy
+from eval_cache import EvalCache
+from adapt.gp import IncrementalGP
+from pymap_elites import archive_io
 
 
 def load_centroids(filename):
@@ -16,70 +20,209 @@ def load_map(filename, dim=6):
 	"""Loads the generated map
 	
 	Args:
-		filename: filename of map
+		filename: filename of map (text or binary, an up-to-date binary version of a text map is used instead)
 		dim: number of dimensions of map
 
 	Returns:
 		Fitness, descriptor and parameter values for every controller in the map
 	"""
 	# print("Loading ",filename)
-	data = np.loadtxt(filename)
-	fit = data[:, 0]
-	desc = data[:, 1:dim+1]
-	x = data[:, 2*dim+1:]
-	return fit, desc, x
+	data = archive_io.load_archive(archive_io.find_archive(filename), dim, mmap=False)
+	return data.fitness, data.centroid, data.x
+
+class MapHandle:
+	"""A map and its centroids loaded once and kept in memory as read-only arrays
+
+	Args:
+		map_filename: filename of map
+		centroids_filename: filename of the centroids of the map
+
+	Attributes:
+		data: every row of the map file (fitness, descriptor, centroid, parameters), built on first use
+		fits, descs, ctrls: fitness, descriptor and parameter values for every controller in the map
+			(memory-mapped columns of binary maps)
+		centroids: the CVT centroids
+	"""
+	def __init__(self, map_filename, centroids_filename):
+		self.map_filename = archive_io.find_archive(map_filename)
+		self.centroids_filename = centroids_filename
+		self.centroids = load_centroids(centroids_filename)
+		self.columns = archive_io.load_archive(self.map_filename, self.centroids.shape[1])
+		self.fits = self.columns.fitness
+		self.descs = self.columns.centroid
+		self.ctrls = self.columns.x
+		self.__data = None
+		# shared by every MBOA run on this map
+		for array in (self.centroids, self.fits, self.descs, self.ctrls):
+			array.setflags(write=False)
+
+	@property
+	def data(self):
+		if self.__data is None:
+			self.__data = self.columns.rows()
+			self.__data.setflags(write=False)
+		return self.__data
+
+class AdaptedMap:
+	"""The map with the fitness values adapted by MBOA, as an overlay on the original map
+
+	Only the adapted fitness vector is stored; indexing or converting it with np.asarray builds
+	the full array (same layout as the map file, with the adapted fitness in the first column).
+	"""
+	def __init__(self, handle, fits):
+		self.handle = handle
+		self.fits = fits
+
+	@property
+	def shape(self):
+		columns = self.handle.columns
+		return (len(columns), 1 + 2*columns.dim_map + columns.dim_x)
+
+	def __len__(self):
+		return len(self.handle.fits)
+
+	def __array__(self, dtype=None, copy=None):
+		data = self.handle.data.copy()
+		data[:, 0] = self.fits
+		return data if dtype is None else data.astype(dtype)
+
+	def __getitem__(self, key):
+		return np.asarray(self)[key]
+
+# number of maps kept in memory by open_map (the experiment sweeps cycle over 10 maps)
+MAP_CACHE_SIZE = 16
+__map_cache = OrderedDict()
+
+def open_map(map_filename, centroids_filename):
+	"""Returns a MapHandle for the map, from the process-level LRU cache of the last MAP_CACHE_SIZE maps used"""
+	key = (os.path.abspath(map_filename), os.path.abspath(centroids_filename))
+	if key in __map_cache:
+		__map_cache.move_to_end(key)
+		return __map_cache[key]
+	handle = MapHandle(map_filename, centroids_filename)
+	__map_cache[key] = handle
+	while len(__map_cache) > MAP_CACHE_SIZE:
+		__map_cache.popitem(last=False)
+	return handle
 
 def UCB(mu_map, kappa, sigma_map):
 	"""Upper confidence bound aquisition function for the bayesian optimization"""
-	GP = []
-	for i in range(0, len(mu_map)):
-		GP.append(mu_map[i] + kappa*sigma_map[i])
-	return np.argmax(GP)
+	return np.argmax(np.ravel(mu_map) + kappa*np.ravel(sigma_map))
 
+def select_batch(model, fits_saved, kappa, k, tested_indexes):
+	"""Batch UCB acquisition (kriging believer): picks k distinct untested niches, adding each pick
+	to a copy of the GP as if it had been observed at its predicted mean before picking the next
 
-def MBOA(map_filename, centroids_filename, eval, max_iter, rho=0.4, print_output=True):
+	Returns:
+		indexes of the niches to test
+	"""
+	fantasy = model.copy()
+	excluded = np.zeros(len(fits_saved), dtype=bool)
+	excluded[tested_indexes] = True
+	indexes = []
+	for _ in range(k):
+		ucb = fantasy.mean + fits_saved + kappa*fantasy.variance
+		ucb[excluded] = -np.inf
+		index = int(np.argmax(ucb))
+		if excluded[index]:
+			break
+		indexes.append(index)
+		excluded[index] = True
+		fantasy.add(fantasy.candidates[index], fantasy.mean[index])
+	return indexes
+
+def evaluate_controllers(eval, ctrls, pool=None, cache=None, cache_context={}):
+	"""Evaluates controllers, concurrently on pool if given, looking them up in cache first
+
+	Returns:
+		performance of every controller
+	"""
+	perfs, keys = [None]*len(ctrls), [None]*len(ctrls)
+	if cache is not None:
+		for i, ctrl in enumerate(ctrls):
+			keys[i] = EvalCache.key(ctrl, **cache_context)
+			cached = cache.get(keys[i])
+			if cached is not None:
+				perfs[i] = cached[0]
+	missing = [i for i in range(len(ctrls)) if perfs[i] is None]
+	if pool is not None and len(missing) > 1:
+		results = pool.map(eval, [ctrls[i] for i in missing])
+	else:
+		results = [eval(ctrls[i]) for i in missing]
+	for i, perf in zip(missing, results):
+		perfs[i] = perf
+		if cache is not None:
+			cache.put(keys[i], perf)
+	return perfs
+
+def MBOA(map_filename, centroids_filename, eval, max_iter, rho=0.4, print_output=True, cache=None, cache_context={}, gp="numpy",
+		batch_size=1, pool=None, return_info=False):
 	"""Implementation of Map-Based Bayseian Optimization Algorithm
+
+	Args:
+		map_filename: filename of the map, or a MapHandle (centroids_filename is then ignored)
+		centroids_filename: filename of the centroids of the map
+		max_iter: maximum number of trials (evaluations) - max_iter+1 in practice, as in the original implementation
+		gp: "numpy" to update the GP incrementally (adapt/gp.py), "gpy" to refit a GPy model every iteration
+		cache: EvalCache consulted before calling eval (optional)
+		cache_context: what else eval depends on (controller, failed_legs, duration...) - part of the cache key
+		batch_size: number of distinct controllers tested per iteration (see select_batch, needs gp="numpy")
+		pool: process pool (anything with a map method) evaluating the controllers of a batch concurrently
+		return_info: also return a dict with "iterations", "trials" and "wall_time" (seconds)
 	
 	Returns:
 		num_it: number of iterations taken to find a replacement controller
 		best_index: index of that controller in the map
 		best_perf: the best performance acheived
-		new_map: the new, adjusted map, reflecting the new expected fitness values given the damage/real world experience
+		new_map: the new, adjusted map, reflecting the new expected fitness values given the damage/real world experience (AdaptedMap)
 	"""
+	start_time = time.perf_counter()
 
 	alpha = 0.90
 	kappa = 0.05
 	variance_noise_square = 0.001
+	likelihood_variance = 1.0 # GPy's default Gaussian noise
 
 	dim_x = 6
 
 	num_it = 0
+	num_trials = 0
 	real_perfs, tested_indexes = [-1],[]
 	X, Y = np.empty((0, dim_x)), np.empty((0,1))
 
-	# load map and centroids
-	centroids = load_centroids(centroids_filename)
-	fits, descs, ctrls = load_map(map_filename, centroids.shape[1])
+	# load map and centroids (once per process, see open_map)
+	handle = map_filename if isinstance(map_filename, MapHandle) else open_map(map_filename, centroids_filename)
 
-	n_fits, n_descs, n_ctrls = np.array(fits), np.array(descs), np.array(ctrls)
+	n_fits, n_descs, n_ctrls = handle.fits, handle.descs, handle.ctrls
 
 	n_fits_real = copy(np.array(n_fits))
 	fits_saved = copy(n_fits)
 
 	started = False
+	if gp == "numpy":
+		# same model as the GPy one: Matern52 + White kernel, Gaussian likelihood
+		model = IncrementalGP(n_descs, lengthscale=rho, variance=1.0, noise_variance=np.sqrt(variance_noise_square) + likelihood_variance)
+	elif gp == "gpy":
+		import GPy as GPy
+		if batch_size > 1:
+			raise Exception("Batch acquisition needs the \"numpy\" GP backend")
+	else:
+		raise Exception("Invalid GP backend \"{}\" - use \"numpy\" or \"gpy\"".format(gp))
 
-	while((max(real_perfs) < alpha*max(n_fits_real)) and (num_it <= max_iter)):
+	while((max(real_perfs) < alpha*max(n_fits_real)) and (num_trials <= max_iter)):
 
 		if started:
-			#define GP kernel
-			kernel = GPy.kern.Matern52(dim_x, lengthscale=rho, ARD=False) + GPy.kern.White(dim_x, np.sqrt(variance_noise_square))
-			#define Gp which is here the difference between map perf and real perf
-			m = GPy.models.GPRegression(X, Y, kernel)
-			#predict means and variances for the difference btwn map perf and real perf
-			means, variances = m.predict(n_descs)
+			if gp == "numpy":
+				means, variances = model.mean, model.variance
+			else:
+				#define GP kernel
+				kernel = GPy.kern.Matern52(dim_x, lengthscale=rho, ARD=False) + GPy.kern.White(dim_x, np.sqrt(variance_noise_square))
+				#define Gp which is here the difference between map perf and real perf
+				m = GPy.models.GPRegression(X, Y, kernel)
+				#predict means and variances for the difference btwn map perf and real perf
+				means, variances = m.predict(n_descs)
 			#Add the predicted difference to the map found in simulation
-			for j in range(0, len(n_fits_real)):
-				n_fits_real[j] = means[j] + fits_saved[j]
+			n_fits_real = np.ravel(means) + fits_saved
 
 			#apply acquisition function to get next index to test
 			index_to_test = UCB(n_fits_real, kappa, variances)
@@ -93,35 +236,43 @@ def MBOA(map_filename, centroids_filename, eval, max_iter, rho=0.4, print_output
 			if print_output: print("Behaviour already tested")
 			break
 		else:
-			ctrl_to_test = n_ctrls[index_to_test]
-			tested_indexes.append(index_to_test)
+			indexes_to_test = [index_to_test]
+			if batch_size > 1:
+				# the first pick is the UCB maximum, the others are chosen by kriging believer
+				indexes_to_test = select_batch(model, fits_saved, kappa, min(batch_size, max_iter + 1 - num_trials), tested_indexes)
+			tested_indexes += indexes_to_test
 			
-			# eval the performance
-			real_perf = eval(ctrl_to_test)
-			if print_output: print("Real perf:", real_perf)
+			# eval the performance (unless it is in the evaluation cache)
+			new_perfs = evaluate_controllers(eval, n_ctrls[indexes_to_test], pool, cache, cache_context)
+			if print_output: print("Real perf:", new_perfs[0] if len(new_perfs) == 1 else new_perfs)
 		
 		num_it += 1
+		num_trials += len(indexes_to_test)
 
-		# add descriptor and real performance
-		X = np.append(X, n_descs[[index_to_test],:], axis=0)
-		Y = np.append(Y, (np.array(real_perf)-fits_saved[index_to_test]).reshape((1,1)), axis=0)
+		for index_tested, real_perf in zip(indexes_to_test, new_perfs):
+			# add descriptor and real performance
+			X = np.append(X, n_descs[[index_tested],:], axis=0)
+			Y = np.append(Y, (np.array(real_perf)-fits_saved[index_tested]).reshape((1,1)), axis=0)
+			if gp == "numpy":
+				model.add(n_descs[index_tested], Y[-1, 0])
 
-		#store
-		real_perfs.append(real_perf)
+			#store
+			real_perfs.append(real_perf)
 
-		# combine updated fitness values and reconstruct map
-		new_map = np.loadtxt(map_filename)
-		new_map[:,0] = n_fits_real
+		# updated fitness values of the map
+		adapted_fits = n_fits_real
 
-		
+	new_map = AdaptedMap(handle, adapted_fits)
 	o = np.argmax(real_perfs)
 	best_index = tested_indexes[o]
 	best_perf = real_perfs[o]
 
+	if return_info:
+		info = {"iterations": num_it, "trials": num_trials, "wall_time": time.perf_counter() - start_time}
+		return num_it, best_index, best_perf, new_map, info
 	return num_it, best_index, best_perf, new_map
 
 
-
 if __name__ == "__main__":
 	print("running main")
 	# np.savetxt("./experiments/sim/20000_niches/indexes_1.dat", num_its)
@@ -0,0 +1,86 @@
+"""Incremental Gaussian process used by MBOA
+
+MBOA keeps the kernel hyperparameters fixed and only ever adds one observation per iteration,
+so the GP does not need to be refitted: the Cholesky factor of the training covariance is
+extended by one row, and the posterior over the candidate points (the descriptors of the map)
+is updated with one more row of the whitened cross-covariance.
+
+With n observations and m candidates an iteration costs O(n^2 + n m) instead of the
+O(n^3 + n^2 m) of building and predicting with a new GPy model.
+"""
+import numpy as np
+from scipy.linalg import solve_triangular
+
+
+def matern52(X, X2, lengthscale=0.4, variance=1.0):
+	"""Matern 5/2 covariance between the rows of X and X2 (same parametrisation as GPy.kern.Matern52)"""
+	sq_dist = np.einsum('ij,ij->i', X, X)[:, None] - 2.0 * (X @ X2.T) + np.einsum('ij,ij->i', X2, X2)[None, :]
+	r = np.sqrt(5.0 * np.maximum(sq_dist, 0.0)) / lengthscale
+	return variance * (1.0 + r + r * r / 3.0) * np.exp(-r)
+
+
+class IncrementalGP:
+	"""Zero-mean GP with a Matern 5/2 kernel over a fixed set of candidate points
+
+	Args:
+		candidates: (m, dim) points where the posterior is maintained (the map descriptors)
+		lengthscale: kernel lengthscale
+		variance: kernel variance
+		noise_variance: observation noise, added to the training covariance and to the predicted variances
+
+	Attributes:
+		mean: (m,) posterior mean at the candidates
+		variance: (m,) posterior variance at the candidates (including the noise)
+	"""
+
+	def __init__(self, candidates, lengthscale=0.4, variance=1.0, noise_variance=0.0):
+		self.candidates = np.asarray(candidates, dtype=np.float64)
+		self.lengthscale = lengthscale
+		self.kernel_variance = variance
+		self.noise_variance = noise_variance
+		m = self.candidates.shape[0]
+		self.X = np.empty((0, self.candidates.shape[1]))
+		self.L = np.empty((0, 0)) # Cholesky factor of K(X, X) + noise I
+		self.white_y = np.empty(0) # L^-1 y
+		self.V = np.empty((0, m)) # L^-1 K(X, candidates)
+		self.mean = np.zeros(m)
+		self.variance = np.full(m, variance + noise_variance)
+
+	def __len__(self):
+		return self.X.shape[0]
+
+	def copy(self):
+		"""Independent copy of the GP (e.g. to add fantasy observations)"""
+		gp = IncrementalGP.__new__(IncrementalGP)
+		gp.__dict__.update({k: v.copy() if isinstance(v, np.ndarray) else v for k, v in self.__dict__.items()})
+		gp.candidates = self.candidates # never modified
+		return gp
+
+	def kernel(self, X, X2):
+		return matern52(X, X2, self.lengthscale, self.kernel_variance)
+
+	def add(self, x, y):
+		"""Adds one observation (rank-one extension of the Cholesky factor)
+
+		Args:
+			x: (dim,) input
+			y: observed value
+		"""
+		x = np.asarray(x, dtype=np.float64).reshape(1, -1)
+		n = len(self)
+		k = self.kernel(self.X, x)[:, 0]
+		l = solve_triangular(self.L, k, lower=True) if n > 0 else k
+		d = np.sqrt(max(self.kernel_variance + self.noise_variance - l @ l, 1e-12))
+		L = np.zeros((n + 1, n + 1))
+		L[:n, :n] = self.L
+		L[n, :n] = l
+		L[n, n] = d
+		self.L = L
+		self.X = np.vstack((self.X, x))
+		w = (float(y) - l @ self.white_y) / d
+		self.white_y = np.append(self.white_y, w)
+		# new row of L^-1 K(X, candidates)
+		v = (self.kernel(x, self.candidates)[0] - l @ self.V) / d
+		self.V = np.vstack((self.V, v))
+		self.mean += w * v
+		self.variance -= v * v
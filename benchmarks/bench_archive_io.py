@@ -0,0 +1,60 @@
+"""Benchmarks reading the maps: text files (np.loadtxt) vs the binary format of archive_io
+
+For each map size, times loading every map in text and binary form (converted to a temporary folder),
+both the whole map and only the fitness column (e.g. to find the best controller), and checks that
+both formats give the same values.
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -c      --controller            : which maps to use ("CPG"/"REF")
+    -k      --niches                : sizes of the maps in thousands of niches (default: 1 20 40)
+    -r      --repeats               : number of times every map is loaded (default: 3)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import glob
+import tempfile
+import time
+import numpy as np
+from pymap_elites import archive_io
+
+def best_time(f, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks reading text vs binary maps.')
+    parser.add_argument('-c','--controller', required=False, type=str, default="CPG", help='which maps to use ("CPG"/"REF")')
+    parser.add_argument('-k','--niches',     required=False, type=int, default=[1, 20, 40], nargs='+', help='sizes of the maps in thousands of niches')
+    parser.add_argument('-r','--repeats',    required=False, type=int, default=3, help='number of times every map is loaded')
+    args = parser.parse_args()
+
+    print(f"{'maps':<10}{'rows':>8}{'text':>10}{'binary':>10}{'fitness only':>14}{'speed-up':>10}{'size':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for niches in args.niches:
+            texts = sorted(glob.glob(os.path.join("maps", args.controller, f"{niches}k", "map_*.dat")))
+            if not texts:
+                continue
+            binaries = []
+            for text in texts:
+                binary = os.path.join(tmp, f"{niches}k_" + os.path.basename(text).replace(".dat", ".bin"))
+                a = archive_io.load_archive(text)
+                archive_io.save_archive(binary, a.fitness, a.centroid, a.desc, a.x)
+                assert np.array_equal(archive_io.load_rows(binary), np.loadtxt(text), equal_nan=True)
+                binaries.append(binary)
+            rows = sum(len(archive_io.load_archive(b)) for b in binaries)
+            t_text = best_time(lambda: [np.loadtxt(t) for t in texts], args.repeats)
+            t_binary = best_time(lambda: [archive_io.load_archive(b).rows() for b in binaries], args.repeats)
+            t_fitness = best_time(lambda: [archive_io.load_archive(b).fitness.max() for b in binaries], args.repeats)
+            size_text = sum(os.path.getsize(t) for t in texts) / 1e6
+            size_binary = sum(os.path.getsize(b) for b in binaries) / 1e6
+            print(f"{str(niches)+'k':<10}{rows:>8}{t_text*1000:>7.1f} ms{t_binary*1000:>7.1f} ms{t_fitness*1000:>11.1f} ms"
+                  f"{t_text/t_binary:>9.1f}x{size_text:>6.1f}/{size_binary:.1f} MB")
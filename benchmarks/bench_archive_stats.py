@@ -0,0 +1,51 @@
+"""Benchmarks the statistics written to the MAP-Elites log after every batch: a full pass over the
+archive (max, mean, median and percentiles of every elite's fitness) vs the running statistics
+of the archive, with the percentiles computed every log_percentile_period lines
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -k      --niches                : sizes of the map in thousands of niches (default: 20 40 200)
+    -p      --percentile_period     : log lines between two percentile computations (default: 10)
+    -r      --repeats               : number of log lines timed (default: 200)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import time
+import numpy as np
+from pymap_elites.archive import Archive
+
+def full_pass(archive):
+    fit_list = archive.fitness_values()
+    return fit_list.max(), np.mean(fit_list), np.median(fit_list), np.percentile(fit_list, 5), np.percentile(fit_list, 95)
+
+def running(archive, line, percentile_period):
+    stats = archive.stats()
+    if line % percentile_period == 0:
+        return stats, archive.percentiles()
+    return stats, None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the MAP-Elites log statistics.')
+    parser.add_argument('-k','--niches',            required=False, type=int, default=[20, 40, 200], nargs='+', help='sizes of the map in thousands of niches')
+    parser.add_argument('-p','--percentile_period', required=False, type=int, default=10, help='log lines between two percentile computations')
+    parser.add_argument('-r','--repeats',           required=False, type=int, default=200, help='number of log lines timed')
+    args = parser.parse_args()
+
+    print(f"{'niches':<10}{'full pass':>14}{'running':>14}{'speed-up':>10}")
+    for niches in args.niches:
+        n_niches = niches * 1000
+        archive = Archive(np.zeros((n_niches, 6)), 1)
+        archive.add_batch(np.arange(n_niches), np.zeros((n_niches, 1)), np.zeros((n_niches, 6)), np.random.rand(n_niches))
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            full_pass(archive)
+        t_full = (time.perf_counter() - start) / args.repeats
+        start = time.perf_counter()
+        for line in range(args.repeats):
+            running(archive, line, args.percentile_period)
+        t_running = (time.perf_counter() - start) / args.repeats
+        print(f"{str(niches)+'k':<10}{t_full*1e6:>11.1f} us{t_running*1e6:>11.1f} us{t_full/t_running:>9.1f}x")
@@ -0,0 +1,85 @@
+"""Benchmarks the checkpoints: Pickler (gzip pickle of the archive at every dump) vs Journal
+(periodic snapshot + journal of the elites changed by every batch)
+
+Fills an archive with random offspring batch after batch (the fitness of the offspring grows
+slowly so that elites keep being replaced, as in a real run), checkpoints it with both methods,
+and reports the bytes written and the time spent per batch, then the time to restore the last
+checkpoint (the Pickler's is up to dump_period - 1 batches behind, the Journal's is up to date).
+The Journal is timed with and without forcing every block to disk (fsync).
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -k      --niches                : size of the map in thousands of niches (default: 20)
+    -x      --dim_x                 : number of parameters of a genome (default: 156, CPG)
+    -b      --batch_size            : offspring per batch (default: 2390)
+    -n      --num_batches           : number of batches (default: 100)
+    -d      --dump_period           : batches between two dumps (default: 10)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import tempfile
+import time
+import numpy as np
+from pymap_elites.archive import Archive
+from pymap_elites.pickler import Pickler
+from pymap_elites.journal import Journal
+
+def run(checkpointer, batches, n_niches, dim_x, dump_period):
+    """Returns the time spent checkpointing (s), the final archive and number of evaluations"""
+    archive = Archive(np.zeros((n_niches, 6)), dim_x)
+    checkpointer.start(archive, 0, [], 6, n_niches)
+    elapsed = 0.0
+    for i, (niches, x, desc, fitness) in enumerate(batches):
+        changed = archive.add_batch(niches, x, desc, fitness)
+        n_evals = (i + 1) * len(niches)
+        start = time.perf_counter()
+        checkpointer.record(archive, changed, n_evals)
+        if (i + 1) % dump_period == 0:
+            checkpointer.save_checkpoint(archive, n_evals, [(z,) for z in x], 6, n_niches)
+        elapsed += time.perf_counter() - start
+    return elapsed, archive, n_evals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the Pickler and Journal checkpoints.')
+    parser.add_argument('-k','--niches',      required=False, type=int, default=20, help='size of the map in thousands of niches')
+    parser.add_argument('-x','--dim_x',       required=False, type=int, default=156, help='number of parameters of a genome')
+    parser.add_argument('-b','--batch_size',  required=False, type=int, default=2390, help='offspring per batch')
+    parser.add_argument('-n','--num_batches', required=False, type=int, default=100, help='number of batches')
+    parser.add_argument('-d','--dump_period', required=False, type=int, default=10, help='batches between two dumps')
+    args = parser.parse_args()
+
+    n_niches = args.niches * 1000
+    # the last batches stop one batch short of a dump so that the journal has blocks to replay
+    num_batches = args.num_batches - 1 if args.num_batches % args.dump_period == 0 else args.num_batches
+    rng = np.random.RandomState(0)
+    batches = [(rng.randint(n_niches, size=args.batch_size), rng.rand(args.batch_size, args.dim_x),
+                rng.rand(args.batch_size, 6), rng.rand(args.batch_size) + 0.005 * i) for i in range(num_batches)]
+
+    print(f"{n_niches} niches, {args.batch_size} offspring per batch, {num_batches} batches, dump every {args.dump_period}")
+    print(f"{'checkpoint':<18}{'MB written':>12}{'KB/batch':>10}{'ms/batch':>10}{'restore (s)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        prefix = os.path.join(tmp, "bench-")
+        for name, checkpointer in [("pickle", Pickler(prefix)), ("journal", Journal(prefix)), ("journal (no fsync)", Journal(prefix + "nofsync-", fsync=False))]:
+            elapsed, archive, n_evals = run(checkpointer, batches, n_niches, args.dim_x, args.dump_period)
+            if name == "pickle":
+                files = [os.path.join(tmp, f) for f in os.listdir(tmp) if f.endswith(".bu")]
+                written = sum(os.path.getsize(f) for f in files)
+                last = max(files, key=os.path.getmtime)
+                start = time.perf_counter()
+                restored = Pickler.restore_checkpoint(last)[0]
+                restore_time = time.perf_counter() - start
+                for f in files:
+                    os.remove(f)
+            else:
+                written = checkpointer.bytes_written
+                start = time.perf_counter()
+                restored, restored_evals = Journal.restore_checkpoint(checkpointer.base)[:2]
+                restored = Journal.replay(restored, Archive(np.zeros((n_niches, 6)), args.dim_x))
+                restore_time = time.perf_counter() - start
+                assert restored_evals == n_evals
+                assert np.array_equal(restored.niches(), archive.niches()) and np.array_equal(restored.x, archive.x)
+            print(f"{name:<18}{written/1e6:>12.1f}{written/1e3/num_batches:>10.1f}{elapsed*1000/num_batches:>10.2f}{restore_time:>13.3f}")
@@ -0,0 +1,48 @@
+"""Benchmarks the CVT construction algorithms and the CVT cache
+
+For every number of niches and algorithm, builds the CVT from the same uniform samples and
+reports the build time and the quantization error (mean squared distance of held-out uniform
+samples to their nearest centroid: lower is a better CVT), then the time to load the CVT and
+its niche index from a warm cache.
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -k      --niches                : numbers of niches in thousands (default: 20 40)
+    -s      --samples               : uniform samples clustered (default: 1000000)
+    -a      --algorithms            : CVT algorithms to compare (default: lloyd minibatch)
+    -i      --niche_index           : niche index cached with the CVT (default: kdtree)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import tempfile
+import time
+import numpy as np
+from scipy.spatial import cKDTree
+from pymap_elites import centroids
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the CVT construction and cache.')
+    parser.add_argument('-k','--niches',      required=False, type=int, default=[20, 40], nargs='+', help='numbers of niches in thousands')
+    parser.add_argument('-s','--samples',     required=False, type=int, default=1_000_000, help='uniform samples clustered')
+    parser.add_argument('-a','--algorithms',  required=False, type=str, default=["lloyd", "minibatch"], nargs='+', help='CVT algorithms to compare')
+    parser.add_argument('-i','--niche_index', required=False, type=str, default="kdtree", help='niche index cached with the CVT')
+    args = parser.parse_args()
+
+    test = np.random.RandomState(1).rand(200_000, 6)
+    # the cache of the benchmark must not mix with the real one
+    os.chdir(tempfile.mkdtemp())
+    print(f"{'niches':<10}{'algorithm':<12}{'build (s)':>11}{'error':>12}{'warm load (ms)':>16}")
+    for k in args.niches:
+        for algorithm in args.algorithms:
+            start = time.perf_counter()
+            c, _ = centroids.load_cvt(k * 1000, 6, args.samples, 0, algorithm, args.niche_index, use_cache=False)
+            build = time.perf_counter() - start
+            error = np.mean(cKDTree(c).query(test, workers=-1)[0] ** 2)
+            start = time.perf_counter()
+            centroids.load_cvt(k * 1000, 6, args.samples, 0, algorithm, args.niche_index)
+            warm = time.perf_counter() - start
+            print(f"{str(k)+'k':<10}{algorithm:<12}{build:>11.1f}{error:>12.6f}{warm*1000:>16.1f}", flush=True)
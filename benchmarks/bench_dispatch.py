@@ -0,0 +1,128 @@
+"""Benchmarks the dispatch of a generation of evaluations to the workers: one pickled (genome,
+fitness function) task per individual and a pickled Species back (original code) vs the genomes
+in shared memory, row ranges as tasks and the results in a shared matrix (pymap_elites/dispatch.py)
+
+Two measures per generation:
+    serialization   : time the master spends pickling the tasks and unpickling the results
+                      (original) or writing the genomes / reading the results (shared memory),
+                      and the bytes pickled in both directions
+    generation      : wall time of a generation through the process pool with a fitness function
+                      that does no work, i.e. the whole dispatch overhead
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -c      --controller            : genome size of this controller ("CPG"/"REF")
+    -b      --batch_size            : individuals per generation (default: 2390)
+    -et     --early_termination     : bind the early termination detectors to the fitness function (as generate_map -et)
+    -r      --repeats               : number of generations timed (default: 10)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import functools
+import multiprocessing
+import pickle
+import time
+import numpy as np
+import controller_tools
+from pymap_elites import common as cm
+from pymap_elites.dispatch import Dispatcher, task_sizes
+
+DIM_MAP = 6
+# tasks per message of the original Pool.map
+CHUNKSIZE = 10
+
+def no_work(x, duration=5, early_termination=[], incumbent_fitness=None, return_info=False):
+    """Stands in for the rollout: the dispatch overhead only"""
+    fitness, descriptor = float(x[0]), x[:DIM_MAP].copy()
+    if not return_info:
+        return fitness, descriptor
+    return fitness, descriptor, {"terminated_early": False, "reason": None, "descriptor_valid": True, "fitness_valid": True,
+        "steps": 0, "max_steps": 0}
+
+# the original task: evaluate a single vector (x) with a function f and return a species
+def evaluate_task(t):
+    z, f = t[0], t[1]
+    result = f(z, **t[2]) if len(t) > 2 else f(z)
+    info = result[2] if len(result) > 2 else None
+    return cm.Species(z, result[1], result[0], info=info)
+
+def make_tasks(genomes, f, bounded):
+    if bounded:
+        return [(z, f, {"incumbent_fitness": 0.0, "return_info": True}) for z in genomes]
+    return [(z, f) for z in genomes]
+
+def serialization_pickled(tasks):
+    """Master side of Pool.map(chunksize=10): pickles every chunk of tasks and unpickles every chunk of Species"""
+    chunks = [tasks[i:i + CHUNKSIZE] for i in range(0, len(tasks), CHUNKSIZE)]
+    replies = [pickle.dumps([evaluate_task(t) for t in chunk]) for chunk in chunks]
+    start = time.perf_counter()
+    sent = sum(len(pickle.dumps((evaluate_task, chunk))) for chunk in chunks)
+    for reply in replies:
+        pickle.loads(reply)
+    return time.perf_counter() - start, sent + sum(len(reply) for reply in replies)
+
+def serialization_shared(tasks, dispatcher):
+    """Master side of Dispatcher.evaluate: writes the genomes, pickles the row ranges, reads the results"""
+    n = len(tasks)
+    ends = np.cumsum(task_sizes(n, dispatcher.n_workers, None, dispatcher.params['task_duration']))
+    results = np.zeros((n, dispatcher.width))
+    replies = [pickle.dumps([0.1]) for _ in ends]
+    buffers = [(shm.name, shape) for shm, shape in dispatcher.shm]
+    start = time.perf_counter()
+    for i, t in enumerate(tasks):
+        dispatcher.genomes[i] = t[0]
+        if len(t) > 2:
+            dispatcher.incumbents[i] = t[2]["incumbent_fitness"]
+    ranges = [(buffers, 0, int(end - size), int(end), len(t) > 2) for end, size in zip(ends, np.diff(ends, prepend=0))]
+    sent = sum(len(pickle.dumps([task])) for task in ranges)
+    for reply in replies:
+        pickle.loads(reply)
+    results[:] = dispatcher.results[:n]
+    [cm.Species(t[0], row[1:1 + DIM_MAP], row[0]) for t, row in zip(tasks, results)]
+    return time.perf_counter() - start, sent + sum(len(reply) for reply in replies)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the dispatch of the evaluations.')
+    parser.add_argument('-c','--controller',         required=False, type=str, default="CPG", help='genome size of this controller ("CPG"/"REF")')
+    parser.add_argument('-b','--batch_size',         required=False, type=int, default=2390, help='individuals per generation')
+    parser.add_argument('-et','--early_termination', required=False, action='store_true', help='bind the early termination detectors to the fitness function')
+    parser.add_argument('-r','--repeats',            required=False, type=int, default=10, help='number of generations timed')
+    args = parser.parse_args()
+
+    if "CPG" not in args.controller and "REF" not in args.controller:
+        raise Exception("Invalid controller - use \"CPG\" or \"REF\"")
+    dim_x = 156 if args.controller == "CPG" else 32
+    f = no_work
+    if args.early_termination:
+        f = functools.partial(no_work, early_termination=[controller_tools.FlipDetector(), controller_tools.StallDetector()])
+    genomes = list(np.random.rand(args.batch_size, dim_x))
+    tasks = make_tasks(genomes, f, args.early_termination)
+    params = {**cm.default_params, "parallel": True}
+    dispatcher = Dispatcher([f], dim_x, DIM_MAP, params, capacity=args.batch_size)
+    pool = multiprocessing.Pool(dispatcher.n_workers)
+
+    timings = {"pickled": [], "shared": []}
+    for _ in range(args.repeats):
+        timings["pickled"].append(serialization_pickled(tasks))
+        timings["shared"].append(serialization_shared(tasks, dispatcher))
+    generation = {"pickled": [], "shared": []}
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        pool.map(evaluate_task, tasks, chunksize=CHUNKSIZE)
+        generation["pickled"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        dispatcher.evaluate(tasks)
+        generation["shared"].append(time.perf_counter() - start)
+    pool.terminate()
+    dispatcher.close()
+
+    print(f"{args.batch_size} individuals per generation, {dim_x} genes, {dispatcher.n_workers} workers")
+    print(f"{'dispatch':<16}{'serialization':>16}{'pickled':>14}{'generation':>14}")
+    for name in ["pickled", "shared"]:
+        t = np.median([s for s, _ in timings[name]])
+        size = timings[name][0][1]
+        print(f"{name:<16}{t*1e3:>13.2f} ms{size/1024:>11.1f} KB{np.median(generation[name])*1e3:>11.1f} ms")
@@ -0,0 +1,83 @@
+"""Benchmarks the generation time of each parallel backend (pymap_elites/executors.py) with tasks of
+10 rows (the original Pool.map chunksize) vs the adaptive task sizes of pymap_elites/dispatch.py
+
+Two workloads:
+    cheap       : evaluations that do no work (dispatch overhead only)
+    rollouts    : evaluations that wait like rollouts stopped early most of the time
+                  (--short s), and run the full duration otherwise (--long s, --long_fraction)
+The rollouts sleep, so the workers overlap even on a machine with fewer cores than workers.
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -e      --executors             : backends to compare (default: process socket)
+    -w      --num_workers           : workers per backend (default: 4)
+    -b      --batch_size            : individuals per generation (default: 2390)
+    -g      --generations           : generations timed per setting (default: 3)
+    -s      --short                 : duration of a rollout stopped early (s) (default: 0.0005)
+    -l      --long                  : duration of a full rollout (s) (default: 0.01)
+    -lf     --long_fraction         : fraction of full rollouts (default: 0.1)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import functools
+import time
+import numpy as np
+from pymap_elites import common as cm
+from pymap_elites import dispatch
+from pymap_elites.dispatch import Dispatcher
+
+DIM_X = 156
+DIM_MAP = 6
+FIXED_ROWS = 10
+
+def cheap(x):
+    return float(x[0]), x[:DIM_MAP].copy()
+
+def rollout(x, short=0.0005, long=0.01, long_fraction=0.1):
+    time.sleep(long if x[0] < long_fraction else short)
+    return float(x[0]), x[:DIM_MAP].copy()
+
+def time_generations(f, params, genomes, generations, fixed):
+    """Median generation time (s), after a first generation that measures the time per row"""
+    task_sizes = dispatch.task_sizes
+    if fixed:
+        dispatch.task_sizes = lambda n, n_workers, row_time, task_duration: [FIXED_ROWS] * (n // FIXED_ROWS) + [n % FIXED_ROWS] * (n % FIXED_ROWS > 0)
+    dispatcher = Dispatcher([f], DIM_X, DIM_MAP, params, capacity=len(genomes))
+    try:
+        tasks = [(x, f) for x in genomes]
+        dispatcher.evaluate(tasks)
+        times = []
+        for _ in range(generations):
+            start = time.perf_counter()
+            dispatcher.evaluate(tasks)
+            times.append(time.perf_counter() - start)
+        return np.median(times)
+    finally:
+        dispatcher.close()
+        dispatch.task_sizes = task_sizes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the parallel backends.')
+    parser.add_argument('-e','--executors',      required=False, type=str,   default=["process", "socket"], nargs='+', help='backends to compare')
+    parser.add_argument('-w','--num_workers',    required=False, type=int,   default=4, help='workers per backend')
+    parser.add_argument('-b','--batch_size',     required=False, type=int,   default=2390, help='individuals per generation')
+    parser.add_argument('-g','--generations',    required=False, type=int,   default=3, help='generations timed per setting')
+    parser.add_argument('-s','--short',          required=False, type=float, default=0.0005, help='duration of a rollout stopped early (s)')
+    parser.add_argument('-l','--long',           required=False, type=float, default=0.01, help='duration of a full rollout (s)')
+    parser.add_argument('-lf','--long_fraction', required=False, type=float, default=0.1, help='fraction of full rollouts')
+    args = parser.parse_args()
+
+    genomes = list(np.random.rand(args.batch_size, DIM_X))
+    workloads = {"cheap": cheap, "rollouts": functools.partial(rollout, short=args.short, long=args.long, long_fraction=args.long_fraction)}
+    print(f"{args.batch_size} individuals per generation, {args.num_workers} workers")
+    print(f"{'executor':<10}{'workload':<10}{'10 rows/task':>14}{'adaptive':>12}{'speed-up':>10}")
+    for executor in args.executors:
+        params = {**cm.default_params, "parallel": True, "executor": executor, "num_workers": args.num_workers}
+        for name, f in workloads.items():
+            fixed = time_generations(f, params, genomes, args.generations, True)
+            adaptive = time_generations(f, params, genomes, args.generations, False)
+            print(f"{executor:<10}{name:<10}{fixed*1e3:>11.1f} ms{adaptive*1e3:>9.1f} ms{fixed/adaptive:>9.1f}x")
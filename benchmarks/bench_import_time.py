@@ -0,0 +1,73 @@
+"""Benchmarks the import time of each entry point with python -X importtime, and lists the heavy
+packages (simulator, scientific and plotting libraries) each one loads
+
+    Entry point                 What is imported
+    _________________________   _____________________________________________________________
+    generate_map (master)       generate_map.py up to its argument parsing (run with --help)
+    generate_map (MPI worker)   what an mpi4py.futures worker runs: generate_map.py as a module
+                                and the worker side of the dispatch (pymap_elites/worker.py)
+    CPG / REF rollout           what a worker adds on its first rollout
+    MBOA                        adapt/MBOA.py
+    engine                      experiments/engine.py (run with --help)
+    plot_2d_map (load_data)     plots/maps/plot_2d_map.py as a module
+    convert_maps                convert_maps.py (run with --help)
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -r      --repeats               : runs per entry point, the median is reported (default: 5)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import subprocess
+import numpy as np
+
+HEAVY_PACKAGES = ["pybullet", "hexapod", "sklearn", "scipy", "GPy", "matplotlib", "mpi4py"]
+
+def run_path(script, argv=None, run_name="__main__"):
+    argv = [script] + (argv or [])
+    return "import runpy, sys; sys.argv = {!r}; runpy.run_path({!r}, run_name={!r})".format(argv, script, run_name)
+
+WORKER = run_path("generate_map.py", run_name="__worker__") + "; import pymap_elites.worker"
+ENTRY_POINTS = [
+    ("generate_map (master)", run_path("generate_map.py", ["--help"])),
+    ("generate_map (MPI worker)", WORKER),
+    ("CPG rollout", WORKER + "; import hexapod.simulator, hexapod.controllers.cpg_controller"),
+    ("REF rollout", WORKER + "; import hexapod.simulator, hexapod.controllers.reference_controller"),
+    ("MBOA", "import adapt.MBOA"),
+    ("engine", run_path("experiments/engine.py", ["--help"])),
+    ("plot_2d_map (load_data)", run_path("plots/maps/plot_2d_map.py", run_name="plot_2d_map")),
+    ("convert_maps", run_path("convert_maps.py", ["--help"])),
+]
+
+def import_time(code):
+    """Runs code with -X importtime
+
+    Returns:
+        total import time (s), names of the modules imported
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.abspath(".")] + os.environ.get("PYTHONPATH", "").split(os.pathsep)))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env, text=True)
+    total, modules = 0, []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        total += int(self_us)
+        modules.append(name.strip())
+    return total * 1e-6, modules
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the import time of the entry points.')
+    parser.add_argument('-r','--repeats', required=False, type=int, default=5, help='runs per entry point, the median is reported')
+    args = parser.parse_args()
+
+    print(f"{'entry point':<28}{'import time':>12}{'modules':>9}  heavy packages")
+    for name, code in ENTRY_POINTS:
+        runs = [import_time(code) for _ in range(args.repeats)]
+        modules = runs[0][1]
+        heavy = [p for p in HEAVY_PACKAGES if p in {m.split(".")[0] for m in modules}]
+        print(f"{name:<28}{np.median([t for t, _ in runs])*1e3:>9.1f} ms{len(modules):>9}  {' '.join(heavy) or '-'}")
@@ -0,0 +1,87 @@
+"""Speed and fidelity of the kinematic simulator (kinematic_simulator.py) against the pybullet
+Simulator: evaluates the top elites of a shipped map and random genomes with both
+
+    Column          Description
+    _____________   ___________________________________________________________________
+    ms/eval         median wall time of an evaluation (one core, cached simulator)
+    speed-up        of the kinematic simulator
+    rank corr.      Spearman correlation of the fitness rankings of the two simulators
+    |d desc|        mean absolute duty factor difference between the two simulators
+    collisions      fraction of the genomes whose evaluation ended in a collision (pybullet / kinematic)
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -c      --controller            : which controller to use ("CPG"/"REF")
+    -m      --map                   : map to take the elites from (default: maps/CPG/20k/map_1.dat)
+    -n      --num_evals             : number of top elites and of random genomes evaluated (default: 20)
+    -d      --duration              : simulated seconds per evaluation (default: 5)
+    -k      --kinematic_only        : only time the kinematic simulator (no pybullet needed)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import time
+import numpy as np
+import controller_tools
+from pymap_elites import archive_io
+
+def ranks(values):
+    return np.argsort(np.argsort(values))
+
+def evaluate_all(evaluate, genomes, **settings):
+    """Median time per evaluation, fitness, descriptors and collisions of the genomes"""
+    times, fitness, descriptors, collisions = [], [], [], []
+    for x in genomes:
+        start = time.perf_counter()
+        f, d, info = evaluate(x, return_info=True, **settings)
+        times.append(time.perf_counter() - start)
+        fitness.append(f)
+        descriptors.append(d)
+        collisions.append(info["reason"] == "collision")
+    return np.median(times), np.array(fitness), np.array(descriptors), np.array(collisions)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the kinematic simulator against pybullet.')
+    parser.add_argument('-c','--controller',      required=False, type=str,   default="CPG", help='which controller to use ("CPG"/"REF")')
+    parser.add_argument('-m','--map',             required=False, type=str,   default="maps/CPG/20k/map_1.dat", help='map to take the elites from')
+    parser.add_argument('-n','--num_evals',       required=False, type=int,   default=20, help='number of top elites and of random genomes evaluated')
+    parser.add_argument('-d','--duration',        required=False, type=float, default=5, help='simulated seconds per evaluation')
+    parser.add_argument('-k','--kinematic_only',  required=False, action='store_true', help='only time the kinematic simulator')
+    args = parser.parse_args()
+
+    if "CPG" not in args.controller and "REF" not in args.controller:
+        raise Exception("Invalid controller - use \"CPG\" or \"REF\"")
+    archive = archive_io.load_archive(archive_io.find_archive(args.map))
+    top = np.argsort(archive.fitness)[::-1][:args.num_evals]
+    elites = np.array(archive.x[top])
+    if args.controller == "CPG":
+        from hexapod.controllers.cpg_controller import CPGParameterHandlerMAPElites
+        elites = np.array([CPGParameterHandlerMAPElites.convert_non_mapelites_parameters(x) for x in elites])
+        evaluate = controller_tools.evaluate_gait_cpg
+    else:
+        evaluate = controller_tools.evaluate_gait_ref
+    settings = {"duration": args.duration, "collision_fatal": True}
+    sets = [("top elites", elites), ("random", np.random.rand(args.num_evals, elites.shape[1]))]
+
+    print(f"{args.num_evals} top elites of {args.map} and {args.num_evals} random genomes, {args.duration:g} s per evaluation")
+    if args.kinematic_only:
+        controller_tools.use_simulator("kinematic")
+        print(f"{'genomes':<12}{'ms/eval':>9}{'collisions':>12}")
+        for name, genomes in sets:
+            t, _, _, collisions = evaluate_all(evaluate, genomes, **settings)
+            print(f"{name:<12}{t*1e3:>9.2f}{collisions.mean():>12.2f}")
+        sys.exit()
+    print(f"{'genomes':<12}{'ms/eval':>20}{'speed-up':>10}{'rank corr.':>12}{'|d desc|':>10}{'collisions':>13}")
+    for name, genomes in sets:
+        controller_tools.use_simulator("pybullet")
+        physics = evaluate_all(evaluate, genomes, **settings)
+        controller_tools.use_simulator("kinematic")
+        kinematic = evaluate_all(evaluate, genomes, **settings)
+        corr = np.corrcoef(ranks(physics[1]), ranks(kinematic[1]))[0, 1] if len(genomes) > 1 else 1.0
+        d_desc = np.abs(physics[2] - kinematic[2]).mean()
+        times = f"{physics[0]*1e3:.1f} / {kinematic[0]*1e3:.2f}"
+        collisions = f"{physics[3].mean():.2f} / {kinematic[3].mean():.2f}"
+        print(f"{name:<12}{times:>20}{physics[0]/kinematic[0]:>9.0f}x{corr:>12.3f}{d_desc:>10.4f}{collisions:>13}")
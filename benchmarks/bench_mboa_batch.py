@@ -0,0 +1,57 @@
+"""Benchmarks batch MBOA: iterations, trials and wall-clock time to recovery vs the batch size
+
+Runs MBOA on the shipped maps with a simulated damage (the performance of a gait drops with its
+use of the failed leg) that takes a fixed time per trial, so the wall-clock time reflects
+rollouts running concurrently on the process pool.
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -k      --niches                : size of the CPG maps in thousands of niches (default: 20)
+    -nm     --num_maps              : number of maps to run MBOA on (default: 10)
+    -b      --batch_sizes           : batch sizes to compare (default: 1 2 4 8)
+    -t      --trial_time            : simulated seconds per trial (default: 0.1)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import functools
+import multiprocessing
+import time
+import numpy as np
+import adapt.MBOA as mboa
+
+def damaged_evaluation(ctrl, map_path, centroid_path, leg, trial_time):
+    """Fake damaged-robot evaluation: a gait loses the fraction of time its failed leg was on the ground"""
+    handle = mboa.open_map(map_path, centroid_path)
+    i = np.flatnonzero((handle.ctrls == ctrl).all(axis=1))[0]
+    time.sleep(trial_time)
+    return handle.fits[i] * (1.0 - handle.descs[i, leg])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks batch MBOA.')
+    parser.add_argument('-k','--niches',       required=False, type=int,   default=20, help='size of the CPG maps in thousands of niches')
+    parser.add_argument('-nm','--num_maps',    required=False, type=int,   default=10, help='number of maps to run MBOA on')
+    parser.add_argument('-b','--batch_sizes',  required=False, type=int,   default=[1, 2, 4, 8], nargs='+', help='batch sizes to compare')
+    parser.add_argument('-t','--trial_time',   required=False, type=float, default=0.1, help='simulated seconds per trial')
+    args = parser.parse_args()
+
+    centroid_path = os.path.join("centroids", f"centroids_{args.niches}000_6.dat")
+    map_paths = [os.path.join("maps", "CPG", f"{args.niches}k", f"map_{i}.dat") for i in range(1, args.num_maps+1)]
+
+    print(f"{'batch size':<12}{'iterations':>12}{'trials':>10}{'time (s)':>10}{'best perf':>11}")
+    with multiprocessing.Pool(max(args.batch_sizes)) as pool:
+        for batch_size in args.batch_sizes:
+            iterations, trials, times, perfs = [], [], [], []
+            for map_path in map_paths:
+                for leg in range(6):
+                    evaluate = functools.partial(damaged_evaluation, map_path=map_path, centroid_path=centroid_path, leg=leg, trial_time=args.trial_time)
+                    _, _, best_perf, _, info = mboa.MBOA(map_path, centroid_path, evaluate, max_iter=40, print_output=False,
+                        batch_size=batch_size, pool=pool, return_info=True)
+                    iterations.append(info["iterations"])
+                    trials.append(info["trials"])
+                    times.append(info["wall_time"])
+                    perfs.append(best_perf)
+            print(f"{batch_size:<12}{np.mean(iterations):>12.2f}{np.mean(trials):>10.2f}{np.mean(times):>10.3f}{np.mean(perfs):>11.3f}")
@@ -0,0 +1,95 @@
+"""Benchmarks the incremental NumPy GP of MBOA against refitting a GPy model every iteration
+
+First runs MBOA with both GP backends on the shipped maps, with a simulated damage (the
+performance of a gait drops with its use of the failed leg), and checks that both backends test
+the same gaits. Then times one iteration (add an observation, predict over every niche, UCB) of
+each backend for a growing number of observations, over the niches of a map or over random
+descriptors (-n).
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -c      --controller            : which maps to use ("CPG"/"REF")
+    -k      --niches                : size of the maps in thousands of niches (default: 20)
+    -nm     --num_maps              : number of maps to run MBOA on (default: 10)
+    -n      --num_descriptors       : time the GPs over this many random descriptors instead of a map (default: 0)
+    -i      --max_iter              : number of observations to time (default: 40)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import time
+import numpy as np
+import GPy
+import adapt.MBOA as mboa
+from adapt.gp import IncrementalGP
+
+def damaged_evaluation(fits, descs, ctrls, leg, tested):
+    """Fake damaged-robot evaluation: a gait loses the fraction of time its failed leg was on the ground"""
+    lookup = {ctrl.tobytes(): i for i, ctrl in enumerate(ctrls)}
+    def evaluate(ctrl):
+        i = lookup[np.asarray(ctrl).tobytes()]
+        tested.append(i)
+        return fits[i] * (1.0 - descs[i, leg])
+    return evaluate
+
+def time_gpy(descs, X, Y):
+    start = time.perf_counter()
+    kernel = GPy.kern.Matern52(6, lengthscale=0.4, ARD=False) + GPy.kern.White(6, np.sqrt(0.001))
+    m = GPy.models.GPRegression(X, Y, kernel)
+    means, variances = m.predict(descs)
+    mboa.UCB(means, 0.05, variances)
+    return time.perf_counter() - start
+
+def time_numpy(gp, x, y):
+    start = time.perf_counter()
+    gp.add(x, y)
+    mboa.UCB(gp.mean, 0.05, gp.variance)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the MBOA GP backends.')
+    parser.add_argument('-c','--controller',       required=False, type=str, default="CPG", help='which maps to use ("CPG"/"REF")')
+    parser.add_argument('-k','--niches',           required=False, type=int, default=20, help='size of the maps in thousands of niches')
+    parser.add_argument('-nm','--num_maps',        required=False, type=int, default=10, help='number of maps to run MBOA on')
+    parser.add_argument('-n','--num_descriptors',  required=False, type=int, default=0, help='time the GPs over this many random descriptors instead of a map')
+    parser.add_argument('-i','--max_iter',         required=False, type=int, default=40, help='number of observations to time')
+    args = parser.parse_args()
+
+    suffix = "" if args.controller == "CPG" else "_reference"
+    centroid_path = os.path.join("centroids", f"centroids_{args.niches}000_6{suffix}.dat")
+    map_paths = [os.path.join("maps", args.controller, f"{args.niches}k", f"map_{i}.dat") for i in range(1, args.num_maps+1)]
+
+    # same choices on the shipped maps
+    same, runs = 0, 0
+    for map_path in map_paths:
+        if not os.path.exists(map_path):
+            continue
+        fits, descs, ctrls = mboa.load_map(map_path)
+        for leg in range(6):
+            tested = {}
+            for gp in ["gpy", "numpy"]:
+                tested[gp] = []
+                mboa.MBOA(map_path, centroid_path, damaged_evaluation(fits, descs, ctrls, leg, tested[gp]), max_iter=40, print_output=False, gp=gp)
+            same += tested["gpy"] == tested["numpy"]
+            runs += 1
+    print(f"same gaits tested by both backends: {same}/{runs} MBOA runs\n")
+
+    # latency of one iteration
+    if args.num_descriptors > 0:
+        descs = np.random.rand(args.num_descriptors, 6)
+    else:
+        descs = mboa.load_map(map_paths[0])[1]
+    rng = np.random.RandomState(0)
+    observed = rng.choice(len(descs), size=min(args.max_iter, len(descs)), replace=False)
+    X, Y = descs[observed], rng.randn(len(observed), 1)
+    gp = IncrementalGP(descs, lengthscale=0.4, variance=1.0, noise_variance=np.sqrt(0.001) + 1.0)
+    print(f"{len(descs)} descriptors")
+    print(f"{'observations':<14}{'GPy refit':>14}{'incremental':>14}{'speed-up':>10}")
+    for n in range(1, len(observed) + 1):
+        t_gpy = time_gpy(descs, X[:n], Y[:n])
+        t_numpy = time_numpy(gp, X[n-1], Y[n-1, 0])
+        if n == 1 or n % 10 == 0 or n == len(observed):
+            print(f"{n:<14}{t_gpy*1000:>11.2f} ms{t_numpy*1000:>11.2f} ms{t_gpy/t_numpy:>9.1f}x")
@@ -0,0 +1,55 @@
+"""Benchmarks the niche indexes used to insert a batch of individuals into a CVT archive
+
+Compares the original per-individual sklearn KDTree queries against a single batched
+query with each index in pymap_elites/niche_index.py, on the shipped centroids.
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -c      --centroids             : centroid file (default: centroids/centroids_20000_6.dat)
+    -b      --batch_size            : number of descriptors per batch (default: 2390)
+    -r      --repeats               : number of timed batches per index (default: 5)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import time
+import numpy as np
+from pymap_elites.niche_index import make_niche_index, NICHE_INDEXES
+
+def best_time(fn, repeats):
+    """Best wall-clock time of `repeats` calls to fn"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the niche indexes.')
+    parser.add_argument('-c','--centroids',  required=False, type=str, default=os.path.join("centroids", "centroids_20000_6.dat"), help='centroid file')
+    parser.add_argument('-b','--batch_size', required=False, type=int, default=2390, help='number of descriptors per batch')
+    parser.add_argument('-r','--repeats',    required=False, type=int, default=5, help='number of timed batches per index')
+    args = parser.parse_args()
+
+    centroids = np.loadtxt(args.centroids)
+    descs = np.random.rand(args.batch_size, centroids.shape[1])
+    print(f"{centroids.shape[0]} niches, {centroids.shape[1]}-D, batch of {args.batch_size}\n")
+
+    # original behaviour: one sklearn query per individual
+    kdtree = make_niche_index(centroids, "kdtree")
+    reference = kdtree.query(descs)
+    t = best_time(lambda: [kdtree.kdt.query([d], k=1) for d in descs], max(1, args.repeats // 5))
+    print(f"{'kdtree (per individual)':<26}{'-':>12}{t*1000:>12.1f} ms/batch")
+
+    print(f"{'index':<26}{'build':>12}{'query':>21}{'matches':>10}")
+    for kind in NICHE_INDEXES:
+        start = time.perf_counter()
+        index = make_niche_index(centroids, kind)
+        build = time.perf_counter() - start
+        t = best_time(lambda: index.query(descs), args.repeats)
+        matches = np.mean(index.query(descs) == reference) * 100
+        print(f"{kind:<26}{build*1000:>9.1f} ms{t*1000:>12.1f} ms/batch{matches:>9.1f}%")
@@ -0,0 +1,78 @@
+"""Accuracy vs speed of the evaluation rates: re-evaluates the top elites of a shipped map at each
+(physics rate, control period, contact sample period) setting and compares the fitness and
+descriptors with those of the first setting (the original 240 Hz physics, control and contacts)
+
+    Column          Description
+    _____________   ___________________________________________________________________
+    ms/eval         median wall time of an evaluation (one core, cached simulator)
+    speed-up        against the first setting
+    |d fitness|     mean (max) absolute fitness difference to the first setting (m)
+    |d desc|        mean (max) absolute duty factor difference to the first setting
+    rank corr.      Spearman correlation of the fitness ranking of the elites with the first setting
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -c      --controller            : which controller to use ("CPG"/"REF")
+    -m      --map                   : map to take the elites from (default: maps/CPG/20k/map_1.dat)
+    -n      --num_elites            : number of top elites re-evaluated (default: 20)
+    -s      --settings              : physics_rate:control_period:contact_sample_period settings
+                                      (default: 240:1:1 240:2:1 240:4:1 240:1:4 240:4:4 120:1:1 120:2:2 60:1:1)
+    -d      --duration              : simulated seconds per evaluation (default: 5)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import time
+import numpy as np
+import controller_tools
+from pymap_elites import archive_io
+
+def ranks(values):
+    return np.argsort(np.argsort(values))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the accuracy vs speed of the evaluation rates.')
+    parser.add_argument('-c','--controller', required=False, type=str,   default="CPG", help='which controller to use ("CPG"/"REF")')
+    parser.add_argument('-m','--map',        required=False, type=str,   default="maps/CPG/20k/map_1.dat", help='map to take the elites from')
+    parser.add_argument('-n','--num_elites', required=False, type=int,   default=20, help='number of top elites re-evaluated')
+    parser.add_argument('-s','--settings',   required=False, type=str,   default=["240:1:1", "240:2:1", "240:4:1", "240:1:4", "240:4:4", "120:1:1", "120:2:2", "60:1:1"],
+                        nargs='+', help='physics_rate:control_period:contact_sample_period settings')
+    parser.add_argument('-d','--duration',   required=False, type=float, default=5, help='simulated seconds per evaluation')
+    args = parser.parse_args()
+
+    if "CPG" not in args.controller and "REF" not in args.controller:
+        raise Exception("Invalid controller - use \"CPG\" or \"REF\"")
+    archive = archive_io.load_archive(archive_io.find_archive(args.map))
+    top = np.argsort(archive.fitness)[::-1][:args.num_elites]
+    genomes = np.array(archive.x[top])
+    if args.controller == "CPG":
+        from hexapod.controllers.cpg_controller import CPGParameterHandlerMAPElites
+        genomes = np.array([CPGParameterHandlerMAPElites.convert_non_mapelites_parameters(x) for x in genomes])
+        evaluate = controller_tools.evaluate_gait_cpg
+    else:
+        evaluate = controller_tools.evaluate_gait_ref
+
+    results = []
+    for setting in args.settings:
+        physics_rate, control_period, contact_sample_period = (int(v) for v in setting.split(":"))
+        times, fitness, descriptors = [], [], []
+        for x in genomes:
+            start = time.perf_counter()
+            f, d = evaluate(x, duration=args.duration, collision_fatal=False, physics_rate=physics_rate,
+                control_period=control_period, contact_sample_period=contact_sample_period)
+            times.append(time.perf_counter() - start)
+            fitness.append(f)
+            descriptors.append(d)
+        results.append((setting, np.median(times), np.array(fitness), np.array(descriptors)))
+
+    print(f"top {len(genomes)} elites of {args.map}, {args.duration:g} s per evaluation")
+    print(f"{'setting':<12}{'ms/eval':>9}{'speed-up':>10}{'|d fitness|':>21}{'|d desc|':>19}{'rank corr.':>12}")
+    _, base_time, base_fitness, base_descriptors = results[0]
+    for setting, t, fitness, descriptors in results:
+        d_fitness = np.abs(fitness - base_fitness)
+        d_desc = np.abs(descriptors - base_descriptors)
+        corr = np.corrcoef(ranks(fitness), ranks(base_fitness))[0, 1] if len(genomes) > 1 else 1.0
+        print(f"{setting:<12}{t*1e3:>9.1f}{base_time/t:>9.2f}x{d_fitness.mean():>11.4f} ({d_fitness.max():.4f}){d_desc.mean():>9.4f} ({d_desc.max():.4f}){corr:>12.3f}")
@@ -0,0 +1,41 @@
+"""Benchmarks gait evaluations per second on one core, with and without the per-process simulator cache
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -c      --controller            : which controller to use ("CPG"/"REF")
+    -n      --num_evals             : number of random genomes to evaluate per setting (default: 20)
+    -d      --duration              : simulated seconds per evaluation (default: 5)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import time
+import numpy as np
+import controller_tools
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the simulator cache.')
+    parser.add_argument('-c','--controller', required=False, type=str,   default="CPG", help='which controller to use ("CPG"/"REF")')
+    parser.add_argument('-n','--num_evals',  required=False, type=int,   default=20, help='number of random genomes to evaluate per setting')
+    parser.add_argument('-d','--duration',   required=False, type=float, default=5, help='simulated seconds per evaluation')
+    args = parser.parse_args()
+
+    if "CPG" not in args.controller and "REF" not in args.controller:
+        raise Exception("Invalid controller - use \"CPG\" or \"REF\"")
+    evaluate = controller_tools.evaluate_gait_cpg if args.controller == "CPG" else controller_tools.evaluate_gait_ref
+    genomes = np.random.rand(args.num_evals, 156 if args.controller == "CPG" else 32)
+
+    results = {}
+    for reuse in [False, True]:
+        controller_tools.REUSE_SIMULATOR = reuse
+        controller_tools.SIMULATOR_CACHE.clear()
+        start = time.perf_counter()
+        results[reuse] = [evaluate(x, duration=args.duration) for x in genomes]
+        elapsed = time.perf_counter() - start
+        print(f"{'reset cached simulator' if reuse else 'new simulator per genome':<26}{args.num_evals/elapsed:>8.2f} evals/s/core")
+
+    same = all(np.isclose(a[0], b[0]) and np.allclose(a[1], b[1]) for a, b in zip(results[False], results[True]))
+    print("identical fitness/descriptors:", same)
@@ -0,0 +1,85 @@
+"""Surrogate-assisted MAP-Elites vs plain MAP-Elites: coverage and QD-score of the archive against
+the number of real evaluations (see pymap_elites/surrogate.py)
+
+Both runs evolve a small CPG map with the same number of real evaluations, on the kinematic
+simulator (kinematic_simulator.py) so that the comparison takes minutes on one core. The
+surrogate run scores surrogate_pool candidate offspring per evaluation and only evaluates the
+most promising and the most uncertain ones. The statistics are those of the binary log of each run
+(pymap_elites/stats_log.py), one line per batch.
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -ne     --num_evals             : real evaluations per run (default: 6000)
+    -m      --map_size              : niches of the map (default: 200)
+    -b      --batch_size            : evaluations per generation (default: 200)
+    -sp     --surrogate_pool        : candidate offspring scored per evaluation (default: 4)
+    -se     --surrogate_explore     : share of the evaluations given to the most uncertain candidates (default: 0.25)
+    -s      --seed                  : seed of both runs (default: 0)
+    -p      --print_every           : print every this many log lines (default: 5)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import random
+import tempfile
+import time
+import numpy as np
+import controller_tools
+from pymap_elites import cvt
+from pymap_elites import common as cm
+from pymap_elites.stats_log import read_stats
+
+def run(params, num_evals, map_size, seed, surrogate):
+    """Evolves a map, returns its statistics log and wall time"""
+    np.random.seed(seed)
+    random.seed(seed)
+    params = {**params, "surrogate": surrogate}
+    start = time.perf_counter()
+    cvt.compute(6, 156, controller_tools.evaluate_gait_cpg, n_niches=map_size, max_evals=num_evals, params=params,
+        stats_file="stats.bin", checkpoint_filenameprefix="bench-")
+    return read_stats("stats.bin"), time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks surrogate-assisted MAP-Elites against plain MAP-Elites.')
+    parser.add_argument('-ne','--num_evals',         required=False, type=int,   default=6000, help='real evaluations per run')
+    parser.add_argument('-m','--map_size',           required=False, type=int,   default=200, help='niches of the map')
+    parser.add_argument('-b','--batch_size',         required=False, type=int,   default=200, help='evaluations per generation')
+    parser.add_argument('-sp','--surrogate_pool',    required=False, type=int,   default=4, help='candidate offspring scored per evaluation')
+    parser.add_argument('-se','--surrogate_explore', required=False, type=float, default=0.25, help='share of the evaluations given to the most uncertain candidates')
+    parser.add_argument('-s','--seed',               required=False, type=int,   default=0, help='seed of both runs')
+    parser.add_argument('-p','--print_every',        required=False, type=int,   default=5, help='print every this many log lines')
+    args = parser.parse_args()
+
+    controller_tools.use_simulator("kinematic")
+    params = {
+        "cvt_samples": 20000,
+        "cvt_seed": args.seed,
+        "batch_size": args.batch_size,
+        "random_init_batch": args.batch_size,
+        "dump_period": -1,
+        "parallel": False,
+        "executor": "serial",
+        "surrogate_pool": args.surrogate_pool,
+        "surrogate_explore": args.surrogate_explore,
+        # refitted after every batch: the run is reproducible and the model is always up to date
+        "surrogate_background": False,
+        "surrogate_seed": args.seed,
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        plain, plain_time = run(params, args.num_evals, args.map_size, args.seed, False)
+        assisted, assisted_time = run(params, args.num_evals, args.map_size, args.seed, True)
+
+    print(f"{args.map_size} niches, {args.num_evals} real evaluations in batches of {args.batch_size}, "
+          f"surrogate pool {args.surrogate_pool}, explore {args.surrogate_explore:g}")
+    print(f"{'evals':>8}{'coverage':>20}{'QD-score':>24}{'surrogate error':>17}")
+    print(f"{'':>8}{'plain':>10}{'surrogate':>10}{'plain':>12}{'surrogate':>12}")
+    lines = range(0, min(len(plain), len(assisted)))
+    for i in [i for i in lines if i % args.print_every == 0 or i == lines[-1]]:
+        p, a = plain[i], assisted[i]
+        print(f"{p['n_evals']:>8}{p['coverage']:>10.3f}{a['coverage']:>10.3f}{p['qd_score']:>12.2f}{a['qd_score']:>12.2f}{a['surrogate_error']:>17.4f}")
+    print(f"wall time: plain {plain_time:.1f} s, surrogate {assisted_time:.1f} s; "
+          f"{assisted['surrogate_scored'][-1]} candidate offspring scored")
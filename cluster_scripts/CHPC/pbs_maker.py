@@ -13,6 +13,7 @@ if __name__ == "__main__":
     parser.add_argument('-nrun','--name_of_run',        required=True, type=str, default="", help='the name of the run')
     parser.add_argument('-b','--batch_size',   required=False, type=int, default=2390, help='how often to save checkpoints + archive')
     parser.add_argument('-r','--restore_checkpoint',    required=False, type=str, default="", help='the name of the checkpoint to restore')
+    parser.add_argument('-ex','--executor',             required=False, type=str, default="mpi", help='parallel backend of generate_map.py (see pymap_elites/executors.py)')
     args = parser.parse_args() 
 
     pbs_file ="""
@@ -35,14 +36,15 @@ module load chpc/python/3.7.0
 
 cd $PBS_O_WORKDIR
 nproc=`cat $PBS_NODEFILE | wc -l`
-mpirun -np $nproc python3 -m mpi4py.futures generate_map.py -ne {num_evals} -m {map_size} -nrun {name_of_run} -b {batch_size} -r "{restore_checkpoint}"
+mpirun -np $nproc python3 -m mpi4py.futures generate_map.py -ne {num_evals} -m {map_size} -nrun {name_of_run} -b {batch_size} -r "{restore_checkpoint}" -ex {executor}
     """.format(
         num_instances           =args.num_instances,
         num_evals               =args.num_evals,
         map_size                =args.map_size,
         name_of_run             =args.name_of_run,
         batch_size              =args.batch_size,
-        restore_checkpoint      =args.restore_checkpoint
+        restore_checkpoint      =args.restore_checkpoint,
+        executor                =args.executor
     )
 
     local_dir = os.path.dirname(__file__)
@@ -9,4 +9,4 @@
 module load mpi/openmpi-4.0.1
 module load python/anaconda-python-3.7
 
-srun python3 -m mpi4py.futures generate_map.py
\ No newline at end of file
+srun python3 -m mpi4py.futures generate_map.py -ex mpi
\ No newline at end of file
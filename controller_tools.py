@@ -1,11 +1,413 @@
-from hexapod.controllers.reference_controller import Controller, reshape
-from hexapod.controllers.cpg_controller import CPGController
-from hexapod.controllers.cpg_controller import CPGParameterHandlerMAPElites
-from hexapod.simulator import Simulator
+# the simulator (pybullet) and the controllers are imported on first use, so that a process only
+# loads the ones it evaluates (and the MAP-Elites master none of them)
+from eval_cache import EvalCache
+import functools
+import inspect
+import os
 import time
 import numpy as np
 
-def evaluate_gait_cpg(x, duration=5, visualiser=False, collision_fatal=True, failed_legs=[], delay=0):
+# keep one simulator per process and reset it between evaluations instead of rebuilding it
+REUSE_SIMULATOR = True
+# physics steps per simulated second of the simulator (pybullet's default time step)
+PHYSICS_RATE = 240
+# simulator of the evaluations: "pybullet" (the Simulator of the hexapod package) or "kinematic"
+# (kinematic_simulator.py: no physics, for profiling and tests). Processes read it from the
+# HEXAPOD_SIMULATOR environment variable, see use_simulator
+SIMULATORS = ("pybullet", "kinematic")
+SIMULATOR = os.environ.get("HEXAPOD_SIMULATOR", "pybullet")
+
+def simulator_class():
+    """The Simulator class of the selected simulator (SIMULATOR)"""
+    if SIMULATOR == "kinematic":
+        from kinematic_simulator import Simulator
+    elif SIMULATOR == "pybullet":
+        from hexapod.simulator import Simulator
+    else:
+        raise Exception("Invalid simulator \"{}\" - use one of {}".format(SIMULATOR, SIMULATORS))
+    return Simulator
+
+def set_physics_rate(simulator, physics_rate):
+    """Sets the physics time step of a simulator to 1/physics_rate seconds"""
+    simulator.dt = 1.0 / physics_rate
+    simulator.client.setTimeStep(simulator.dt)
+
+# joints (= links) of a leg of the hexapod: hip, knee, ankle
+JOINTS_PER_LEG = 3
+N_LEGS = 6
+
+def set_damage(simulator, failed_legs, collision_fatal):
+    """Sets up a damage scenario on a built simulator, in place
+
+    The links of the failed legs collide with nothing and their joints are not driven, the links
+    of the other legs get pybullet's default collision filter back. The kinematic simulator reads
+    failed_legs and collision_fatal while stepping, there is nothing else to change.
+
+    Args:
+        simulator: Simulator to damage (its physics state is left untouched)
+        failed_legs: which legs to fail/break (numbered from 1)
+        collision_fatal: If true, collisions raise an exception
+    """
+    simulator.failed_legs = list(failed_legs)
+    simulator.collision_fatal = collision_fatal
+    if SIMULATOR != "pybullet":
+        return
+    import pybullet
+    broken = [joint for leg in failed_legs for joint in range((leg - 1) * JOINTS_PER_LEG, leg * JOINTS_PER_LEG)]
+    for link in range(N_LEGS * JOINTS_PER_LEG):
+        if link in broken:
+            simulator.client.setCollisionFilterGroupMask(simulator.hexapod, link, 0, 0)
+        else:
+            simulator.client.setCollisionFilterGroupMask(simulator.hexapod, link, 1, -1)
+    if len(broken) > 0:
+        simulator.client.setJointMotorControlArray(simulator.hexapod, broken, pybullet.VELOCITY_CONTROL,
+            forces=[0.0] * len(broken))
+
+class SimulatorCache:
+    """Keeps one connected simulator per process and restores it between evaluations.
+
+    Building a Simulator connects to pybullet, loads the URDFs and sets up the world. The cache
+    does this once per process, snapshots the physics state (pybullet saveState) together with the
+    simulator's own attributes, and restores both before every evaluation. The controller is a
+    plain attribute read while stepping, so it is swapped in without reconnecting. The simulator
+    is built undamaged: the damage scenario of an evaluation (failed legs, collision_fatal) is set
+    up on the cached world with set_damage, which neither the saved state nor restoring it touch,
+    so it is only redone when an evaluation asks for another scenario than the previous one. The
+    physics time step is not part of the saved state either: the cache sets it again whenever an
+    evaluation asks for another rate than the previous one.
+
+    Visualised runs always get a fresh simulator.
+    """
+
+    def __init__(self):
+        self.simulator = None
+        self.state_id = None
+        self.attributes = None
+        self.pid = None
+        self.scenario = None
+        self.physics_rate = PHYSICS_RATE
+
+    @staticmethod
+    def _copy(value):
+        return value.copy() if isinstance(value, (np.ndarray, list, dict)) else value
+
+    def get(self, controller, visualiser=False, collision_fatal=True, failed_legs=[], physics_rate=PHYSICS_RATE):
+        """Returns a simulator in its initial state, running the given controller
+
+        Args:
+            controller: controller to simulate
+            visualiser: If true, dispaly simuluation in GUI (never cached)
+            collision_fatal: If true, collisions raise an exception
+            failed_legs: which legs to fail/break
+            physics_rate: physics steps per simulated second
+        """
+        Simulator = simulator_class()
+        if visualiser or not REUSE_SIMULATOR:
+            simulator = Simulator(controller=controller, visualiser=visualiser, collision_fatal=collision_fatal, failed_legs=failed_legs)
+            if physics_rate != PHYSICS_RATE:
+                set_physics_rate(simulator, physics_rate)
+            return simulator
+        scenario = (tuple(sorted(failed_legs)), collision_fatal)
+        if self.pid != os.getpid():
+            # inherited through fork: the connection belongs to the parent process
+            self.simulator = None
+        elif self.simulator is not None and not isinstance(self.simulator, Simulator):
+            # another simulator was selected since
+            self.clear()
+        if self.simulator is None:
+            simulator = Simulator(controller=controller, visualiser=False, collision_fatal=True, failed_legs=[])
+            self.state_id = simulator.client.saveState()
+            self.attributes = {k: self._copy(v) for k, v in vars(simulator).items()}
+            self.simulator = simulator
+            self.pid = os.getpid()
+            self.scenario = ((), True)
+            self.physics_rate = PHYSICS_RATE
+        else:
+            simulator = self.simulator
+            simulator.client.restoreState(stateId=self.state_id)
+            for k, v in self.attributes.items():
+                setattr(simulator, k, self._copy(v))
+            simulator.controller = controller
+        if scenario != self.scenario:
+            set_damage(simulator, failed_legs, collision_fatal)
+            self.scenario = scenario
+        else:
+            # restored with the attributes of the undamaged simulator
+            simulator.failed_legs = list(failed_legs)
+            simulator.collision_fatal = collision_fatal
+        if physics_rate != self.physics_rate:
+            set_physics_rate(simulator, physics_rate)
+            self.physics_rate = physics_rate
+        elif physics_rate != PHYSICS_RATE:
+            # restored with the attributes of the default rate
+            simulator.dt = 1.0 / physics_rate
+        return simulator
+
+    def release(self, simulator):
+        """Ends an evaluation: the cached simulator stays connected, any other one is terminated"""
+        if simulator is not self.simulator:
+            simulator.terminate()
+
+    def clear(self):
+        """Disconnects the cached simulator"""
+        if self.simulator is not None and self.pid == os.getpid():
+            self.simulator.terminate()
+        self.simulator = None
+
+SIMULATOR_CACHE = SimulatorCache()
+
+def use_simulator(name):
+    """Selects the simulator of the evaluations, in this process and in the processes it starts afterwards
+
+    The choice is exported to the HEXAPOD_SIMULATOR environment variable, which worker processes
+    (process pools, local socket workers) inherit; set it before mpirun for MPI workers.
+
+    Args:
+        name: "pybullet" or "kinematic" (see kinematic_simulator.py)
+    """
+    global SIMULATOR
+    if name not in SIMULATORS:
+        raise Exception("Invalid simulator \"{}\" - use one of {}".format(name, SIMULATORS))
+    SIMULATOR = name
+    os.environ["HEXAPOD_SIMULATOR"] = name
+    SIMULATOR_CACHE.clear()
+
+class ContactCounter:
+    """Accumulates foot contacts during a rollout into the duty-factor descriptor.
+
+    Keeps a running per-leg count of the steps each foot touched the ground instead of the whole
+    contact history. The descriptor is the same as summarising the full (6, steps) sequence.
+
+    Args:
+        sample_period: query the contacts every `sample_period` physics steps (1 = every step)
+        keep_sequence: also keep the sampled (6, n) contact sequence in a preallocated buffer
+        max_steps: number of physics steps in the rollout (needed for keep_sequence)
+    """
+
+    def __init__(self, sample_period=1, keep_sequence=False, max_steps=0):
+        self.sample_period = sample_period
+        self.counts = np.zeros(6, dtype=np.int64)
+        self.n_samples = 0
+        self.n_steps = 0
+        self.sequence = None
+        if keep_sequence:
+            self.sequence = np.zeros((6, -(-max_steps // sample_period)), dtype=bool)
+
+    def record(self, simulator):
+        """Called once per physics step; queries the simulator's contacts when a sample is due"""
+        if self.n_steps % self.sample_period == 0:
+            contacts = simulator.supporting_legs()
+            self.counts += contacts
+            if self.sequence is not None:
+                self.sequence[:, self.n_samples] = contacts
+            self.n_samples += 1
+        self.n_steps += 1
+
+    def contact_sequence(self):
+        """The sampled (6, n) contact sequence (only if keep_sequence)"""
+        return self.sequence[:, :self.n_samples]
+
+    def descriptor(self):
+        """Proportion of the samples in which each leg was touching the ground"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.nan_to_num(self.counts / self.n_samples, nan=0.0, posinf=0.0, neginf=0.0)
+
+class HeldController:
+    """Queries a controller every `period` seconds and holds its joint angles in between
+
+    The simulator asks for the joint angles at every physics step; with a control rate lower than
+    the physics rate, the controller only runs at the times 0, period, 2 period, ...
+
+    Args:
+        controller: controller to query (anything with joint_angles(t))
+        period: control period (s)
+    """
+
+    def __init__(self, controller, period):
+        self.controller = controller
+        self.period = period
+        self.tick = None
+        self.angles = None
+
+    def joint_angles(self, t):
+        tick = int(t / self.period + 1e-6)
+        if tick != self.tick:
+            self.tick = tick
+            self.angles = self.controller.joint_angles(tick * self.period)
+        return self.angles
+
+def _rate_controller(controller, physics_rate, control_period):
+    """The controller run at one control step every control_period physics steps"""
+    if control_period == 1:
+        return controller
+    return HeldController(controller, control_period / physics_rate)
+
+# fastest gait speed considered possible (m/s); the best gait in the shipped maps walks at ~0.9 m/s
+MAX_SPEED = 1.0
+# number of physics steps between two early-termination checks (at PHYSICS_RATE, scaled with the rate)
+EARLY_TERMINATION_CHECK_PERIOD = 24
+
+def base_orientation(simulator):
+    """Orientation quaternion (x, y, z, w) of the robot's body"""
+    return simulator.client.getBasePositionAndOrientation(simulator.hexapod)[1]
+
+class FlipDetector:
+    """Stops a rollout once the body has tilted more than max_tilt (radians) from upright.
+
+    The contacts after a flip are not those of the gait, so the descriptor is not kept, and neither
+    is the distance walked before the flip.
+    """
+    reason = "flipped"
+    descriptor_valid = False
+    fitness_valid = False
+
+    def __init__(self, max_tilt=np.pi/2):
+        self.min_up = np.cos(max_tilt)
+
+    def reset(self, duration):
+        pass
+
+    def check(self, simulator, t):
+        qx, qy, _, _ = base_orientation(simulator)
+        # z component of the body's up axis in the world frame
+        return 1.0 - 2.0 * (qx * qx + qy * qy) < self.min_up
+
+class StallDetector:
+    """Stops a rollout once the body has moved less than min_progress (m) along x over the last window (s).
+
+    A stalled gait keeps its contact pattern and makes no more progress, so the descriptor and the
+    distance measured so far are kept.
+    """
+    reason = "stalled"
+    descriptor_valid = True
+    fitness_valid = True
+
+    def __init__(self, window=1.0, min_progress=0.02):
+        self.window = window
+        self.min_progress = min_progress
+
+    def reset(self, duration):
+        self.history = []
+
+    def check(self, simulator, t):
+        x = simulator.base_pos()[0]
+        self.history.append((t, x))
+        while self.history[0][0] < t - self.window:
+            self.history.pop(0)
+        if t - self.history[0][0] < self.window - 1e-9:
+            return False
+        xs = [h[1] for h in self.history]
+        return max(xs) - min(xs) < self.min_progress
+
+class IncumbentBound:
+    """Stops a rollout once it cannot reach incumbent_fitness, even walking at max_speed for the rest of it.
+
+    Used by MAP-Elites with the fitness of the weaker of the offspring's parents' elites. The distance
+    walked so far is only a lower bound of the gait's fitness, so the result is not cached: the rollout
+    is only known to lose to the incumbent. MAP-Elites settles it against the niche of the descriptor
+    at the cutoff (see cvt.__unsettled): kept if the niche is empty, dropped if its elite is at least
+    as fit as the incumbent, evaluated again without the bound otherwise.
+    """
+    reason = "cannot beat incumbent"
+    descriptor_valid = True
+    fitness_valid = False
+
+    def __init__(self, incumbent_fitness, max_speed=MAX_SPEED):
+        self.incumbent_fitness = incumbent_fitness
+        self.max_speed = max_speed
+
+    def reset(self, duration):
+        self.duration = duration
+
+    def check(self, simulator, t):
+        return simulator.base_pos()[0] + self.max_speed * (self.duration - t) < self.incumbent_fitness
+
+def _early_termination_policies(early_termination, incumbent_fitness, duration):
+    policies = list(early_termination)
+    if incumbent_fitness is not None and np.isfinite(incumbent_fitness):
+        policies.append(IncumbentBound(incumbent_fitness))
+    for policy in policies:
+        policy.reset(duration)
+    return policies
+
+def _check_period(physics_rate):
+    return max(1, round(EARLY_TERMINATION_CHECK_PERIOD * physics_rate / PHYSICS_RATE))
+
+def _check_early_termination(policies, simulator, step, period=EARLY_TERMINATION_CHECK_PERIOD):
+    """Returns the policy stopping the rollout at this physics step, if any"""
+    if (step + 1) % period != 0:
+        return None
+    for policy in policies:
+        if policy.check(simulator, (step + 1) * simulator.dt):
+            return policy
+    return None
+
+def _result(fitness, descriptor, return_info, steps, max_steps, stopped_by=None, collision=False):
+    if not return_info:
+        return fitness, descriptor
+    info = {
+        "terminated_early": stopped_by is not None,
+        "reason": "collision" if collision else (stopped_by.reason if stopped_by is not None else None),
+        "descriptor_valid": stopped_by is None or stopped_by.descriptor_valid,
+        "fitness_valid": stopped_by is None or stopped_by.fitness_valid,
+        "steps": steps,
+        "max_steps": max_steps,
+    }
+    return fitness, descriptor, info
+
+# persistent evaluation cache looked up by the evaluate functions (None = off, see use_eval_cache)
+EVAL_CACHE = None
+
+def use_eval_cache(cache):
+    """Makes evaluate_gait_cpg and evaluate_gait_ref look up and store their results in an EvalCache
+
+    Args:
+        cache: the EvalCache to use, None to stop caching
+    """
+    global EVAL_CACHE
+    EVAL_CACHE = cache
+
+def _cached_evaluation(controller_type):
+    """Decorates an evaluate function to consult EVAL_CACHE.
+
+    The key covers the genome bytes, the controller type, failed_legs, duration, collision_fatal,
+    the contact sampling, the physics and control rates and the simulator. Visualised runs and runs with early termination are never cached.
+    """
+    def decorator(evaluate):
+        signature = inspect.signature(evaluate)
+
+        @functools.wraps(evaluate)
+        def wrapper(*args, **kwargs):
+            if EVAL_CACHE is None:
+                return evaluate(*args, **kwargs)
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            a = arguments.arguments
+            if a['visualiser'] or a['early_termination'] or a['incumbent_fitness'] is not None or a['return_info']:
+                return evaluate(*args, **kwargs)
+            # settings added after the cache was introduced are only part of the key when not at their
+            # default, so that the entries of earlier evaluations stay valid
+            settings = {}
+            if a['physics_rate'] != PHYSICS_RATE:
+                settings["physics_rate"] = a['physics_rate']
+            if a['control_period'] != 1:
+                settings["control_period"] = a['control_period']
+            if SIMULATOR != "pybullet":
+                settings["simulator"] = SIMULATOR
+            key = EvalCache.key(a['x'], controller=controller_type, failed_legs=sorted(a['failed_legs']),
+                duration=a['duration'], collision_fatal=a['collision_fatal'], contact_sample_period=a['contact_sample_period'], **settings)
+            result = EVAL_CACHE.get(key)
+            if result is None:
+                result = evaluate(*args, **kwargs)
+                EVAL_CACHE.put(key, *result)
+            return result
+        return wrapper
+    return decorator
+
+@_cached_evaluation("CPG")
+def evaluate_gait_cpg(x, duration=5, visualiser=False, collision_fatal=True, failed_legs=[], delay=0, contact_sample_period=1,
+                      early_termination=[], incumbent_fitness=None, return_info=False,
+                      physics_rate=PHYSICS_RATE, control_period=1):
     """Responsible for testing the gait parameters and returning the descriptor and performance/fitness for the CPG controller.
 
     NOTE: THIS IS FOR THE CPG CONTROLLER ONLY
@@ -18,15 +420,28 @@ def evaluate_gait_cpg(x, duration=5, visualiser=False, collision_fatal=True, fai
         collision_fatal: If true, collisions are deemed fatal and given 0.0 fitness
         failed_legs: which legs to fail/break
         delay: number of seconds to delay after each step (slows down simulator)
+        contact_sample_period: sample the foot contacts every this many physics steps
+        early_termination: policies (FlipDetector, StallDetector, ...) that may stop the rollout early
+        incumbent_fitness: stop once this fitness is out of reach (see IncumbentBound)
+        return_info: also return a dict with "terminated_early", "reason", "descriptor_valid",
+            "fitness_valid" (False when the fitness is that of a rollout stopped short, see
+            IncumbentBound), "steps" (physics steps simulated) and "max_steps"
+        physics_rate: physics steps per simulated second
+        control_period: query the controller every this many physics steps (holding its joint
+            angles in between)
 
     Returns:
         (float, np.array): Fitness and Descriptor.
     """
+    from hexapod.controllers.cpg_controller import CPGController, CPGParameterHandlerMAPElites
     intrinsic_amplitudes = x[:12]
     intrinsic_amplitudes = CPGParameterHandlerMAPElites.scale_intrinsic_amplitudes(x[:12]) # convert from 12 intrinsic amps in range [0-1]
     phase_biases = CPGParameterHandlerMAPElites.scale_phase_biases(x[12:]) # convert from 144 phase biases in range [0-1]
     fitness = 0.0
-    contact_sequence = np.zeros(6)
+    max_steps = int(np.ceil(physics_rate*duration-1))
+    policies = _early_termination_policies(early_termination, incumbent_fitness, duration)
+    stopped_by = None
+    t=0
     try:
         controller = CPGController(
             intrinsic_amplitudes=intrinsic_amplitudes,
@@ -35,27 +450,35 @@ def evaluate_gait_cpg(x, duration=5, visualiser=False, collision_fatal=True, fai
             velocity=0,
             crab_angle=0
         )
-        simulator = Simulator(controller=controller, visualiser=visualiser, collision_fatal=collision_fatal,failed_legs=failed_legs)
-        contact_sequence = np.full((6, 0), False)
-        t=0
-        while t<(240*duration)-1:
+        simulator = SIMULATOR_CACHE.get(_rate_controller(controller, physics_rate, control_period), visualiser=visualiser,
+            collision_fatal=collision_fatal, failed_legs=failed_legs, physics_rate=physics_rate)
+        contacts = ContactCounter(sample_period=contact_sample_period)
+        check_period = _check_period(physics_rate)
+        while t<(physics_rate*duration)-1:
             simulator.step()
-            time.sleep(delay)
-            contact_sequence = np.append(contact_sequence, simulator.supporting_legs().reshape(-1,1), axis=1)
+            if delay > 0:
+                time.sleep(delay)
+            contacts.record(simulator)
+            stopped_by = _check_early_termination(policies, simulator, t, check_period)
             t=t+1
+            if stopped_by is not None:
+                break
         fitness = simulator.base_pos()[0] # distance travelled along x axis
-        simulator.terminate()
+        SIMULATOR_CACHE.release(simulator)
     except:
         """Collision detected, return a fitness of 0.0 and a descriptor of 0s."""
         # print("collision!!!!!!!!!!!!")
-        return 0.0, np.zeros(6)
+        return _result(0.0, np.zeros(6), return_info, t, max_steps, collision=True)
     # summarise descriptor
-    descriptor = np.nan_to_num(np.sum(contact_sequence, axis=1) / np.size(contact_sequence, axis=1), nan=0.0, posinf=0.0, neginf=0.0)
+    descriptor = contacts.descriptor()
     
     # print('fitness',fitness,'descriptor', descriptor) # FOR DEBUG
-    return fitness, descriptor
+    return _result(fitness, descriptor, return_info, t, max_steps, stopped_by)
 
-def evaluate_gait_ref(x, duration=5, visualiser=False, collision_fatal=True, failed_legs=[], delay=0):
+@_cached_evaluation("REF")
+def evaluate_gait_ref(x, duration=5, visualiser=False, collision_fatal=True, failed_legs=[], delay=0, contact_sample_period=1,
+                      early_termination=[], incumbent_fitness=None, return_info=False,
+                      physics_rate=PHYSICS_RATE, control_period=1):
     """Responsible for testing the gait parameters and returning the descriptor and performance/fitness for the Reference controller.
 
     NOTE: THIS IS FOR THE REFERENCE CONTROLLER ONLY
@@ -68,31 +491,53 @@ def evaluate_gait_ref(x, duration=5, visualiser=False, collision_fatal=True, fai
         collision_fatal: If true, collisions are deemed fatal and given 0.0 fitness
         failed_legs: which legs to fail/break
         delay: number of seconds to delay after each step (slows down simulator)
+        contact_sample_period: sample the foot contacts every this many physics steps
+        early_termination: policies (FlipDetector, StallDetector, ...) that may stop the rollout early
+        incumbent_fitness: stop once this fitness is out of reach (see IncumbentBound)
+        return_info: also return a dict with "terminated_early", "reason", "descriptor_valid",
+            "fitness_valid" (False when the fitness is that of a rollout stopped short, see
+            IncumbentBound), "steps" (physics steps simulated) and "max_steps"
+        physics_rate: physics steps per simulated second
+        control_period: query the controller every this many physics steps (holding its joint
+            angles in between)
 
     Returns:
         (float, np.array): Fitness and Descriptor.
     """
+    from hexapod.controllers.reference_controller import Controller, reshape
     body_height, velocity, leg_params = reshape(x)
     try:
         controller = Controller(leg_params, body_height=body_height, velocity=velocity, period=1.0, crab_angle=-np.pi/6)
     except:
-        return 0, np.zeros(6)
-    simulator = Simulator(controller=controller, visualiser=visualiser, collision_fatal=collision_fatal, failed_legs=failed_legs)
-    contact_sequence = np.full((6, 0), False)
-    for t in np.arange(0, duration, step=simulator.dt):
+        return _result(0, np.zeros(6), return_info, 0, 0, collision=True)
+    simulator = SIMULATOR_CACHE.get(_rate_controller(controller, physics_rate, control_period), visualiser=visualiser,
+        collision_fatal=collision_fatal, failed_legs=failed_legs, physics_rate=physics_rate)
+    contacts = ContactCounter(sample_period=contact_sample_period)
+    policies = _early_termination_policies(early_termination, incumbent_fitness, duration)
+    check_period = _check_period(physics_rate)
+    stopped_by = None
+    times = np.arange(0, duration, step=simulator.dt)
+    steps = 0
+    for t in times:
         try:
             simulator.step()
-            time.sleep(delay)
+            if delay > 0:
+                time.sleep(delay)
         except RuntimeError as collision:
             # print("collision")
-            return 0, np.zeros(6)
-        contact_sequence = np.append(contact_sequence, simulator.supporting_legs().reshape(-1,1), axis=1)
+            SIMULATOR_CACHE.release(simulator)
+            return _result(0, np.zeros(6), return_info, steps, len(times), collision=True)
+        contacts.record(simulator)
+        stopped_by = _check_early_termination(policies, simulator, steps, check_period)
+        steps += 1
+        if stopped_by is not None:
+            break
     fitness = simulator.base_pos()[0] # distance travelled along x axis
     # summarise descriptor
-    descriptor = np.nan_to_num(np.sum(contact_sequence, axis=1) / np.size(contact_sequence, axis=1), nan=0.0, posinf=0.0, neginf=0.0)
-    simulator.terminate()
+    descriptor = contacts.descriptor()
+    SIMULATOR_CACHE.release(simulator)
     # print('fitness',fitness,'descriptor', descriptor) # FOR DEBUG
-    return fitness, descriptor
+    return _result(fitness, descriptor, return_info, steps, len(times), stopped_by)
 
 
 def read_in_individuals(filenames):
@@ -105,6 +550,7 @@ def read_in_individuals(filenames):
     Returns:
         ([np.array]): The individuals.
     """
+    from hexapod.controllers.cpg_controller import CPGParameterHandlerMAPElites
     individuals = []
     for filename in filenames:
         with open(filename, 'r') as f:
@@ -0,0 +1,55 @@
+"""Converts the text maps/archives to the binary format of pymap_elites/archive_io.py (or back)
+
+Every map_*.dat / archive_*.dat file under the given folders gets a binary .bin version next to it,
+which the map readers (MBOA, plots, find_best_controller_all_maps.py) use instead of the text file
+as long as it is up to date.
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -p      --paths                 : files or folders to convert (default: maps)
+    -d      --dim                   : number of dimensions of the maps (default: 6)
+    -f32    --float32               : store the columns as float32 (half the size, not exact)
+    -t      --to_text               : export binary files to text instead
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import time
+import numpy as np
+from pymap_elites import archive_io
+
+def find_files(paths, extension):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.endswith(extension) and (name.startswith("map_") or name.startswith("archive_")):
+                    yield os.path.join(root, name)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Converts text maps to the binary format (or back).')
+    parser.add_argument('-p','--paths',     required=False, type=str, default=["maps"], nargs='+', help='files or folders to convert')
+    parser.add_argument('-d','--dim',       required=False, type=int, default=6, help='number of dimensions of the maps')
+    parser.add_argument('-f32','--float32', required=False, action='store_true', help='store the columns as float32')
+    parser.add_argument('-t','--to_text',   required=False, action='store_true', help='export binary files to text instead')
+    args = parser.parse_args()
+
+    text_bytes, binary_bytes = 0, 0
+    for filename in find_files(args.paths, archive_io.BINARY_EXTENSION if args.to_text else archive_io.TEXT_EXTENSION):
+        start = time.perf_counter()
+        if args.to_text:
+            binary = filename
+            text = os.path.splitext(filename)[0] + archive_io.TEXT_EXTENSION
+            archive_io.export_text(archive_io.load_archive(binary), text)
+        else:
+            text = filename
+            binary = archive_io.convert(text, args.dim, np.float32 if args.float32 else np.float64)
+        text_bytes += os.path.getsize(text)
+        binary_bytes += os.path.getsize(binary)
+        print(f"{text} <-> {binary} ({time.perf_counter()-start:.2f} s)")
+    print(f"text: {text_bytes/1e6:.1f} MB, binary: {binary_bytes/1e6:.1f} MB")
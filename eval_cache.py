@@ -0,0 +1,158 @@
+"""Persistent cache of gait evaluations, keyed by the genome and the evaluation settings
+
+The adaptation experiments evaluate the same controllers under the same failures again and
+again (every MBOA run starts from the best gait of the map, every sweep repeats the same
+(genome, failed_legs) pairs). The cache stores the fitness and descriptor of every evaluation
+in an SQLite file so repeated evaluations, in the same run or in a later one, are looked up
+instead of simulated.
+
+SQLite takes care of the locking, so the cache can be shared by every process of a pool and by
+several experiment scripts running at the same time. The least recently used entries are
+evicted once the cache holds more than max_entries evaluations. Counting the entries is a full
+scan of the table, so a process only counts them when its own inserts may have taken the cache
+past max_entries, and every COUNT_PERIOD inserts to catch up with the other processes; eviction
+then makes room for a tenth of max_entries (at most COUNT_PERIOD) more inserts, so that a full
+cache is not counted at every insert.
+
+Example:
+```python
+cache = EvalCache()
+key = EvalCache.key(x, controller="CPG", failed_legs=[1], duration=5, collision_fatal=False)
+result = cache.get(key)
+if result is None:
+    result = evaluate(x)
+    cache.put(key, *result)
+print(cache.report())
+```
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import numpy as np
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "hexapod", "evaluations.sqlite")
+DEFAULT_MAX_ENTRIES = 1_000_000
+# logical clock of the LRU eviction (shared by every process using the file)
+_NEXT_USE = "SELECT COALESCE(MAX(last_used), 0) + 1 FROM evaluations"
+# inserts between two counts of the entries
+COUNT_PERIOD = 1000
+
+
+class EvalCache:
+    """On-disk, process-safe cache of (fitness, descriptor) evaluations
+
+    Args:
+        path: SQLite file of the cache (created if needed)
+        max_entries: number of evaluations kept, the least recently used are evicted beyond that
+        timeout: seconds to wait for another process holding the lock
+
+    Attributes:
+        hits: number of lookups answered by the cache (in this process)
+        misses: number of lookups not found in the cache (in this process)
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=DEFAULT_MAX_ENTRIES, timeout=60.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+        # entries counted at the last count, plus the inserts of this process since then
+        self._entries = None
+        self._uncounted = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connect()
+
+    def __getstate__(self):
+        # connections cannot be pickled, each process opens its own
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_pid"] = None
+        state["_entries"] = None
+        return state
+
+    def _connect(self):
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        # a connection inherited through fork belongs to the parent process
+        self._connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS evaluations ("
+            "key TEXT PRIMARY KEY, fitness REAL, descriptor BLOB, last_used INTEGER)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS last_used_index ON evaluations (last_used)")
+        self._pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def key(x, **context):
+        """Hash of the genome bytes and of everything else the evaluation depends on
+
+        Args:
+            x: genome
+            context: evaluation settings (controller type, failed_legs, duration, collision_fatal, ...)
+
+        Returns:
+            hex digest identifying the evaluation
+        """
+        h = hashlib.sha256(np.ascontiguousarray(x, dtype=np.float64).tobytes())
+        h.update(json.dumps(context, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        """Returns the cached (fitness, descriptor) for key, or None"""
+        connection = self._connect()
+        row = connection.execute("SELECT fitness, descriptor FROM evaluations WHERE key=?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        connection.execute("UPDATE evaluations SET last_used=(" + _NEXT_USE + ") WHERE key=?", (key,))
+        descriptor = None if row[1] is None else np.frombuffer(row[1], dtype=np.float64).copy()
+        return row[0], descriptor
+
+    def put(self, key, fitness, descriptor=None, info=None):
+        """Stores an evaluation and evicts the least recently used ones beyond max_entries
+
+        Args:
+            info: info dict of the evaluation (return_info of the evaluate functions): a rollout
+                stopped early whose fitness or descriptor is not that of the whole rollout is not stored
+        """
+        if info is not None and not (info.get("descriptor_valid", True) and info.get("fitness_valid", True)):
+            return
+        connection = self._connect()
+        blob = None if descriptor is None else np.ascontiguousarray(descriptor, dtype=np.float64).tobytes()
+        connection.execute("INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, (" + _NEXT_USE + "))", (key, float(fitness), blob))
+        self._uncounted += 1
+        if self._entries is None or self._entries + self._uncounted > self.max_entries or self._uncounted >= COUNT_PERIOD:
+            self._evict()
+
+    def _evict(self):
+        """Counts the entries and evicts the least recently used ones beyond max_entries (and some room)"""
+        connection = self._connect()
+        self._entries, self._uncounted = len(self), 0
+        excess = self._entries - self.max_entries
+        if excess > 0:
+            excess += min(self.max_entries // 10, COUNT_PERIOD)
+            connection.execute(
+                "DELETE FROM evaluations WHERE key IN "
+                "(SELECT key FROM evaluations ORDER BY last_used LIMIT ?)", (excess,))
+            self._entries -= excess
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+
+    def clear(self):
+        """Removes every cached evaluation"""
+        self._connect().execute("DELETE FROM evaluations")
+        self._entries, self._uncounted = 0, 0
+
+    def report(self):
+        """One line summary of the lookups made through this cache object"""
+        lookups = self.hits + self.misses
+        return "evaluation cache: {} hits, {} misses ({:.1f}% hit rate), {} entries in {}".format(
+            self.hits, self.misses, 100.0 * self.hits / lookups if lookups > 0 else 0.0, len(self), self.path)
@@ -5,9 +5,11 @@ import os
 sys.path.append(os.path.abspath("."))
 
 import controller_tools
+from eval_cache import EvalCache
 from hexapod.controllers.cpg_controller import CPGParameterHandlerMAPElites
 
 SHOW_VISUAL = False
+controller_tools.use_eval_cache(EvalCache()) # reruns of the sweep look up the gaits already tested
 
 S0 = [[]]
 S1 = [[1],[2],[3],[4],[5],[6]]
@@ -33,4 +35,4 @@ for scenario in range(5):
 	fout.flush()
 	fout.close()
 
-
+print(controller_tools.EVAL_CACHE.report())
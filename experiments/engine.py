@@ -0,0 +1,303 @@
+"""Parallel, resumable engine for the adaptation experiments
+
+Expands the (controller, niches, map, scenario, failure) grid of an experiment into independent
+tasks and runs them on a process pool (or with MPI). Every finished task is appended to a
+journal (one JSON line per task) in the output folder as soon as it is done, so an interrupted
+sweep picks up where it stopped when it is run again. Once every task of a scenario is in the
+journal, the usual output files are written from it.
+
+    Experiment  Tasks                                   Output files (experiments/output/...)
+    _________   _____________________________________   _______________________________________________
+    mboa        one MBOA run per map and failure case   <CPG/REF>/<niches>k/trials_*.dat, perfs_*.dat,
+                                                        iterations_*.dat, times_*.dat
+    neat        one evaluation per NEAT gait and        CPG/neat-no-adpatation/all-gaits/NEAT-CPG-*.dat
+                failure case
+
+Takes in the following command line arguments:
+    Flag    Flag (long)             Description
+    _____   _____________________   ____________________________________________
+    -e      --experiment            : "mboa" (IT&E on the maps) or "neat" (every NEAT gait, no adaptation)
+    -c      --controller            : which controller to use ("CPG"/"REF")
+    -k      --niches                : size of the maps in thousands of niches (default: 20)
+    -nm     --num_maps              : number of maps (default: 10)
+    -s      --scenarios             : failure scenarios to run (default: 0 1 2 3 4)
+    -j      --workers               : number of worker processes (default: all cores)
+    -bs     --batch_size            : controllers tested per MBOA iteration, evaluated concurrently (default: 1)
+    -pr     --physics_rate          : physics steps per simulated second of the evaluations (default: 240)
+    -cp     --control_period        : query the controller every this many physics steps (default: 1)
+    -csp    --contact_sample_period : sample the foot contacts every this many physics steps (default: 1)
+            --mpi                   : run the tasks with mpi4py.futures (launch with mpirun ... -m mpi4py.futures)
+            --restart               : ignore the journal and run every task again
+
+Example (from the highest level in the directory tree):
+```bash
+python3 experiments/engine.py -e mboa -c CPG -k 20
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import argparse
+import functools
+import json
+from collections import namedtuple
+import numpy as np
+
+# failure scenarios
+S0 = [[]]
+S1 = [[1],[2],[3],[4],[5],[6]]
+S2 = [[1,4],[2,5],[3,6]]
+S3 = [[1,3],[2,4],[3,5],[4,6],[5,1],[6,2]]
+S4 = [[1,2],[2,3],[3,4],[4,5],[5,6],[6,1]]
+SCENARIOS = [S0, S1, S2, S3, S4]
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+OUTPUT = os.path.join(ROOT, "experiments", "output")
+NEAT_GENOMES = os.path.join(ROOT, "all-best-genomes.txt")
+JOURNAL = "journal.jsonl"
+
+# one unit of work: "index" is the map number (mboa) or the NEAT gait index (neat), "rates" the
+# physics_rate / control_period / contact_sample_period of the evaluations that are not at their default
+Task = namedtuple("Task", ["experiment", "controller", "niches", "scenario", "failure_index", "failed_legs", "index", "batch_size", "rates"])
+
+
+def task_key(task):
+    """Identifies a task in the journal: MBOA runs with batches of several controllers give other
+    results, so the batch size is part of the key when it is not 1"""
+    key = [task.experiment, task.controller, task.niches, task.scenario, task.failure_index, task.index]
+    if task.experiment == "mboa" and task.batch_size != 1:
+        key.append({"batch_size": task.batch_size})
+    return json.dumps(key)
+
+def evaluation_rates(physics_rate=240, control_period=1, contact_sample_period=1):
+    """The evaluation rates that are not at their default (keyword arguments of the evaluate functions)"""
+    defaults = {"physics_rate": 240, "control_period": 1, "contact_sample_period": 1}
+    rates = {"physics_rate": physics_rate, "control_period": control_period, "contact_sample_period": contact_sample_period}
+    return {k: v for k, v in rates.items() if v != defaults[k]}
+
+def output_folder(experiment, controller, niches, rates={}, batch_size=1):
+    """Output folder (and journal) of an experiment; evaluations at other rates and MBOA runs with
+    another batch size than 1 get a subfolder of their own"""
+    if experiment == "neat":
+        folder = os.path.join(OUTPUT, "CPG", "neat-no-adpatation", "all-gaits")
+    else:
+        folder = os.path.join(OUTPUT, controller, f"{niches}k")
+    settings = dict(rates)
+    if experiment == "mboa" and batch_size != 1:
+        settings["batch_size"] = batch_size
+    if settings:
+        folder = os.path.join(folder, "_".join(f"{k}_{v}" for k, v in sorted(settings.items())))
+    return folder
+
+def expand_grid(experiment, controller, niches, num_maps, scenarios, batch_size=1, rates={}):
+    """Returns every task of the experiment"""
+    if experiment == "neat":
+        import controller_tools
+        indexes = range(len(controller_tools.read_in_individuals([NEAT_GENOMES])))
+    else:
+        indexes = range(1, num_maps+1)
+    return [Task(experiment, controller, niches, scenario, failure_index, failed_legs, index, batch_size, rates)
+            for scenario in scenarios
+            for failure_index, failed_legs in enumerate(SCENARIOS[scenario])
+            for index in indexes]
+
+def map_paths(controller, niches, map_num):
+    suffix = "_reference" if controller == "REF" else ""
+    centroid_path = os.path.join(ROOT, "centroids", f"centroids_{niches}000_6{suffix}.dat")
+    map_path = os.path.join(ROOT, "maps", controller, f"{niches}k", f"map_{map_num}.dat")
+    return map_path, centroid_path
+
+def evaluate_map_controller(x, controller="CPG", failed_legs=[], rates={}):
+    """Fitness of a controller of a map (parameters as stored in the map) on the damaged robot"""
+    import controller_tools
+    if controller == "CPG":
+        from hexapod.controllers.cpg_controller import CPGParameterHandlerMAPElites
+        x = CPGParameterHandlerMAPElites.convert_non_mapelites_parameters(x)
+        return controller_tools.evaluate_gait_cpg(x, collision_fatal=False, failed_legs=failed_legs, **rates)[0]
+    return controller_tools.evaluate_gait_ref(x, collision_fatal=False, failed_legs=failed_legs, **rates)[0]
+
+# per-process evaluation cache (see eval_cache.py)
+__cache = None
+
+def __eval_cache():
+    global __cache
+    if __cache is None:
+        from eval_cache import EvalCache
+        __cache = EvalCache()
+    return __cache
+
+def run_task(task, concurrent_batches=False):
+    """Runs one task in a worker process
+
+    Args:
+        concurrent_batches: evaluate the controllers of an MBOA batch concurrently, on a pool of
+            task.batch_size processes started by the worker for the task
+
+    Returns:
+        (key, result, cache_lookups) where result is the dict stored in the journal and
+        cache_lookups the (hits, misses) of the evaluation cache during the task
+    """
+    cache = __eval_cache()
+    hits, misses = cache.hits, cache.misses
+    if concurrent_batches and task.batch_size > 1 and task.experiment == "mboa":
+        from concurrent.futures import ProcessPoolExecutor
+        # shut down with the task: a pool left running would keep the worker from exiting
+        with ProcessPoolExecutor(task.batch_size) as pool:
+            key, result = __run_task(task, cache, pool)
+    else:
+        key, result = __run_task(task, cache)
+    return key, result, (cache.hits - hits, cache.misses - misses)
+
+def __run_task(task, cache, pool=None):
+    if task.experiment == "neat":
+        import controller_tools
+        controller_tools.use_eval_cache(cache)
+        x = controller_tools.read_in_individuals([NEAT_GENOMES])[task.index]
+        fitness = controller_tools.evaluate_gait_cpg(x, collision_fatal=False, failed_legs=task.failed_legs, **task.rates)[0]
+        return task_key(task), {"fitness": float(fitness)}
+    from adapt.MBOA import MBOA
+    map_path, centroid_path = map_paths(task.controller, task.niches, task.index)
+    evaluate = functools.partial(evaluate_map_controller, controller=task.controller, failed_legs=task.failed_legs, rates=task.rates)
+    cache_context = {"eval": "evaluate_map_controller", "controller": task.controller, "failed_legs": task.failed_legs, "duration": 5, "collision_fatal": False, **task.rates}
+    num_it, best_index, best_perf, new_map, info = MBOA(map_path, centroid_path, evaluate, max_iter=40, print_output=False,
+        cache=cache, cache_context=cache_context, batch_size=task.batch_size, pool=pool, return_info=True)
+    return task_key(task), {"iterations": int(num_it), "trials": int(info["trials"]), "best_index": int(best_index),
+        "best_perf": float(best_perf), "wall_time": float(info["wall_time"])}
+
+def read_journal(path):
+    """Results of the tasks already done: key -> result (a truncated last line is ignored)"""
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                done[entry["key"]] = entry["result"]
+    return done
+
+def open_journal(path):
+    """Opens the journal for appending, terminating a line cut short by an interruption"""
+    journal = open(path, 'a+b')
+    if journal.tell() > 0:
+        journal.seek(-1, os.SEEK_END)
+        if journal.read(1) != b"\n":
+            journal.write(b"\n")
+    journal.close()
+    return open(path, 'a')
+
+def append_journal(journal, key, result):
+    journal.write(json.dumps({"key": key, "result": result}) + "\n")
+    journal.flush()
+    os.fsync(journal.fileno())
+
+def write_outputs(experiment, controller, niches, num_maps, scenario, done, rates={}, batch_size=1):
+    """Writes the output files of a scenario from the journal (same formats as the original scripts)"""
+    folder = output_folder(experiment, controller, niches, rates, batch_size)
+    tasks = expand_grid(experiment, controller, niches, num_maps, [scenario], batch_size, rates)
+    if experiment == "neat":
+        # average fitness of every gait over the failure cases
+        n_gaits = max(t.index for t in tasks) + 1
+        fitness = np.zeros((len(SCENARIOS[scenario]), n_gaits))
+        for t in tasks:
+            fitness[t.failure_index, t.index] = done[task_key(t)]["fitness"]
+        with open(os.path.join(folder, f"NEAT-CPG-{scenario}.dat"), 'w') as fout:
+            for i, avg_fitness in enumerate(fitness.mean(axis=0)):
+                fout.write("Gait {0},{1}\n".format(i, avg_fitness))
+        return
+    shape = (len(SCENARIOS[scenario]), num_maps)
+    columns = {"trials": np.zeros(shape), "perfs": np.zeros(shape), "iterations": np.zeros(shape), "times": np.zeros(shape)}
+    for t in tasks:
+        result = done[task_key(t)]
+        columns["trials"][t.failure_index, t.index-1] = result["trials"]
+        columns["perfs"][t.failure_index, t.index-1] = result["best_perf"]
+        columns["iterations"][t.failure_index, t.index-1] = result["iterations"]
+        columns["times"][t.failure_index, t.index-1] = result["wall_time"]
+    np.savetxt(os.path.join(folder, f"trials_{scenario}.dat"), columns["trials"], '%d')
+    np.savetxt(os.path.join(folder, f"perfs_{scenario}.dat"), columns["perfs"], "%3.5f")
+    np.savetxt(os.path.join(folder, f"iterations_{scenario}.dat"), columns["iterations"], '%d')
+    np.savetxt(os.path.join(folder, f"times_{scenario}.dat"), columns["times"], '%3.5f')
+
+def make_executor(workers=None, mpi=False):
+    """Process pool (or MPI pool) the tasks run on"""
+    if mpi:
+        from mpi4py.futures import MPIPoolExecutor
+        return MPIPoolExecutor()
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(workers or os.cpu_count())
+
+def run_sweep(experiment, controller="CPG", niches=20, num_maps=10, scenarios=range(5), workers=None, batch_size=1, mpi=False, restart=False, rates={}):
+    """Runs every task of the experiment that is not in the journal yet, then writes the output files
+
+    Args:
+        experiment: "mboa" (IT&E on the maps) or "neat" (every NEAT gait, no adaptation)
+        controller: which controller to use ("CPG"/"REF")
+        niches: size of the maps in thousands of niches
+        num_maps: number of maps
+        scenarios: failure scenarios to run
+        workers: number of worker processes (None = all cores); with batch_size > 1, every task
+            evaluates the controllers of a batch on batch_size processes, so workers // batch_size
+            tasks run at a time
+        batch_size: controllers tested per MBOA iteration
+        mpi: run the tasks with mpi4py.futures
+        restart: ignore the journal and run every task again
+        rates: physics_rate, control_period and/or contact_sample_period of the evaluations
+            (see evaluation_rates)
+    """
+    from concurrent.futures import as_completed
+    scenarios = list(scenarios)
+    folder = output_folder(experiment, controller, niches, rates, batch_size)
+    os.makedirs(folder, exist_ok=True)
+    journal_path = os.path.join(folder, JOURNAL)
+    if restart and os.path.exists(journal_path):
+        os.remove(journal_path)
+    done = read_journal(journal_path)
+    tasks = expand_grid(experiment, controller, niches, num_maps, scenarios, batch_size, rates)
+    todo = [t for t in tasks if task_key(t) not in done]
+    print(f"{len(tasks)} tasks, {len(tasks) - len(todo)} already done", flush=True)
+
+    # MPI workers do not start processes of their own: their batches are evaluated one controller after the other
+    concurrent_batches = experiment == "mboa" and batch_size > 1 and not mpi
+    if concurrent_batches:
+        workers = max(1, (workers or os.cpu_count()) // batch_size)
+    hits, misses = 0, 0
+    if len(todo) > 0:
+        with open_journal(journal_path) as journal, make_executor(workers, mpi) as executor:
+            futures = [executor.submit(run_task, t, concurrent_batches) for t in todo]
+            for n, future in enumerate(as_completed(futures), 1):
+                key, result, (task_hits, task_misses) = future.result()
+                append_journal(journal, key, result)
+                done[key] = result
+                hits, misses = hits + task_hits, misses + task_misses
+                print(f"[{n}/{len(todo)}] {key} {result}", flush=True)
+        print(f"evaluation cache: {hits} hits, {misses} misses", flush=True)
+
+    for scenario in scenarios:
+        write_outputs(experiment, controller, niches, num_maps, scenario, done, rates, batch_size)
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Runs the adaptation experiments.')
+    parser.add_argument('-e','--experiment',   required=False, type=str, default="mboa", help='"mboa" (IT&E on the maps) or "neat" (every NEAT gait, no adaptation)')
+    parser.add_argument('-c','--controller',   required=False, type=str, default="CPG", help='which controller to use ("CPG"/"REF")')
+    parser.add_argument('-k','--niches',       required=False, type=int, default=20, help='size of the maps in thousands of niches')
+    parser.add_argument('-nm','--num_maps',    required=False, type=int, default=10, help='number of maps')
+    parser.add_argument('-s','--scenarios',    required=False, type=int, default=[0, 1, 2, 3, 4], nargs='+', help='failure scenarios to run')
+    parser.add_argument('-j','--workers',      required=False, type=int, default=None, help='number of worker processes (default: all cores)')
+    parser.add_argument('-bs','--batch_size',  required=False, type=int, default=1, help='controllers tested per MBOA iteration')
+    parser.add_argument('-pr','--physics_rate',           required=False, type=int, default=240, help='physics steps per simulated second of the evaluations')
+    parser.add_argument('-cp','--control_period',         required=False, type=int, default=1, help='query the controller every this many physics steps')
+    parser.add_argument('-csp','--contact_sample_period', required=False, type=int, default=1, help='sample the foot contacts every this many physics steps')
+    parser.add_argument('--mpi',               required=False, action='store_true', help='run the tasks with mpi4py.futures')
+    parser.add_argument('--restart',           required=False, action='store_true', help='ignore the journal and run every task again')
+    args = parser.parse_args()
+
+    if "CPG" not in args.controller and "REF" not in args.controller:
+        raise Exception("Invalid controller - use \"CPG\" or \"REF\"")
+    if args.experiment not in ["mboa", "neat"]:
+        raise Exception("Invalid experiment - use \"mboa\" or \"neat\"")
+    rates = evaluation_rates(args.physics_rate, args.control_period, args.contact_sample_period)
+    run_sweep(args.experiment, args.controller, args.niches, args.num_maps, args.scenarios, args.workers, args.batch_size, args.mpi, args.restart, rates)
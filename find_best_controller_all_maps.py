@@ -6,6 +6,7 @@ import os
 sys.path.append(os.path.abspath("."))
 
 import numpy as np
+from pymap_elites import archive_io
 
 # get paths
 # CPG
@@ -37,20 +38,19 @@ def get_max(controller,mapsize):
 
         base_path = mapping[controller][0] if mapsize==20 else mapping[controller][1]
         map_files = os.listdir(base_path)
-        for map in map_files:
+        # text maps and their binary versions (map_1.dat / map_1.bin) are the same map
+        map_names = sorted({os.path.splitext(map)[0] for map in map_files
+                            if os.path.splitext(map)[1] in (".dat", ".bin") and ".icloud" not in map})
+        for map in map_names:
             max=0
-            if (".dat" in map and ".icloud" not in map):
-                num_maps_evaluated += 1
-                path = os.path.join(base_path, map)
-                f = open(path)
-                lines = f.readlines()
-                percentage_niches_filled = len(lines)/(mapsize*1000)
-                global_percentage_niches_filled += percentage_niches_filled
-                for line in lines:
-                    fitness = float(line.split(" ")[0])
-                    if fitness > max:
-                        max = fitness
-                print(f"percentage_niches_filled: {percentage_niches_filled:.5f}")
+            num_maps_evaluated += 1
+            path = archive_io.find_archive(os.path.join(base_path, map + ".dat"))
+            data = archive_io.load_archive(path)
+            percentage_niches_filled = len(data)/(mapsize*1000)
+            global_percentage_niches_filled += percentage_niches_filled
+            if len(data) > 0 and data.fitness.max() > max:
+                max = float(data.fitness.max())
+            print(f"percentage_niches_filled: {percentage_niches_filled:.5f}")
             if max > global_max:
                 global_max=max
         print("Average % niches filled:",global_percentage_niches_filled/num_maps_evaluated)
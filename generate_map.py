@@ -9,20 +9,38 @@ Takes in the following command line arguments:
     -b      --batch_size            : how often to save checkpoints + archive
     -r      --restore_checkpoint    : the name of the checkpoint to restore
     -c      --controller            : which controller to use ("CPG"/"REF")
+    -a      --asynchronous          : run MAP-Elites without a per-generation barrier (steady-state)
+    -et     --early_termination     : stop rollouts that flip, stall or cannot beat their parents' elites
+    -sd     --screen_duration       : screen offspring with a rollout of this many seconds first (0: off)
+    -sm     --screen_margin         : how close (m) to the elite a screened offspring must come to get a full rollout (default: 0.1)
+    -ex     --executor              : parallel backend ("process"/"mpi"/"socket"/"serial", see pymap_elites/executors.py)
+    -nw     --num_workers           : workers of the process pool, or socket workers started locally (default: all cores)
+    -ea     --executor_address      : host:port the socket backend listens on
+    -rw     --remote_workers        : socket workers expected from other hosts
+    -pr     --physics_rate          : physics steps per simulated second of the evaluations (default: 240)
+    -cp     --control_period        : query the controller every this many physics steps (default: 1)
+    -csp    --contact_sample_period : sample the foot contacts every this many physics steps (default: 1)
+    -sim    --simulator             : simulator of the evaluations ("pybullet"/"kinematic", see kinematic_simulator.py;
+                                      MPI workers take it from the HEXAPOD_SIMULATOR environment variable)
+    -sg     --surrogate             : surrogate-assisted MAP-Elites: only evaluate the offspring a surrogate model finds promising
+                                      or uncertain (see pymap_elites/surrogate.py)
+    -sgp    --surrogate_pool        : candidate offspring scored by the surrogate per evaluation (default: 4)
+    -sge    --surrogate_explore     : share of the evaluations given to the candidates the surrogate is least sure of (default: 0.25)
 """
-from hexapod.controllers.reference_controller import Controller, reshape
-from hexapod.controllers.cpg_controller import CPGController
-from hexapod.controllers.cpg_controller import CPGParameterHandlerMAPElites
-from hexapod.simulator import Simulator
-import pymap_elites.cvt as cvt_map_elites
-import numpy as np
+# Under mpirun ... -m mpi4py.futures, every worker runs this module (not the __main__ block): keep
+# its imports light. The workers load the simulator and the controller they evaluate on first use
+# (see controller_tools.py), and only the master imports MAP-Elites.
 import argparse
+import functools
 import controller_tools
 
 COLLISION_FATAL = True
 RANDOM_INIT_BATCH = 2390
+EVALUATION_DURATION = 5 # seconds simulated by a full evaluation (default of the evaluate functions)
 
 if __name__ == '__main__':
+    import pymap_elites.cvt as cvt_map_elites
+    from pymap_elites import common as cm
     parser = argparse.ArgumentParser(description='Run MAP-Elites algorithm.')
     parser.add_argument('-ne','--num_evals' ,        required=True,  type=int,   default=10_000_000, help='the number of generations to run for')
     parser.add_argument('-m','--map_size' ,          required=True,  type=int,   default=10_000, help='the size of the map')
@@ -30,12 +48,37 @@ if __name__ == '__main__':
     parser.add_argument('-b','--batch_size',         required=False, type=int,   default=2390, help='how often to save checkpoints + archive')
     parser.add_argument('-r','--restore_checkpoint', required=False, type=str,   default="", help='the name of the checkpoint to restore')
     parser.add_argument('-c','--controller',         required=False, type=str,  default="CPG", help='which controller to use ("CPG"/"REF")')
+    parser.add_argument('-a','--asynchronous',       required=False, action='store_true', help='run MAP-Elites without a per-generation barrier (steady-state)')
+    parser.add_argument('-et','--early_termination', required=False, action='store_true', help='stop rollouts that flip, stall or cannot beat their parents\' elites')
+    parser.add_argument('-sd','--screen_duration',   required=False, type=float, default=0, help='screen offspring with a rollout of this many seconds first (0: off)')
+    parser.add_argument('-sm','--screen_margin',     required=False, type=float, default=cm.default_params['screen_margin'], help='how close (m) to the elite a screened offspring must come to get a full rollout')
+    parser.add_argument('-af','--archive_format',    required=False, type=str, default="binary", choices=["binary", "text", "both"], help='format of the archive files (binary: see pymap_elites/archive_io.py)')
+    parser.add_argument('-cm','--checkpoint_mode',   required=False, type=str, default="journal", choices=["journal", "pickle"], help='checkpoints: snapshot + journal of every batch, or a gzip pickle at every dump')
+    parser.add_argument('-cvt','--cvt_algorithm',    required=False, type=str, default="kmeans", choices=["kmeans", "minibatch", "lloyd"], help='CVT construction (kmeans: original, reuses centroids/centroids_<k>_6.dat)')
+    parser.add_argument('-cs','--cvt_seed',          required=False, type=int, default=None, help='seed of the CVT samples (part of the CVT cache key)')
+    parser.add_argument('-ex','--executor',          required=False, type=str, default="process", choices=["process", "mpi", "socket", "serial"], help='parallel backend (see pymap_elites/executors.py)')
+    parser.add_argument('-nw','--num_workers',       required=False, type=int, default=None, help='workers of the process pool, or socket workers started locally (default: all cores)')
+    parser.add_argument('-ea','--executor_address',  required=False, type=str, default="localhost:0", help='host:port the socket backend listens on')
+    parser.add_argument('-rw','--remote_workers',    required=False, type=int, default=0, help='socket workers expected from other hosts')
+    parser.add_argument('-pr','--physics_rate',      required=False, type=int, default=controller_tools.PHYSICS_RATE, help='physics steps per simulated second of the evaluations')
+    parser.add_argument('-cp','--control_period',    required=False, type=int, default=1, help='query the controller every this many physics steps')
+    parser.add_argument('-csp','--contact_sample_period', required=False, type=int, default=1, help='sample the foot contacts every this many physics steps')
+    parser.add_argument('-sim','--simulator',        required=False, type=str, default=controller_tools.SIMULATOR, choices=controller_tools.SIMULATORS, help='simulator of the evaluations (kinematic: no physics, see kinematic_simulator.py)')
+    parser.add_argument('-sg','--surrogate',         required=False, action='store_true', help='only evaluate the offspring a surrogate model finds promising or uncertain')
+    parser.add_argument('-sgp','--surrogate_pool',   required=False, type=int, default=4, help='candidate offspring scored by the surrogate per evaluation')
+    parser.add_argument('-sge','--surrogate_explore', required=False, type=float, default=0.25, help='share of the evaluations given to the candidates the surrogate is least sure of')
     args = parser.parse_args() 
 
     if "CPG" not in args.controller and "REF" not in args.controller:
         raise Exception("Invalid controller - use \"CPG\" or \"REF\"")
     if args.controller=="REF" and args.batch_size < RANDOM_INIT_BATCH:
         raise Exception(f"Batch size needs to be greater than the random init batch size (increase batch size to {RANDOM_INIT_BATCH})")
+    if args.simulator=="kinematic" and args.controller=="CPG":
+        # the kinematic simulator steps the same CPGController as pybullet, there is no stand-in for it
+        try:
+            from hexapod.controllers.cpg_controller import CPGController
+        except ImportError:
+            raise Exception("-sim kinematic -c CPG needs the CPGController of the hexapod package")
 
     params = \
         {
@@ -50,15 +93,53 @@ if __name__ == '__main__':
             "random_init_batch": RANDOM_INIT_BATCH, # 2390
             # when to write results (one generation = one batch)
             "dump_period": 1e6, # 5e6
-            # do we use several cores?
-            "parallel": True,
+            # do we use several cores? with which backend?
+            "parallel": args.executor != "serial",
+            "executor": args.executor,
+            "num_workers": args.num_workers,
+            "executor_address": args.executor_address,
+            "remote_workers": args.remote_workers,
             # do we cache the result of CVT and reuse?
             "cvt_use_cache": True,
+            # CVT construction and seed (cached in centroids/cache, keyed by both)
+            "cvt_algorithm": args.cvt_algorithm,
+            "cvt_seed": args.cvt_seed,
             # min/max of parameters
             "min": 0,
             "max": 1,
+            # submit new offspring as soon as results arrive instead of generation by generation
+            "asynchronous": args.asynchronous,
+            # give each offspring the fitness of its parents' elites as an early termination bound
+            "early_termination_bound": args.early_termination,
+            # screened offspring get a full rollout if they land in an empty niche or within
+            # screen_margin of the elite (short rollout distance extrapolated to the full duration)
+            "screen_fitness_scale": EVALUATION_DURATION / args.screen_duration if args.screen_duration > 0 else 1.0,
+            "screen_margin": args.screen_margin,
+            # archive_*.bin (memory-mappable) and/or archive_*.dat (text) files
+            "archive_format": args.archive_format,
+            # snapshot + journal of the elites changed by every batch, or a full pickle at every dump
+            "checkpoint_mode": args.checkpoint_mode,
+            # score surrogate_pool candidate offspring per evaluation with a model of the fitness
+            # function and only evaluate the promising or uncertain ones
+            "surrogate": args.surrogate,
+            "surrogate_pool": args.surrogate_pool,
+            "surrogate_explore": args.surrogate_explore,
         }
 
+    # before the workers start, so that they inherit it
+    controller_tools.use_simulator(args.simulator)
+    evaluate = controller_tools.evaluate_gait_cpg if args.controller=="CPG" else controller_tools.evaluate_gait_ref
+    if (args.physics_rate, args.control_period, args.contact_sample_period) != (controller_tools.PHYSICS_RATE, 1, 1):
+        evaluate = functools.partial(evaluate, physics_rate=args.physics_rate, control_period=args.control_period,
+            contact_sample_period=args.contact_sample_period)
+    if args.early_termination:
+        # with the info of every rollout, those stopped without a valid descriptor are kept out of the
+        # map and the steps saved are reported, with or without the incumbent bound
+        evaluate = functools.partial(evaluate, early_termination=[controller_tools.FlipDetector(), controller_tools.StallDetector()],
+            return_info=True)
+    # low-fidelity first stage of the evaluation: a shorter rollout of the same gait
+    screen = functools.partial(evaluate, duration=args.screen_duration) if args.screen_duration > 0 else None
+
     
     # read in the seeded individuals from files
     individuals = None
@@ -69,19 +150,23 @@ if __name__ == '__main__':
         archive = cvt_map_elites.compute(
             6,
             156 if args.controller=="CPG" else 32,
-            controller_tools.evaluate_gait_cpg if args.controller=="CPG" else controller_tools.evaluate_gait_ref,
+            evaluate,
             checkpoint_filenameprefix="mapelites-checkpoint-{0}-".format(args.name_of_run),
             seeded_individuals=individuals,
             n_niches=args.map_size,
             max_evals=args.num_evals,
             log_file=open('log-{0}.dat'.format(args.name_of_run),'w'),
-            params=params
+            params=params,
+            screen_function=screen,
+            stats_file='stats-{0}.bin'.format(args.name_of_run)
         )
     else: # restore from a checkpoint run
         archive = cvt_map_elites.compute_from_checkpoint(
             "{0}".format(args.restore_checkpoint),
-            controller_tools.evaluate_gait_cpg if args.controller=="CPG" else controller_tools.evaluate_gait_ref,
+            evaluate,
             continue_checkpointing=True,
             params=params,
-            max_evals=args.num_evals
+            max_evals=args.num_evals,
+            screen_function=screen,
+            stats_file='stats-{0}-cont.bin'.format(args.name_of_run)
         )
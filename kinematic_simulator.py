@@ -0,0 +1,174 @@
+"""A kinematic stand-in for the Simulator of the hexapod package: no physics, no pybullet
+
+The robot is reduced to where its feet are. Every step, the joint angles of the controller place
+the six feet around the body: the hip angle swings a foot forwards (positive) or backwards about
+its mount, the knee angle lifts it. The feet lowest above the ground (within CONTACT_TOLERANCE)
+stand on it, and the feet standing on the ground do not slip: the body moves by the opposite of
+their mean displacement in the body frame. The body keeps its heading.
+
+The body is supported while it is above the support polygon of the standing feet (checked
+cheaply: at least three feet on the ground, with feet on both sides of the body and ahead of and
+behind its centre). While it is not, it tips over at TIP_RATE rad/s until it rests on the ground
+at REST_TILT, and drags along it: the feet slip and the body only moves by SLIP times their
+displacement. It rights itself at the same rate once it is supported again. The model has no
+way to flip the robot over.
+
+A failed leg is removed: its foot never touches the ground and it cannot collide with the other
+legs. Two neighbouring legs on the same side of the body collide when they cross (the angle from
+one to the next is less than MIN_LEG_GAP), which raises a RuntimeError when collision_fatal is
+set, like a link collision of the Simulator.
+
+It has the interface of the Simulator that controller_tools uses: step(), base_pos(),
+supporting_legs(), terminate(), dt, t, controller, failed_legs, collision_fatal, hexapod, and a
+client with saveState/restoreState, setTimeStep and getBasePositionAndOrientation, so that the
+simulator cache, the rates and the early termination policies work with it. A step costs a few
+microseconds of plain Python arithmetic (a rollout is then mostly the controller and the
+evaluation loop), but the fitness and descriptors are only those of this model: use it to
+profile the algorithms and to test the code, not to build maps (see
+benchmarks/bench_kinematic_simulator.py for how it compares with the physics).
+
+Example:
+```python
+simulator = Simulator(controller, failed_legs=[1])
+for _ in range(1199):
+    simulator.step()
+distance = simulator.base_pos()[0]
+contacts = simulator.supporting_legs()
+```
+Select it for every evaluation with controller_tools.use_simulator("kinematic").
+"""
+import cmath
+import math
+import numpy as np
+
+DT = 1.0/240
+N_LEGS = 6
+BODY_RADIUS = 0.12 # m, from the centre of the body to the hips
+LEG_REACH = 0.15 # m, from a hip to its foot, seen from above
+LIFT_LENGTH = 0.1 # m, a foot is lifted LIFT_LENGTH * sin(knee angle)
+BODY_HEIGHT = 0.14 # m
+CONTACT_TOLERANCE = 0.005 # m above the lowest foot
+MIN_LEG_GAP = 0.0 # rad
+TIP_RATE = np.pi/2 # rad/s
+REST_TILT = np.radians(20.0)
+SLIP = 0.5
+# legs 1-3 on the left from front to back, 4-6 on the right from back to front (counter-clockwise)
+MOUNT_ANGLES = np.radians([30.0, 90.0, 150.0, 210.0, 270.0, 330.0])
+# positions in the body frame are complex numbers x + iy
+MOUNTS = BODY_RADIUS * np.exp(1j * MOUNT_ANGLES)
+# a positive hip angle turns a left foot clockwise and a right foot counter-clockwise (forwards)
+SIDES = np.sign(np.sin(MOUNT_ANGLES))
+# a step only handles six legs: plain floats are faster than NumPy arrays there
+_LEGS = list(zip(range(N_LEGS), MOUNT_ANGLES.tolist(), SIDES.tolist(), MOUNTS.tolist()))
+
+
+class KinematicClient:
+    """The part of a pybullet client the evaluations use, for a kinematic Simulator"""
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.states = []
+
+    def saveState(self):
+        self.states.append(self.simulator._state())
+        return len(self.states) - 1
+
+    def restoreState(self, stateId):
+        self.simulator._restore(self.states[stateId])
+
+    def setTimeStep(self, dt):
+        self.simulator.dt = dt
+
+    def getBasePositionAndOrientation(self, body):
+        # rotation of tilt radians about the x axis
+        tilt = self.simulator.tilt
+        return self.simulator.base_pos(), (np.sin(tilt/2), 0.0, 0.0, np.cos(tilt/2))
+
+
+class Simulator:
+    """Kinematic hexapod
+
+    Args:
+        controller: controller to simulate, joint_angles(t) -> 18 angles (hip, knee, ankle per leg)
+        visualiser: there is nothing to show, accepted for compatibility with the Simulator
+        collision_fatal: If true, collisions between legs raise a RuntimeError
+        failed_legs: which legs to fail/break (numbered from 1)
+    """
+    def __init__(self, controller, visualiser=False, collision_fatal=True, failed_legs=[]):
+        self.controller = controller
+        self.collision_fatal = collision_fatal
+        self.failed_legs = failed_legs
+        self.dt = DT
+        self.t = 0.0
+        self.hexapod = 0
+        self.client = KinematicClient(self)
+        self.position = [0.0, 0.0, BODY_HEIGHT]
+        self.tilt = 0.0
+        self._failed = None
+        # the first step puts the feet where the controller starts (the controller may be swapped
+        # before, see controller_tools.SimulatorCache)
+        self.feet = None
+        self.contacts = [False] * N_LEGS
+
+    def _legs(self):
+        """Working legs, and the pairs of neighbouring working legs on the same side (counter-clockwise)
+        (recomputed when failed_legs is replaced)"""
+        if self._failed is not self.failed_legs:
+            self._failed = self.failed_legs
+            self._working = [leg for leg in _LEGS if leg[0] + 1 not in self.failed_legs]
+            self._neighbours = [(a[0], b[0]) for a, b in zip(self._working, self._working[1:]) if a[2] == b[2]]
+        return self._working, self._neighbours
+
+    def _pose(self, angles):
+        """Foot positions in the body frame (6 complex numbers, None for failed legs) and feet on
+        the ground (6 bools) for the joint angles"""
+        angles = angles.tolist() if isinstance(angles, np.ndarray) else list(angles)
+        working, neighbours = self._legs()
+        directions = [0.0] * N_LEGS
+        feet = [None] * N_LEGS
+        heights = [math.inf] * N_LEGS
+        for leg, mount_angle, side, mount in working:
+            directions[leg] = direction = mount_angle - side * angles[3*leg]
+            feet[leg] = mount + cmath.rect(LEG_REACH, direction)
+            heights[leg] = LIFT_LENGTH * math.sin(angles[3*leg + 1])
+        if self.collision_fatal:
+            for i, j in neighbours:
+                if directions[j] - directions[i] < MIN_LEG_GAP:
+                    raise RuntimeError("Link collision during simulation")
+        ground = min(heights) + CONTACT_TOLERANCE
+        return feet, [height <= ground for height in heights]
+
+    def step(self):
+        """Moves the feet to the joint angles of the controller and the body with the feet on the ground"""
+        feet, contacts = self._pose(self.controller.joint_angles(self.t))
+        standing = [foot for foot, contact in zip(feet, contacts) if contact]
+        supported = False
+        if len(standing) >= 3:
+            xs = [foot.real for foot in standing]
+            ys = [foot.imag for foot in standing]
+            supported = max(xs) > 0 and min(xs) < 0 and max(ys) > 0 and min(ys) < 0
+        if len(standing) > 0 and self.feet is not None:
+            moved = sum(foot - previous for foot, previous, contact in zip(feet, self.feet, contacts) if contact)
+            displacement = moved / len(standing) * (1.0 if supported else SLIP)
+            self.position[0] -= displacement.real
+            self.position[1] -= displacement.imag
+        self.tilt = min(max(self.tilt + (-TIP_RATE if supported else TIP_RATE) * self.dt, 0.0), REST_TILT)
+        self.position[2] = BODY_HEIGHT * math.cos(self.tilt)
+        self.feet, self.contacts = feet, contacts
+        self.t += self.dt
+
+    def base_pos(self):
+        return tuple(self.position)
+
+    def supporting_legs(self):
+        """Feet on the ground after the last step (6,)"""
+        return np.array(self.contacts)
+
+    def _state(self):
+        return list(self.position), self.tilt, self.feet, list(self.contacts), self.t
+
+    def _restore(self, state):
+        position, self.tilt, self.feet, contacts, self.t = state
+        self.position, self.contacts = list(position), list(contacts)
+
+    def terminate(self):
+        pass
@@ -46,17 +46,14 @@ Takes in the following command line arguments:
     -m      --map                   : Which map number to plot
 """
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
-from scipy.spatial import Voronoi, voronoi_plot_2d
 import sys
-from matplotlib.ticker import FuncFormatter
-from sklearn.neighbors import KDTree
-import matplotlib.cm as cm
 import os
 import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+from pymap_elites import archive_io
+# matplotlib, scipy and sklearn are imported when plotting (load_data and load_centroids do not need them)
 
-my_cmap = cm.viridis # viridis jet
+my_cmap = "viridis" # viridis jet
 
 def voronoi_finite_polygons_2d(vor, radius=None):
     """Reconstruct infinite voronoi regions in a 2D diagram to finite regions.
@@ -137,7 +134,7 @@ def load_data(filename, dim,dim_x):
     """Reads in map/archive data
 
     Args:
-        filename: map file
+        filename: map file (text or binary, an up-to-date binary version of a text map is used instead)
         dim: number of dimensions (usually 6)
         dim_x: number of parameters used for MAP-Elites (32=ref, 156=cpg)
 
@@ -145,8 +142,9 @@ def load_data(filename, dim,dim_x):
         The fitness, descriptor and x value co-ordinates (not parameters!) for every controller in the map
         NOTE: x is not the parameters of the controller
     """
+    filename = archive_io.find_archive(filename)
     print("Loading ",filename)
-    data = np.loadtxt(filename)
+    data = archive_io.load_rows(filename, dim)
     fit = data[:, 0:1]
     desc = data[:,1: dim+1]
     x = data[:,dim+1:dim+1+dim_x]
@@ -180,6 +178,11 @@ def plot_cvt(ax, centroids, fit, desc, min_fit, max_fit):
         Scatter plot object. 
         NOTE:The scatter is already plotted by this function
     """
+    import matplotlib
+    import matplotlib.pyplot as plt
+    from scipy.spatial import Voronoi
+    from sklearn.neighbors import KDTree
+    cmap = plt.get_cmap(my_cmap)
     print("Voronoi...")
     vor = Voronoi(centroids[:,0:2])
     regions, vertices = voronoi_finite_polygons_2d(vor)
@@ -202,7 +205,7 @@ def plot_cvt(ax, centroids, fit, desc, min_fit, max_fit):
         index = q[1][0][0]
         region = regions[index]
         polygon = vertices[region]
-        color_map = my_cmap(norm(fit[i]))
+        color_map = cmap(norm(fit[i]))
         ax.fill(*zip(*polygon), alpha=0.9, color=color_map[0])
         k += 1
         if k % 100 == 0:
@@ -213,6 +216,7 @@ def plot_cvt(ax, centroids, fit, desc, min_fit, max_fit):
 
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
     parser = argparse.ArgumentParser(description='Plots a MAP-Elites map and saves it to figures folder.')
     parser.add_argument('-c','--controller', required=True, type=str,  default="CPG", help='Which controller to use ("CPG"/"REF")')
     parser.add_argument('-n','--niches',     required=True, type=int,  default=20, help='Number of niches (20 or 40)k')
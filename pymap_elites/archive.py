@@ -0,0 +1,238 @@
+"""Structure-of-arrays archive for CVT MAP-Elites
+
+The archive is indexed by the integer id of each niche (the row of the centroid in the CVT).
+Every field is stored in a single preallocated NumPy array sized to the number of niches, so
+selection, insertion, logging and saving never have to walk over Python objects.
+"""
+import numpy as np
+
+
+class Archive:
+    """Archive of elites stored as preallocated arrays indexed by niche id.
+
+    Args:
+        centroids: (n_niches, dim_map) array of CVT centroids
+        dim_x: number of parameters in a genome
+
+    Attributes:
+        centroids: centroid of every niche
+        fitness: fitness of the elite in every niche (-inf when the niche is empty)
+        desc: descriptor of the elite in every niche
+        x: genome of the elite in every niche
+        filled: occupancy mask of the niches
+        qd_score: sum of the fitness of the elites
+        max_fitness: fitness of the best elite (-inf when the archive is empty)
+        n_inserted, n_improved: number of elites added to an empty niche / replacing a worse elite so far
+    """
+
+    def __init__(self, centroids, dim_x):
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        n_niches, dim_map = self.centroids.shape
+        self.dim_map = dim_map
+        self.dim_x = dim_x
+        self.fitness = np.full(n_niches, -np.inf)
+        self.desc = np.zeros((n_niches, dim_map))
+        self.x = np.zeros((n_niches, dim_x))
+        self.filled = np.zeros(n_niches, dtype=bool)
+        # niche ids in the order they were first filled (keeps selection/saving order stable)
+        self._order = np.empty(n_niches, dtype=np.intp)
+        self._size = 0
+        # running statistics, updated in O(1) per insertion (see stats)
+        self.qd_score = 0.0
+        self.max_fitness = -np.inf
+        self.n_inserted = 0
+        self.n_improved = 0
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # archives pickled before the running statistics were kept
+        if 'qd_score' not in state:
+            fitness = self.fitness_values()
+            self.qd_score = float(fitness.sum())
+            self.max_fitness = float(fitness.max()) if self._size > 0 else -np.inf
+            self.n_inserted = self._size
+            self.n_improved = 0
+
+    @property
+    def n_niches(self):
+        return self.centroids.shape[0]
+
+    def __len__(self):
+        return self._size
+
+    def niches(self):
+        """Ids of the filled niches, in the order they were first filled"""
+        return self._order[:self._size]
+
+    def fitness_values(self):
+        """Fitness of every elite in the archive"""
+        return self.fitness[self.niches()]
+
+    def add(self, niche, x, desc, fitness):
+        """Adds an individual to a niche if the niche is empty or the individual is fitter.
+
+        Args:
+            niche: id of the niche the individual falls into
+            x: genome
+            desc: descriptor
+            fitness: fitness value
+
+        Returns:
+            1 if the individual was added to the archive, 0 otherwise
+        """
+        if self.filled[niche]:
+            if not fitness > self.fitness[niche]:
+                return 0
+            self.qd_score += fitness - self.fitness[niche]
+            self.n_improved += 1
+        else:
+            self.filled[niche] = True
+            self._order[self._size] = niche
+            self._size += 1
+            self.qd_score += fitness
+            self.n_inserted += 1
+        self.max_fitness = max(self.max_fitness, fitness)
+        self.fitness[niche] = fitness
+        self.desc[niche] = desc
+        self.x[niche] = x
+        return 1
+
+    def add_batch(self, niches, x, desc, fitness):
+        """Adds a batch of individuals, keeping the fittest individual for every niche.
+
+        Equivalent to calling add() for every individual in order: when several individuals
+        land in the same niche the fittest wins (the earliest on ties), and it replaces the
+        current elite only if it is strictly fitter. The running statistics count the same
+        insertions and improvements as add() would.
+
+        Args:
+            niches: (n,) niche id of every individual
+            x: (n, dim_x) genomes
+            desc: (n, dim_map) descriptors
+            fitness: (n,) fitness values
+
+        Returns:
+            ids of the niches whose elite changed
+        """
+        niches = np.asarray(niches, dtype=np.intp)
+        fitness = np.asarray(fitness, dtype=np.float64)
+        if niches.shape[0] == 0:
+            return niches
+        # best individual per niche: sort by niche, then by decreasing fitness (lexsort is stable)
+        order = np.lexsort((-fitness, niches))
+        sorted_niches = niches[order]
+        first = np.ones(order.shape[0], dtype=bool)
+        first[1:] = sorted_niches[1:] != sorted_niches[:-1]
+        best = order[first]
+        best_niches = sorted_niches[first]
+
+        improves = ~self.filled[best_niches] | (fitness[best] > self.fitness[best_niches])
+        best = best[improves]
+        best_niches = best_niches[improves]
+
+        # running statistics (an improved elite replaces its old fitness in the QD-score)
+        self.n_improved += self.__count_improvements(niches, fitness)
+        was_filled = self.filled[best_niches]
+        if best.shape[0] > 0:
+            self.qd_score += float(np.sum(fitness[best] - np.where(was_filled, self.fitness[best_niches], 0.0)))
+            self.max_fitness = max(self.max_fitness, float(fitness[best].max()))
+            self.n_inserted += int(np.sum(~was_filled))
+
+        # new niches are appended in the order their first individual arrived
+        new = best_niches[~was_filled]
+        if new.shape[0] > 0:
+            unique_niches, first_arrival = np.unique(niches, return_index=True)
+            new = new[np.argsort(first_arrival[np.searchsorted(unique_niches, new)])]
+            self.filled[new] = True
+            self._order[self._size:self._size + new.shape[0]] = new
+            self._size += new.shape[0]
+
+        self.fitness[best_niches] = fitness[best]
+        self.desc[best_niches] = np.asarray(desc)[best]
+        self.x[best_niches] = np.asarray(x)[best]
+        return best_niches
+
+    def __count_improvements(self, niches, fitness):
+        """Number of replacements add() would make for the batch, called for every individual in order
+
+        An individual replaces an elite when it is strictly fitter than the current elite of its niche
+        and than every earlier individual of the batch in that niche (the first individual to land in
+        an empty niche is an insertion, not a replacement).
+        """
+        # individuals grouped by niche, in the order they arrived within every group
+        order = np.argsort(niches, kind='stable')
+        sorted_niches, sorted_fitness = niches[order], fitness[order]
+        first = np.ones(order.shape[0], dtype=bool)
+        first[1:] = sorted_niches[1:] != sorted_niches[:-1]
+        # running maximum within every group: the ranks of the fitness values, offset by group, are
+        # increasing from one group to the next, so a single cumulative maximum does not leak across groups
+        _, ranks = np.unique(sorted_fitness, return_inverse=True)
+        offset = (np.cumsum(first) - 1) * (order.shape[0] + 1)
+        running = np.maximum.accumulate(offset + ranks) - offset
+        beats_batch = first.copy()
+        beats_batch[1:] |= ranks[1:] > running[:-1]
+        # an empty niche: its first individual is inserted, then the later ones only compete within the batch
+        filled = self.filled[sorted_niches]
+        beats_elite = ~filled | (sorted_fitness > self.fitness[sorted_niches])
+        return int(np.sum(beats_batch & beats_elite & ~(first & ~filled)))
+
+    def stats(self):
+        """Running QD statistics, without going over the elites
+
+        Returns:
+            dict with the archive size, coverage (fraction of the niches filled), QD-score (sum of
+            the fitness of the elites), max and mean fitness, and the number of elites inserted in an
+            empty niche / improved so far
+        """
+        return {
+            'size': self._size,
+            'coverage': self._size / self.n_niches,
+            'qd_score': self.qd_score,
+            'max': self.max_fitness,
+            'mean': self.qd_score / self._size if self._size > 0 else np.nan,
+            'inserted': self.n_inserted,
+            'improved': self.n_improved,
+        }
+
+    def percentiles(self, q=(5, 50, 95)):
+        """Percentiles of the fitness of the elites (a pass over the archive: see the log_percentile_period param)"""
+        if self._size == 0:
+            return [np.nan] * len(q)
+        return list(np.percentile(self.fitness_values(), q))
+
+    def sample_niches(self, n):
+        """Selects n filled niches uniformly at random
+
+        Returns:
+            (n,) array of niche ids
+        """
+        rand = np.random.randint(self._size, size=n)
+        return self._order[rand]
+
+    def sample(self, n):
+        """Selects n parents uniformly at random from the filled niches
+
+        Returns:
+            (n, dim_x) array of genomes
+        """
+        return self.x[self.sample_niches(n)]
+
+    @staticmethod
+    def from_species(species_archive, centroids, dim_x, index):
+        """Converts a legacy dict-of-Species archive (old checkpoints) to an Archive
+
+        Args:
+            species_archive: dict mapping centroid tuples to Species
+            centroids: the CVT centroids
+            dim_x: number of parameters in a genome
+            index: niche index built on the centroids
+
+        Returns:
+            the equivalent Archive
+        """
+        archive = Archive(centroids, dim_x)
+        species = list(species_archive.values())
+        niches = index.query(np.array([s.centroid for s in species]))
+        for niche, s in zip(niches, species):
+            archive.add(niche, s.x, s.desc, s.fitness)
+        return archive
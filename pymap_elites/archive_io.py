@@ -0,0 +1,170 @@
+"""Binary, memory-mappable archive (map) files
+
+The text archives written by MAP-Elites have one line per elite: fitness, centroid, descriptor
+and genome separated by spaces. Parsing them with np.loadtxt dominates the start-up time of every
+tool reading a map. The binary format stores the same data column by column:
+
+    Offset  Content
+    ______  ________________________________________________________________________
+    0       magic b"MAPELITE"
+    8       header length (uint32, little endian)
+    12      JSON header: rows, dim_map, dim_x, dtype and the byte offset of every block
+    ...     fitness (rows,), centroid (rows, dim_map), desc (rows, dim_map), x (rows, dim_x)
+            blocks, each starting on a 64-byte boundary
+
+Reading a binary archive maps the file in memory: nothing is parsed and only the columns that
+are used are read from disk. Text archives can still be written (export_text) and read
+(load_archive detects the format).
+"""
+import json
+import os
+import struct
+import numpy as np
+
+MAGIC = b"MAPELITE"
+BINARY_EXTENSION = ".bin"
+TEXT_EXTENSION = ".dat"
+COLUMNS = ["fitness", "centroid", "desc", "x"]
+ALIGNMENT = 64
+
+
+class ArchiveFile:
+    """Columns of an archive file (read-only memory maps for binary files)
+
+    Attributes:
+        fitness: (rows,) fitness of every elite
+        centroid: (rows, dim_map) centroid of the niche of every elite
+        desc: (rows, dim_map) descriptor of every elite
+        x: (rows, dim_x) genome of every elite
+    """
+
+    def __init__(self, fitness, centroid, desc, x):
+        self.fitness = fitness
+        self.centroid = centroid
+        self.desc = desc
+        self.x = x
+
+    def __len__(self):
+        return self.fitness.shape[0]
+
+    @property
+    def dim_map(self):
+        return self.centroid.shape[1]
+
+    @property
+    def dim_x(self):
+        return self.x.shape[1]
+
+    def rows(self):
+        """The archive in the layout of the text files: one row per elite (fitness, centroid, desc, x)"""
+        return np.hstack((self.fitness[:, None], self.centroid, self.desc, self.x))
+
+
+def is_binary(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def find_archive(filename):
+    """Returns the binary version of a text archive when there is an up-to-date one next to it
+
+    Args:
+        filename: archive file (e.g. maps/CPG/20k/map_1.dat)
+
+    Returns:
+        the file to read
+    """
+    root, extension = os.path.splitext(filename)
+    if extension == BINARY_EXTENSION:
+        return filename
+    binary = root + BINARY_EXTENSION
+    if os.path.exists(binary) and (not os.path.exists(filename) or os.path.getmtime(binary) >= os.path.getmtime(filename)):
+        return binary
+    return filename
+
+def save_archive(filename, fitness, centroid, desc, x, dtype=np.float64):
+    """Writes an archive in the binary format
+
+    Args:
+        filename: file to write
+        fitness: (rows,) fitness values
+        centroid: (rows, dim_map) centroids
+        desc: (rows, dim_map) descriptors
+        x: (rows, dim_x) genomes
+        dtype: np.float64 (exact) or np.float32 (half the size)
+    """
+    dtype = np.dtype(dtype)
+    blocks = [np.ascontiguousarray(fitness, dtype=dtype).reshape(-1),
+              np.ascontiguousarray(centroid, dtype=dtype),
+              np.ascontiguousarray(desc, dtype=dtype),
+              np.ascontiguousarray(x, dtype=dtype)]
+    rows = blocks[0].shape[0]
+    header = {"rows": rows, "dim_map": blocks[1].shape[1], "dim_x": blocks[3].shape[1], "dtype": dtype.str, "offsets": {}}
+    # the header length depends on the offsets: reserve room for them first
+    header_size = len(json.dumps(header)) + 32 * len(COLUMNS) + 64
+    offset = _align(len(MAGIC) + 4 + header_size)
+    for name, block in zip(COLUMNS, blocks):
+        header["offsets"][name] = offset
+        offset = _align(offset + block.nbytes)
+    encoded = json.dumps(header).encode().ljust(header_size)
+    with open(filename, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', header_size) + encoded)
+        for name, block in zip(COLUMNS, blocks):
+            f.seek(header["offsets"][name])
+            f.write(block.tobytes())
+        f.truncate(offset)
+
+def load_archive(filename, dim_map=6, mmap=True):
+    """Reads an archive file, binary or text
+
+    Args:
+        filename: archive file
+        dim_map: number of dimensions of the map (only needed for text files)
+        mmap: memory-map binary files (otherwise read them in memory)
+
+    Returns:
+        ArchiveFile
+    """
+    if not is_binary(filename):
+        data = np.loadtxt(filename, ndmin=2)
+        return ArchiveFile(data[:, 0], data[:, 1:dim_map+1], data[:, dim_map+1:2*dim_map+1], data[:, 2*dim_map+1:])
+    with open(filename, 'rb') as f:
+        f.seek(len(MAGIC))
+        header_size = struct.unpack('<I', f.read(4))[0]
+        header = json.loads(f.read(header_size).decode())
+    rows, dtype = header["rows"], np.dtype(header["dtype"])
+    shapes = {"fitness": (rows,), "centroid": (rows, header["dim_map"]), "desc": (rows, header["dim_map"]), "x": (rows, header["dim_x"])}
+    columns = {}
+    for name in COLUMNS:
+        if rows == 0:
+            columns[name] = np.zeros(shapes[name], dtype=dtype)
+        elif mmap:
+            columns[name] = np.memmap(filename, dtype=dtype, mode='r', offset=header["offsets"][name], shape=shapes[name])
+        else:
+            columns[name] = np.fromfile(filename, dtype=dtype, count=int(np.prod(shapes[name])), offset=header["offsets"][name]).reshape(shapes[name])
+    return ArchiveFile(columns["fitness"], columns["centroid"], columns["desc"], columns["x"])
+
+def load_rows(filename, dim_map=6):
+    """Reads an archive file (binary or text) as the rows of the text format"""
+    if not is_binary(filename):
+        return np.loadtxt(filename)
+    return load_archive(filename, dim_map).rows()
+
+def export_text(archive_file, filename):
+    """Writes an ArchiveFile in the text format (fitness, centroid, desc, genome on every line)"""
+    with open(filename, 'w') as f:
+        for row in archive_file.rows().tolist():
+            f.write(' '.join(map(str, row)) + ' \n')
+
+def convert(filename, dim_map=6, dtype=np.float64):
+    """Converts a text archive to a binary one next to it
+
+    Returns:
+        name of the binary file
+    """
+    binary = os.path.splitext(filename)[0] + BINARY_EXTENSION
+    a = load_archive(filename, dim_map)
+    save_archive(binary, a.fitness, a.centroid, a.desc, a.x, dtype)
+    return binary
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
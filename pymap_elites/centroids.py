@@ -0,0 +1,147 @@
+"""CVT construction and a binary cache of the centroids and their niche index
+
+The centroids of the CVT are the k-means clusters of uniform samples of the descriptor space.
+Three algorithms build them:
+
+    Name        Algorithm                                           Notes
+    _________   _________________________________________________   ______________________________
+    kmeans      sklearn KMeans (k-means++ init, full Lloyd)         original code, slow for 20k+ niches
+    minibatch   sklearn MiniBatchKMeans                             fast for small maps only (every
+                                                                    batch is compared to every centroid)
+    lloyd       Lloyd iterations, assignments with a cKDTree        fastest for large maps, stops when
+                (queries on all cores) from random samples          the quantization error stops improving
+
+A CVT is cached in centroids/cache/cvt-<key>.pkl, keyed by (k, dim, samples, seed, algorithm),
+together with the niche indexes built on it, so that a warm start only unpickles arrays. The
+centroids are also exported as text (centroids/centroids_<k>_<dim>[_<algorithm>_n<samples>_s<seed>].dat)
+for MBOA and the plots. Unseeded kmeans CVTs keep the original behaviour: they are exported to,
+and reused from, centroids/centroids_<k>_<dim>.dat whatever the number of samples.
+"""
+import os
+import pickle
+import time
+import numpy as np
+from pymap_elites.niche_index import make_niche_index, niche_index_kind
+
+CVT_ALGORITHMS = ["kmeans", "minibatch", "lloyd"]
+CENTROIDS_DIR = "centroids"
+CACHE_DIR = os.path.join(CENTROIDS_DIR, "cache")
+# Lloyd iterations stop when the quantization error improves by less than this (relative)
+LLOYD_TOL = 1e-3
+LLOYD_MAX_ITER = 50
+
+
+def cvt_key(k, dim, samples, seed=None, algorithm="kmeans"):
+    return "k{}-d{}-n{}-s{}-{}".format(k, dim, samples, seed, algorithm)
+
+def centroids_filename(k, dim, samples, seed=None, algorithm="kmeans"):
+    """Text export of the centroids (the original name for unseeded kmeans CVTs)"""
+    if seed is None and algorithm == "kmeans":
+        return os.path.join(CENTROIDS_DIR, 'centroids_{}_{}.dat'.format(k, dim))
+    return os.path.join(CENTROIDS_DIR, 'centroids_{}_{}_{}_n{}_s{}.dat'.format(k, dim, algorithm, samples, seed))
+
+def write_centroids(centroids, filename):
+    with open(filename, 'w') as f:
+        for p in centroids:
+            for item in p:
+                f.write(str(item) + ' ')
+            f.write('\n')
+
+def __lloyd(x, k, rng, max_iter=LLOYD_MAX_ITER, tol=LLOYD_TOL):
+    """Lloyd iterations from k random samples: nearest centroids with a cKDTree on all cores,
+    new centroids as the mean of their samples (empty clusters keep their centroid)"""
+    from scipy.spatial import cKDTree
+    c = x[rng.choice(x.shape[0], k, replace=False)].copy()
+    error = np.inf
+    for _ in range(max_iter):
+        dist, assignment = cKDTree(c).query(x, k=1, workers=-1)
+        new_error = np.mean(dist ** 2)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.stack([np.bincount(assignment, weights=x[:, j], minlength=k) for j in range(x.shape[1])], axis=1)
+        filled = counts > 0
+        c[filled] = sums[filled] / counts[filled, None]
+        if error - new_error < tol * new_error:
+            break
+        error = new_error
+    return c
+
+def build_cvt(k, dim, samples, seed=None, algorithm="kmeans"):
+    """Computes the centroids of a CVT
+
+    Args:
+        k: number of niches
+        dim: number of dimensions of the descriptors
+        samples: number of uniform samples clustered
+        seed: seed of the samples and of the clustering (None: numpy's global random state)
+        algorithm: "kmeans", "minibatch" or "lloyd"
+
+    Returns:
+        (k, dim) centroids
+    """
+    rng = np.random.RandomState(seed) if seed is not None else np.random.mtrand._rand
+    x = rng.rand(samples, dim)
+    if algorithm == "kmeans":
+        from sklearn.cluster import KMeans
+        k_means = KMeans(init='k-means++', n_clusters=k, n_init=1, verbose=1, random_state=seed)
+        return k_means.fit(x).cluster_centers_
+    if algorithm == "minibatch":
+        from sklearn.cluster import MiniBatchKMeans
+        # every batch must be large enough to update most of the centroids
+        k_means = MiniBatchKMeans(n_clusters=k, batch_size=max(4096, 2 * k), n_init=1, random_state=seed, reassignment_ratio=0.0)
+        return k_means.fit(x).cluster_centers_
+    if algorithm == "lloyd":
+        return __lloyd(x, k, rng)
+    raise Exception("Invalid CVT algorithm \"{}\" - use one of {}".format(algorithm, ", ".join(CVT_ALGORITHMS)))
+
+def __cache_filename(key):
+    return os.path.join(CACHE_DIR, "cvt-{}.pkl".format(key))
+
+def __read_cache(key):
+    try:
+        with open(__cache_filename(key), 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+def __write_cache(key, entry):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = __cache_filename(key) + ".{}.tmp".format(os.getpid())
+    with open(tmp, 'wb') as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, __cache_filename(key))
+
+def load_cvt(k, dim, samples, seed=None, algorithm="kmeans", index_kind="kdtree", use_cache=True):
+    """Returns the centroids of a CVT and a niche index on them, from the cache when possible
+
+    Args:
+        k, dim, samples, seed, algorithm: see build_cvt
+        index_kind: niche index (see niche_index.make_niche_index)
+        use_cache: read the cache (the CVT and index are written to it in any case)
+
+    Returns:
+        (k, dim) centroids, niche index
+    """
+    key = cvt_key(k, dim, samples, seed, algorithm)
+    kind = niche_index_kind(k, index_kind)
+    text_filename = centroids_filename(k, dim, samples, seed, algorithm)
+    entry = __read_cache(key) if use_cache else None
+    if entry is not None:
+        print("WARNING: using cached CVT:", __cache_filename(key))
+    elif use_cache and seed is None and algorithm == "kmeans" and os.path.isfile(text_filename):
+        print("WARNING: using cached CVT:", text_filename)
+        entry = {"centroids": np.loadtxt(text_filename), "indexes": {}, "build_time": None}
+    else:
+        print("Computing CVT (this can take a while...):", key)
+        start = time.perf_counter()
+        centroids = build_cvt(k, dim, samples, seed, algorithm)
+        entry = {"centroids": centroids, "indexes": {}, "build_time": time.perf_counter() - start}
+        print("CVT computed in {:.1f} s".format(entry["build_time"]))
+    updated = kind not in entry["indexes"]
+    if updated:
+        entry["indexes"][kind] = make_niche_index(entry["centroids"], kind)
+    if updated or not use_cache:
+        __write_cache(key, entry)
+    if not os.path.isfile(text_filename) or not use_cache:
+        os.makedirs(CENTROIDS_DIR, exist_ok=True)
+        write_centroids(entry["centroids"], text_filename)
+    return entry["centroids"], entry["indexes"][kind]
@@ -38,13 +38,13 @@
 #| had knowledge of the CeCILL license and that you accept its terms.
 #
 
-import math
 import numpy as np
 from pathlib import Path
 import sys
 import random
 from collections import defaultdict
-from sklearn.cluster import KMeans
+from pymap_elites import archive_io
+from pymap_elites import centroids as cvt_centroids
 
 default_params = \
     {
@@ -60,86 +60,139 @@ default_params = \
         "dump_period": 10000,
         # do we use several cores?
         "parallel": True,
+        # parallel backend: "process" (multiprocessing), "mpi" (mpi4py.futures) or "socket" (see executors.py)
+        "executor": "process",
+        # workers of the process pool, or socket workers started locally (None: all cores)
+        "num_workers": None,
+        # socket backend: address the master listens on, and workers expected from other hosts
+        "executor_address": "localhost:0",
+        "remote_workers": 0,
+        # longest task sent to a worker (s) at the observed time per row; the rows of a batch are sent
+        # in tasks of decreasing size so that the workers finish together (see dispatch.py)
+        "task_duration": 0.5,
         # do we cache the result of CVT and reuse?
         "cvt_use_cache": True,
+        # CVT construction: "kmeans" (original), "minibatch" or "lloyd" (see centroids.py), and the
+        # seed of the samples (None: numpy's global random state); the cache is keyed by both
+        "cvt_algorithm": "kmeans",
+        "cvt_seed": None,
+        # nearest-centroid index: "kdtree", "ckdtree", "brute" or "auto"
+        "niche_index": "kdtree",
+        # steady-state mode: new offspring are sent to the workers as soon as results arrive
+        # (no per-generation barrier); logs are then written every batch_size evaluations
+        "asynchronous": False,
+        # evaluations kept in flight in asynchronous mode (None = 2 per worker)
+        "async_in_flight": None,
+        # pass each offspring the fitness of its parents' elites so hopeless rollouts stop early
+        # (the fitness function must accept incumbent_fitness and return_info)
+        "early_termination_bound": False,
+        # multi-fidelity (when a screen_function is given): an offspring screened by the cheap
+        # evaluation gets the full evaluation if it lands in an empty niche or if its estimated
+        # fitness (screen fitness * screen_fitness_scale) is within screen_margin of the elite. At
+        # least a share screen_min_promoted of the screened offspring is promoted (the closest to
+        # their elites make up the difference), so a run progresses whatever the margin
+        "screen_fitness_scale": 1.0,
+        "screen_margin": 0.1,
+        "screen_min_promoted": 0.05,
+        # surrogate-assisted MAP-Elites (see surrogate.py): an ensemble of surrogate_models regressors,
+        # fitted to the latest surrogate_max_samples real evaluations once there are
+        # surrogate_min_samples, scores surrogate_pool candidate offspring per evaluation; those
+        # predicted to fill or improve a niche are evaluated, and for a share surrogate_explore the
+        # most uncertain ones. It is refitted in a background thread (surrogate_background=False:
+        # after every batch, so that a run with a surrogate_seed is reproducible)
+        "surrogate": False,
+        "surrogate_pool": 4,
+        "surrogate_explore": 0.25,
+        "surrogate_models": 5,
+        "surrogate_min_samples": 500,
+        "surrogate_max_samples": 20000,
+        "surrogate_background": True,
+        "surrogate_seed": None,
+        # the log percentiles (median, 5%, 95%) need a pass over the archive: without a text log
+        # (which has them on every line), compute them every this many records of the binary log only
+        # (max, mean, coverage and QD-score are kept up to date by the archive)
+        "log_percentile_period": 10,
+        # checkpoints: "journal" (snapshot at every dump + journal of the elites changed by every
+        # batch, see journal.py) or "pickle" (gzip pickle of the whole archive at every dump)
+        "checkpoint_mode": "journal",
+        # archive dumps: "binary" (memory-mappable, see archive_io), "text" or "both"
+        "archive_format": "binary",
+        # float type of the binary archive columns ("float64" or "float32")
+        "archive_dtype": "float64",
         # min/max of parameters
         "min": 0,
         "max": 1,
+        # distribution index of the 'sbx' variation operator (larger: offspring closer to the parents)
+        "sbx_eta": 10.0,
         # only useful if you use the 'iso_dd' variation operator
         "iso_sigma": 0.01,
         "line_sigma": 0.2
     }
 
 class Species:
-    def __init__(self, x, desc, fitness, centroid=None):
+    def __init__(self, x, desc, fitness, centroid=None, info=None):
         self.x = x
         self.desc = desc
         self.fitness = fitness
         self.centroid = centroid
+        # optional evaluation details (e.g. early termination) returned by the fitness function
+        self.info = info
 
 
-def polynomial_mutation(x):
+# The variation operators are vectorized: the *_batch versions take (batch, dim_x) matrices of
+# parents and return one offspring per row. Random numbers are drawn row by row in the same
+# order as the scalar versions, which are the batch versions applied to a single row, so a
+# given seed produces the same offspring whichever version is used.
+def polynomial_mutation_batch(x, params=default_params):
     """Cf Deb 2001, p 124 ; param: eta_m
     """
-    y = x.copy()
     eta_m = 5.0
-    r = np.random.random(size=len(x))
-    for i in range(0, len(x)):
-        if r[i] < 0.5:
-            delta_i = math.pow(2.0 * r[i], 1.0 / (eta_m + 1.0)) - 1.0
-        else:
-            delta_i = 1 - math.pow(2.0 * (1.0 - r[i]), 1.0 / (eta_m + 1.0))
-        y[i] = delta_i
-    return y
+    xl = params['min']
+    xu = params['max']
+    r = np.random.random(size=x.shape)
+    delta = np.where(r < 0.5,
+                     np.power(2.0 * r, 1.0 / (eta_m + 1.0)) - 1.0,
+                     1 - np.power(2.0 * (1.0 - r), 1.0 / (eta_m + 1.0)))
+    return np.clip(x + delta * (xu - xl), xl, xu)
 
-def sbx(x, y, params):
+
+def sbx_batch(x, y, params):
     """SBX (cf Deb 2001, p 113) Simulated Binary Crossover
 
     A large value ef eta gives a higher probablitity for
     creating a `near-parent' solutions and a small value allows
-    distant solutions to be selected as offspring.
+    distant solutions to be selected as offspring (param: sbx_eta).
     """
-    eta = 10.0
+    eta = params.get('sbx_eta', 10.0)
     xl = params['min']
     xu = params['max']
     z = x.copy()
-    r1 = np.random.random(size=len(x))
-    r2 = np.random.random(size=len(x))
+    r = np.random.random(size=(x.shape[0], 2, x.shape[1]))
+    r1 = r[:, 0]
+    r2 = r[:, 1]
 
-    for i in range(0, len(x)):
-        if abs(x[i] - y[i]) > 1e-15:
-            x1 = min(x[i], y[i])
-            x2 = max(x[i], y[i])
-
-            beta = 1.0 + (2.0 * (x1 - xl) / (x2 - x1))
+    cross = np.abs(x - y) > 1e-15
+    x1 = np.minimum(x, y)
+    x2 = np.maximum(x, y)
+    # genes with x1 == x2 are not crossed; their (invalid) values are masked out below
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        def beta_q(beta):
             alpha = 2.0 - beta ** -(eta + 1)
-            rand = r1[i]
-            if rand <= 1.0 / alpha:
-                beta_q = (rand * alpha) ** (1.0 / (eta + 1))
-            else:
-                beta_q = (1.0 / (2.0 - rand * alpha)) ** (1.0 / (eta + 1))
+            return np.where(r1 <= 1.0 / alpha,
+                            (r1 * alpha) ** (1.0 / (eta + 1)),
+                            (1.0 / (2.0 - r1 * alpha)) ** (1.0 / (eta + 1)))
 
-            c1 = 0.5 * (x1 + x2 - beta_q * (x2 - x1))
+        c1 = 0.5 * (x1 + x2 - beta_q(1.0 + (2.0 * (x1 - xl) / (x2 - x1))) * (x2 - x1))
+        c2 = 0.5 * (x1 + x2 + beta_q(1.0 + (2.0 * (xu - x2) / (x2 - x1))) * (x2 - x1))
 
-            beta = 1.0 + (2.0 * (xu - x2) / (x2 - x1))
-            alpha = 2.0 - beta ** -(eta + 1)
-            if rand <= 1.0 / alpha:
-                beta_q = (rand * alpha) ** (1.0 / (eta + 1))
-            else:
-                beta_q = (1.0 / (2.0 - rand * alpha)) ** (1.0 / (eta + 1))
-            c2 = 0.5 * (x1 + x2 + beta_q * (x2 - x1))
-
-            c1 = min(max(c1, xl), xu)
-            c2 = min(max(c2, xl), xu)
-
-            if r2[i] <= 0.5:
-                z[i] = c2
-            else:
-                z[i] = c1
+    c1 = np.minimum(np.maximum(c1, xl), xu)
+    c2 = np.minimum(np.maximum(c2, xl), xu)
+    child = np.where(r2 <= 0.5, c2, c1)
+    z[cross] = child[cross]
     return z
 
 
-def iso_dd(x, y, params):
+def iso_dd_batch(x, y, params):
     """Iso+Line
     Ref:
     Vassiliades V, Mouret JB. Discovering the elite hypervolume by leveraging interspecies correlation.
@@ -148,76 +201,115 @@ def iso_dd(x, y, params):
     assert(x.shape == y.shape)
     p_max = np.array(params["max"])
     p_min = np.array(params["min"])
-    a = np.random.normal(0, params['iso_sigma'], size=len(x))
-    b = np.random.normal(0, params['line_sigma'])
-    norm = np.linalg.norm(x - y)
+    # per row: dim_x isotropic samples, then the line sample
+    g = np.random.normal(0, 1, size=(x.shape[0], x.shape[1] + 1))
+    a = params['iso_sigma'] * g[:, :-1]
+    b = params['line_sigma'] * g[:, -1:]
     z = x.copy() + a + b * (x - y)
     return np.clip(z, p_min, p_max)
 
 
+def variation_batch(x, z, params):
+    assert(x.shape == z.shape)
+    y = sbx_batch(x, z, params)
+    return y
+
+
+def polynomial_mutation(x, params=default_params):
+    return polynomial_mutation_batch(x[None, :], params)[0]
+
+
+def sbx(x, y, params):
+    return sbx_batch(x[None, :], y[None, :], params)[0]
+
+
+def iso_dd(x, y, params):
+    return iso_dd_batch(x[None, :], y[None, :], params)[0]
+
+
 def variation(x, z, params):
     assert(x.shape == z.shape)
     y = sbx(x, z, params)
     return y
 
-def __centroids_filename(k, dim):
-    return 'centroids/centroids_' + str(k) + '_' + str(dim) + '.dat'
 
+__batch_operators = {
+    sbx: sbx_batch,
+    iso_dd: iso_dd_batch,
+    variation: variation_batch,
+}
 
-def __write_centroids(centroids):
-    k = centroids.shape[0]
-    dim = centroids.shape[1]
-    filename = __centroids_filename(k, dim)
-    with open(filename, 'w') as f:
-        for p in centroids:
-            for item in p:
-                f.write(str(item) + ' ')
-            f.write('\n')
 
+def batch_operator(variation_operator):
+    """Returns the batched version of a variation operator.
 
-def cvt(k, dim, samples, cvt_use_cache=True):
-    # check if we have cached values
-    fname = __centroids_filename(k, dim)
-    if cvt_use_cache:
-        if Path(fname).is_file():
-            print("WARNING: using cached CVT:", fname)
-            return np.loadtxt(fname)
-    # otherwise, compute cvt
-    print("Computing CVT (this can take a while...):", fname)
+    Known operators map to their vectorized counterparts; any other operator
+    is applied row by row.
 
-    x = np.random.rand(samples, dim)
-    k_means = KMeans(init='k-means++', n_clusters=k, n_init=1, verbose=1)#,algorithm="full")
-    # k_means = KMeans(init='k-means++', n_clusters=k, n_init=1, n_jobs=-1, verbose=1)#,algorithm="full")
-    k_means.fit(x)
-    __write_centroids(k_means.cluster_centers_)
+    Args:
+        variation_operator: operator taking two parent vectors and params
+
+    Returns:
+        operator taking two (batch, dim_x) parent matrices and params
+    """
+    if variation_operator in __batch_operators:
+        return __batch_operators[variation_operator]
+    def rowwise(x, y, params):
+        return np.array([variation_operator(x[i], y[i], params) for i in range(0, x.shape[0])])
+    return rowwise
 
-    return k_means.cluster_centers_
+
+def cvt(k, dim, samples, cvt_use_cache=True, seed=None, algorithm="kmeans"):
+    """Centroids of the CVT (see centroids.load_cvt, which also returns the niche index)"""
+    return cvt_centroids.load_cvt(k, dim, samples, seed, algorithm, use_cache=cvt_use_cache)[0]
 
 
 def make_hashable(array):
     return tuple(map(float, array))
 
 
-def parallel_eval(evaluate_function, to_evaluate, pool, params):
+def parallel_eval(evaluate_function, to_evaluate, pool, params, chunksize=10):
     if params['parallel'] == True:
-        s_list = pool.map(evaluate_function, to_evaluate, chunksize=10)
+        s_list = pool.map(evaluate_function, to_evaluate, chunksize=chunksize)
     else:
         s_list = map(evaluate_function, to_evaluate)
     return list(s_list)
 
+def submit_eval(evaluate_function, t, pool, params, callback, error_callback):
+    """Starts the evaluation of t without waiting for it; callback(result) is called once it is done.
+
+    Works with multiprocessing.Pool (apply_async) and concurrent.futures executors such as
+    MPIPoolExecutor (submit). The callbacks run in a background thread of the pool.
+    """
+    if params['parallel'] != True:
+        try:
+            result = evaluate_function(t)
+        except Exception as e:
+            error_callback(e)
+            return
+        callback(result)
+    elif hasattr(pool, 'apply_async'):
+        pool.apply_async(evaluate_function, (t,), callback=callback, error_callback=error_callback)
+    else:
+        def done(future):
+            if future.exception() is not None:
+                error_callback(future.exception())
+            else:
+                callback(future.result())
+        pool.submit(evaluate_function, t).add_done_callback(done)
+
 # format: fitness, centroid, desc, genome \n
 # fitness, centroid, desc and x are vectors
-def __save_archive(archive, gen, name_of_run=""):
+# (binary: one block per column, text: one line per elite)
+def __save_archive(archive, gen, name_of_run="", params=default_params):
     if name_of_run == None:
         name_of_run=""
-    def write_array(a, f):
-        for i in a:
-            f.write(str(i) + ' ')
-    filename = 'archive_' + str(name_of_run) + str(gen) + '.dat'
-    with open(filename, 'w') as f:
-        for k in archive.values():
-            f.write(str(k.fitness) + ' ')
-            write_array(k.centroid, f)
-            write_array(k.desc, f)
-            write_array(k.x, f)
-            f.write("\n")
+    niches = archive.niches()
+    columns = archive_io.ArchiveFile(archive.fitness[niches], archive.centroids[niches], archive.desc[niches], archive.x[niches])
+    filename = 'archive_' + str(name_of_run) + str(gen)
+    archive_format = params.get("archive_format", "binary")
+    if archive_format in ("binary", "both"):
+        archive_io.save_archive(filename + archive_io.BINARY_EXTENSION, columns.fitness, columns.centroid, columns.desc, columns.x,
+            dtype=params.get("archive_dtype", "float64"))
+    if archive_format in ("text", "both"):
+        archive_io.export_text(columns, filename + archive_io.TEXT_EXTENSION)
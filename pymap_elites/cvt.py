@@ -38,39 +38,325 @@
 #| had knowledge of the CeCILL license and that you accept its terms.
 
 import math
+import queue
 import numpy as np
-# from scipy.spatial import cKDTree : TODO -- faster?
-from sklearn.neighbors import KDTree
 from pymap_elites import common as cm
+from pymap_elites.archive import Archive
+from pymap_elites.niche_index import make_niche_index
+from pymap_elites.centroids import load_cvt
 from pymap_elites.pickler import Pickler
+from pymap_elites.journal import Journal
+from pymap_elites.stats_log import ArchiveLog
+from pymap_elites.dispatch import Dispatcher
+from pymap_elites.surrogate import Surrogate
 
-USE_MPI=False
-if USE_MPI==True:
-    from mpi4py.futures import MPIPoolExecutor
-else:
-    import multiprocessing
-
-def __add_to_archive(s, centroid, archive, kdt):
-    niche_index = kdt.query([centroid], k=1)[1][0][0]
-    niche = kdt.data[niche_index]
-    n = cm.make_hashable(niche)
-    s.centroid = n
-    if n in archive:
-        if s.fitness > archive[n].fitness:
-            archive[n] = s
-            return 1
-        return 0
-    else:
-        archive[n] = s
-        return 1
+def __make_dispatcher(f, screen_function, dim_x, dim_map, params, n_seeds=0):
+    """Sets up the parallel backend of params['executor'] (see executors.py), with f and screen_function
+    bound in the workers and room for the largest batch in the shared memory (see dispatch.py)"""
+    capacity = max(params['batch_size'], params['random_init_batch'], n_seeds)
+    return Dispatcher([f, screen_function], dim_x, dim_map, params, capacity=capacity)
+
+def __make_checkpointer(filename_prefix, params):
+    """Journal (snapshot + append-only journal) or Pickler (full gzip pickles) checkpoints, see params['checkpoint_mode']"""
+    if params['checkpoint_mode'] == "journal":
+        return Journal(filename_prefix)
+    return Pickler(filename_prefix)
+
+def __restore_checkpoint(filename):
+    """Restores a Journal or Pickler checkpoint
+
+    Returns:
+        archive (Archive, legacy dict of Species or batches of elites to replay), n_evals, to_evaluate, dim_map, n_niches
+    """
+    if Journal.is_checkpoint(filename):
+        return Journal.restore_checkpoint(filename)
+    return Pickler.restore_checkpoint(filename)
+
+def __kept(s):
+    """Whether the result of an evaluation stands for its genome: rollouts stopped early with a
+    meaningless descriptor, or with a fitness that is only a bound (see controller_tools), are not kept"""
+    return s.info is None or (s.info['descriptor_valid'] and s.info['fitness_valid'])
+
+def __stopped_by_bound(s):
+    """Whether the rollout was stopped by its incumbent bound (see __offspring): the descriptor at
+    the cutoff is valid, the fitness is only the distance walked so far"""
+    return (s.info is not None and 'incumbent_fitness' in s.info and s.info['terminated_early']
+        and s.info['descriptor_valid'] and not s.info['fitness_valid'])
+
+def __add_to_archive(s_list, archive, index):
+    """Inserts a whole batch of evaluated species: one nearest-centroid query,
+    a per-niche argmax and a single scatter into the archive.
+
+    A rollout stopped by its incumbent bound is inserted when its descriptor falls in an empty
+    niche (there is no elite to lose to there), with the distance walked so far as its fitness.
+
+    Returns:
+        ids of the niches whose elite changed
+    """
+    s_list = [s for s in s_list if __kept(s) or __stopped_by_bound(s)]
+    if len(s_list) == 0:
+        return np.empty(0, dtype=np.intp)
+    desc = np.array([s.desc for s in s_list])
+    niches = index.query(desc)
+    kept = np.array([__kept(s) for s in s_list]) | ~archive.filled[niches]
+    return archive.add_batch(niches[kept], np.array([s.x for s in s_list])[kept], desc[kept],
+        np.array([s.fitness for s in s_list])[kept])
+
+def __unsettled(s_list, archive, index, f):
+    """Rollouts stopped by their incumbent bound that have to be evaluated again without it
+
+    The bound comes from the parents (see __offspring) and the niche of the offspring is only known
+    at the cutoff: losing to the bound means losing to the elite of that niche only when the elite
+    is at least as fit as the bound. Those landing in an empty niche are kept as they are (see
+    __add_to_archive). Call before inserting the batch.
+
+    Returns:
+        the tasks (x, f) to evaluate again, without the bound
+    """
+    s_list = [s for s in s_list if __stopped_by_bound(s)]
+    if len(s_list) == 0:
+        return []
+    niches = index.query(np.array([s.desc for s in s_list]))
+    bounds = np.array([s.info['incumbent_fitness'] for s in s_list])
+    weaker = archive.filled[niches] & (archive.fitness[niches] < bounds)
+    return [(s.x, f) for s, again in zip(s_list, weaker) if again]
+
+def __offspring(archive, n, batch_variation, f, params):
+    """Selects parents in the archive and returns n offspring to evaluate
+
+    With params['early_termination_bound'], each offspring is given the fitness of the weaker of
+    its parents' elites, so the rollout can stop once it is out of reach. The result is then
+    settled against the niche the offspring lands in (see __add_to_archive and __unsettled).
+    """
+    # we select all the parents at the same time because randint is slow
+    niches_x = archive.sample_niches(n)
+    niches_y = archive.sample_niches(n)
+    # copy & add variation (whole batch at once)
+    offspring = batch_variation(archive.x[niches_x], archive.x[niches_y], params)
+    if not params['early_termination_bound']:
+        return [(z, f) for z in offspring]
+    incumbents = np.minimum(archive.fitness[niches_x], archive.fitness[niches_y])
+    return [(z, f, {"incumbent_fitness": b, "return_info": True}) for z, b in zip(offspring, incumbents)]
+
+def __make_surrogate(archive, params):
+    """Surrogate model of the fitness function (params['surrogate'], see surrogate.py), trained on
+    the elites of the archive to start with (restored runs), None when off"""
+    if not params['surrogate']:
+        return None
+    surrogate = Surrogate(archive.dim_x, archive.dim_map, params['surrogate_models'], params['surrogate_min_samples'],
+        params['surrogate_max_samples'], params['surrogate_background'], params['surrogate_seed'])
+    niches = archive.niches()
+    if len(niches) > 0:
+        surrogate.add(archive.x[niches], archive.fitness[niches], archive.desc[niches])
+    return surrogate
+
+def __add_to_surrogate(s_list, surrogate):
+    """Trains the surrogate on a batch of real evaluations (those kept, see __kept)"""
+    s_list = [s for s in s_list if __kept(s)]
+    if surrogate is not None and len(s_list) > 0:
+        surrogate.add(np.array([s.x for s in s_list]), [s.fitness for s in s_list], np.array([s.desc for s in s_list]))
+
+def __surrogate_select(candidates, n, surrogate, archive, index, params):
+    """Keeps the n candidate offspring most worth a real evaluation according to the surrogate
+
+    The candidates predicted to land in an empty niche come first (highest predicted fitness
+    first), then those predicted to improve the most on the elite of their niche. A share
+    params['surrogate_explore'] of the n are instead the most uncertain of the other candidates.
+    Until the surrogate has been fitted, the first n candidates are kept.
+    """
+    prediction = surrogate.predict(np.array([t[0] for t in candidates]))
+    if prediction is None:
+        return candidates[:n]
+    mean, _, uncertainty = prediction
+    niches = index.query(mean[:, 1:])
+    filled = archive.filled[niches]
+    gain = np.where(filled, mean[:, 0] - archive.fitness[niches], 0.0)
+    order = np.lexsort((-mean[:, 0], -gain, filled))
+    n_explore = int(round(n * params['surrogate_explore']))
+    rest = order[n - n_explore:]
+    chosen = np.concatenate([order[:n - n_explore], rest[np.argsort(-uncertainty[rest], kind='stable')[:n_explore]]])
+    return [candidates[i] for i in chosen]
 
+def __variation(archive, n, batch_variation, f, params, surrogate, index):
+    """n offspring to evaluate: picked by the surrogate among n * params['surrogate_pool'] candidates
+    when there is one (see __surrogate_select), straight from __offspring otherwise"""
+    if surrogate is None:
+        return __offspring(archive, n, batch_variation, f, params)
+    candidates = __offspring(archive, n * params['surrogate_pool'], batch_variation, f, params)
+    return __surrogate_select(candidates, n, surrogate, archive, index, params)
+
+def __surrogate_counts(surrogate):
+    return surrogate.counts() if surrogate is not None else None
+
+def __print_surrogate_counts(surrogate):
+    if surrogate is not None:
+        print("\nsurrogate: {} candidate offspring scored, fitted {} times".format(surrogate.scored, surrogate.n_fits))
+
+def __count_steps(step_counts, s_list):
+    """Adds up the simulated steps reported by the fitness function (return_info, requested with
+    early termination: the bound of params['early_termination_bound'] or policies bound to f)"""
+    for s in s_list:
+        if s.info is not None:
+            step_counts['steps'] += s.info['steps']
+            step_counts['max_steps'] += s.info['max_steps']
+            step_counts['terminated_early'] += int(s.info['terminated_early'])
+
+def __print_step_counts(step_counts):
+    if step_counts['max_steps'] > 0:
+        print("\nsimulated {} of {} steps ({:.1f}% saved), {} rollouts terminated early".format(
+            step_counts['steps'], step_counts['max_steps'],
+            100.0 * (1 - step_counts['steps'] / step_counts['max_steps']), step_counts['terminated_early']))
+
+def __promising(s_list, archive, index, params, fidelity_counts):
+    """Decides which screened (low-fidelity) species deserve the full evaluation, and counts them
+
+    At least a share params['screen_min_promoted'] of all the offspring screened so far is
+    promoted: when too few pass, those closest to the elite of their niche are added.
+
+    Returns:
+        boolean mask: True when the estimate lands in an empty niche or comes within
+        params['screen_margin'] of the elite of its niche
+    """
+    if len(s_list) == 0:
+        return np.zeros(0, dtype=bool)
+    niches = index.query(np.array([s.desc for s in s_list]))
+    estimates = np.array([s.fitness for s in s_list]) * params['screen_fitness_scale']
+    valid = np.array([__kept(s) for s in s_list])
+    filled = archive.filled[niches]
+    close = estimates >= archive.fitness[niches] - params['screen_margin']
+    promising = valid & (~filled | close)
+    fidelity_counts['screened'] += len(s_list)
+    missing = math.ceil(params['screen_min_promoted'] * fidelity_counts['screened']) - fidelity_counts['promoted'] - int(np.sum(promising))
+    if missing > 0:
+        gap = np.where(filled, estimates - archive.fitness[niches], np.inf)
+        others = np.flatnonzero(~promising)
+        promising[others[np.lexsort((-gap[others], ~valid[others]))[:missing]]] = True
+    fidelity_counts['promoted'] += int(np.sum(promising))
+    return promising
+
+def __screen(to_evaluate, screen_function, archive, index, dispatcher, params, fidelity_counts):
+    """First stage of the multi-fidelity evaluation: evaluates the offspring with the cheap
+    screen_function and keeps those worth a full evaluation (see __promising)"""
+    screened = dispatcher.evaluate([(t[0], screen_function) for t in to_evaluate])
+    promising = __promising(screened, archive, index, params, fidelity_counts)
+    return [t for t, keep in zip(to_evaluate, promising) if keep]
+
+def __make_log(log_file, stats_file, params, archive=None):
+    """ArchiveLog writing the text log and/or the binary statistics (None if neither is wanted)"""
+    if log_file is None and stats_file is None:
+        return None
+    return ArchiveLog(log_file, stats_file, params['log_percentile_period'], archive)
+
+def __print_fidelity_counts(fidelity_counts):
+    if fidelity_counts is not None and fidelity_counts['screened'] > 0:
+        print("\nscreened {} offspring, {} ({:.1f}%) promoted to the full evaluation".format(
+            fidelity_counts['screened'], fidelity_counts['promoted'],
+            100.0 * fidelity_counts['promoted'] / fidelity_counts['screened']))
+
+
+def __compute_async(f, dispatcher, archive, index, pickler, n_evals, max_evals, initial,
+                    random_init, params, log, batch_variation, dim_map, save_name, step_counts,
+                    screen_function=None, fidelity_counts=None, surrogate=None):
+    """Steady-state (asynchronous) main loop
+
+    Keeps params['async_in_flight'] evaluations running at all times: every result is inserted
+    into the archive as soon as it arrives and replaced by a new offspring whose parents are
+    sampled from the live archive, so no worker waits for the slowest rollout of a generation.
+    Archive dumps/checkpoints happen every dump_period evaluations and log lines every
+    batch_size evaluations. With a screen_function, offspring are first screened with it and
+    the promising ones are queued for the full evaluation (only full evaluations are counted).
+    With a surrogate, the offspring are picked among candidates scored by it (see __variation)
+    and it is trained on every result.
+
+    Args:
+        initial: individuals to evaluate before any variation (seeds or checkpointed individuals)
+        random_init: keep generating random individuals while the archive is this small
+        save_name: prefix of the saved archives (None to use the default)
+
+    Returns:
+        the number of evaluations and the individuals still to evaluate (for checkpointing)
+    """
+    dim_x = archive.dim_x
+    n_niches = archive.n_niches
+    target = params['async_in_flight'] or 2 * dispatcher.n_workers
+    dispatcher.reserve(target)
+    results = queue.Queue()
+    in_flight = {} # ticket -> (screening?, (genome, f[, kwargs]))
+    pending = [(x, f) for x in initial]
+    n_submitted = n_evals
+    b_evals = 0 # number evaluation since the last dump
+    l_evals = 0 # number evaluation since the last log line
+    next_ticket = 0
+
+    def new_individuals(n):
+        """Returns n (screening?, task) pairs"""
+        if len(pending) > 0:
+            batch = pending[:n]
+            del pending[:n]
+            return [(False, t) for t in batch]
+        if len(archive) == 0 or len(archive) <= random_init:
+            return [(False, (x, f)) for x in np.random.uniform(low=params['min'], high=params['max'], size=(n, dim_x))]
+        return [(screen_function is not None, t) for t in __variation(archive, n, batch_variation, f, params, surrogate, index)]
+
+    while n_evals < max_evals:
+        # keep the workers busy
+        n = min(target - len(in_flight), int(max_evals) - n_submitted)
+        if n > 0:
+            for screening, t in new_individuals(n):
+                in_flight[next_ticket] = (screening, t)
+                dispatcher.submit((t[0], screen_function) if screening else t,
+                    lambda s, ticket=next_ticket: results.put((ticket, s)),
+                    lambda e: results.put((None, e)))
+                next_ticket += 1
+                if not screening:
+                    n_submitted += 1
+        # wait for at least one result, then take everything that has arrived
+        done = [results.get()]
+        while not results.empty():
+            done.append(results.get_nowait())
+        s_list = []
+        screened, screened_tasks = [], []
+        for ticket, s in done:
+            if ticket is None:
+                raise s
+            screening, t = in_flight.pop(ticket)
+            if screening:
+                screened.append(s)
+                screened_tasks.append(t)
+            else:
+                s_list.append(s)
+        # promising offspring go to the front of the queue for the full evaluation
+        if len(screened) > 0:
+            promising = __promising(screened, archive, index, params, fidelity_counts)
+            pending[:0] = [t for t, keep in zip(screened_tasks, promising) if keep]
+        if len(s_list) == 0:
+            continue
+        # rollouts stopped by a bound the elite of their niche does not reach run again, unbounded
+        pending[:0] = __unsettled(s_list, archive, index, f)
+        # natural selection
+        changed = __add_to_archive(s_list, archive, index)
+        __add_to_surrogate(s_list, surrogate)
+        __count_steps(step_counts, s_list)
+        n_evals += len(s_list)
+        b_evals += len(s_list)
+        l_evals += len(s_list)
+        if pickler is not None:
+            pickler.record(archive, changed, n_evals)
+
+        to_evaluate = pending + [t for _, t in in_flight.values()]
+        # write archive
+        if b_evals >= params['dump_period'] and params['dump_period'] != -1:
+            print("[{}/{}]".format(n_evals, int(max_evals)), end=" ", flush=True)
+            cm.__save_archive(archive, n_evals, save_name, params)
+            if pickler is not None:
+                pickler.save_checkpoint(archive, n_evals, to_evaluate, dim_map, n_niches)
+            b_evals = 0
+        # write log
+        if log is not None and (l_evals >= params['batch_size'] or n_evals >= max_evals):
+            log.write(n_evals, archive, fidelity_counts, __surrogate_counts(surrogate))
+            l_evals = 0
+    return n_evals, pending
 
-# evaluate a single vector (x) with a function f and return a species
-# t = vector, function
-def __evaluate(t):
-    z, f = t  # evaluate z with function f
-    fit, desc = f(z)
-    return cm.Species(z, desc, fit)
 
 # map-elites algorithm (CVT variant)
 def compute(
@@ -84,11 +370,18 @@ def compute(
     variation_operator=cm.variation,
     seeded_individuals=None,
     checkpoint_filenameprefix=None,
+    screen_function=None,
+    stats_file=None,
     ):
     """CVT MAP-Elites algorithm
     
     Vassiliades V, Chatzilygeroudis K, Mouret JB. Using centroidal voronoi tessellations to scale up the multidimensional archive of phenotypic elites algorithm. IEEE Transactions on Evolutionary Computation. 2017 Aug 3;22(4):623-30.
     Format of the logfile: evals archive_size max mean median 5%_percentile, 95%_percentile
+    (followed by screened promoted, the number of offspring screened / promoted to the full
+    evaluation so far, when a screen_function is given, then by scored error, the candidate
+    offspring scored by the surrogate so far and its mean absolute fitness error on the evaluations
+    since the previous line, with params['surrogate']). The evaluations counted are the real
+    ones only: candidates rejected by the surrogate or by the screening are not.
 
     Args:
         checkpoint_file: File to restore from
@@ -99,86 +392,94 @@ def compute(
         log_file: file to log to
         variation_operator: evolutionary variation opperator to use 
         seeded_individuals: the individuals to seed the map with (optional) - used for CPG controller
+        screen_function: cheap low-fidelity version of f (e.g. a shorter rollout) used to screen the
+            offspring before the full evaluation (optional) - see the screen_* params
+        stats_file: binary log of the archive statistics (coverage, QD-score, insertions...) - see stats_log.py
     
     Returns:
         The map (archive)
     """
+    params = {**cm.default_params, **params}
     # setup the parallel processing pool
-    if USE_MPI:
-        pool = MPIPoolExecutor()
-    else:
-        num_cores = multiprocessing.cpu_count()
-        pool = multiprocessing.Pool(num_cores)
+    dispatcher = __make_dispatcher(f, screen_function, dim_x, dim_map, params,
+        len(seeded_individuals) if seeded_individuals is not None else 0)
 
-    # create the CVT
-    c = cm.cvt(n_niches, dim_map, params['cvt_samples'], params['cvt_use_cache'])
-    kdt = KDTree(c, leaf_size=30, metric='euclidean')
-    cm.__write_centroids(c)
+    # create the CVT (or load it and its niche index from the cache)
+    c, index = load_cvt(n_niches, dim_map, params['cvt_samples'], params['cvt_seed'], params['cvt_algorithm'],
+        params['niche_index'], params['cvt_use_cache'])
 
-    archive = {} # init archive (empty)
+    archive = Archive(c, dim_x) # init archive (empty)
+    log = __make_log(log_file, stats_file, params)
+    batch_variation = cm.batch_operator(variation_operator)
     n_evals = 0 # number of evaluations since the beginning
     b_evals = 0 # number evaluation since the last dump
     have_seeded_individuals = False
+    step_counts = {'steps': 0, 'max_steps': 0, 'terminated_early': 0}
+    fidelity_counts = {'screened': 0, 'promoted': 0} if screen_function is not None else None
+    surrogate = __make_surrogate(archive, params)
 
     # Checkpointer
-    pickler = Pickler(checkpoint_filenameprefix) 
+    pickler = __make_checkpointer(checkpoint_filenameprefix, params)
+    pickler.start(archive, n_evals, [], dim_map, n_niches)
+
+    to_evaluate = []
+    if params['asynchronous']:
+        random_init = params['random_init'] * n_niches if seeded_individuals is None else -1
+        n_evals, to_evaluate = __compute_async(f, dispatcher, archive, index, pickler, n_evals, max_evals,
+            seeded_individuals if seeded_individuals is not None else [], random_init,
+            params, log, batch_variation, dim_map, checkpoint_filenameprefix, step_counts,
+            screen_function, fidelity_counts, surrogate)
 
     # main loop
     while (n_evals < max_evals):
         to_evaluate = []
-        # random initialization
-        skip_variation_loop=False
-        if seeded_individuals is None:
-            if len(archive) <= params['random_init'] * n_niches:
-                for i in range(0, params['random_init_batch']):
-                    x = np.random.uniform(low=params['min'], high=params['max'], size=dim_x)
-                    to_evaluate += [(x, f)]
-                skip_variation_loop=True
-        elif (seeded_individuals is not None and not have_seeded_individuals):
+        if seeded_individuals is not None and not have_seeded_individuals:
             for i in range(0, len(seeded_individuals)):
                 x = seeded_individuals[i]
                 to_evaluate += [(x, f)]
             have_seeded_individuals = True
+        elif seeded_individuals is None and len(archive) <= params['random_init'] * n_niches:
+            # random initialization
+            for i in range(0, params['random_init_batch']):
+                x = np.random.uniform(low=params['min'], high=params['max'], size=dim_x)
+                to_evaluate += [(x, f)]
         else:  # variation/selection loop
-            if skip_variation_loop:
-                skip_variation_loop=False
-            else: 
-                keys = list(archive.keys())
-                # we select all the parents at the same time because randint is slow
-                rand1 = np.random.randint(len(keys), size=params['batch_size'])
-                rand2 = np.random.randint(len(keys), size=params['batch_size'])
-                for n in range(0, params['batch_size']):
-                    # parent selection
-                    x = archive[keys[rand1[n]]]
-                    y = archive[keys[rand2[n]]]
-                    # copy & add variation
-                    z = variation_operator(x.x, y.x, params)
-                    to_evaluate += [(z, f)]
+            to_evaluate += __variation(archive, params['batch_size'], batch_variation, f, params, surrogate, index)
+            if screen_function is not None:
+                to_evaluate = __screen(to_evaluate, screen_function, archive, index, dispatcher, params, fidelity_counts)
         # evaluation of the fitness for to_evaluate
-        s_list = cm.parallel_eval(__evaluate, to_evaluate, pool, params)
+        s_list = dispatcher.evaluate(to_evaluate)
+        # rollouts stopped by a bound the elite of their niche does not reach run again, unbounded
+        s_list += dispatcher.evaluate(__unsettled(s_list, archive, index, f))
         # natural selection
-        for s in s_list:
-            __add_to_archive(s, s.desc, archive, kdt)
+        changed = __add_to_archive(s_list, archive, index)
+        __add_to_surrogate(s_list, surrogate)
+        __count_steps(step_counts, s_list)
         # count evals
-        n_evals += len(to_evaluate)
-        b_evals += len(to_evaluate)
+        n_evals += len(s_list)
+        b_evals += len(s_list)
+        pickler.record(archive, changed, n_evals)
 
         # write archive
         if b_evals >= params['dump_period'] and params['dump_period'] != -1:
             print("[{}/{}]".format(n_evals, int(max_evals)), end=" ", flush=True)
-            cm.__save_archive(archive, n_evals, checkpoint_filenameprefix)
+            cm.__save_archive(archive, n_evals, checkpoint_filenameprefix, params)
             # if checkpoint_filename_prefix is not None:
             pickler.save_checkpoint(archive, n_evals, to_evaluate, dim_map, n_niches)
             b_evals = 0
         # write log
-        if log_file != None:
-            fit_list = np.array([x.fitness for x in archive.values()])
-            log_file.write("{} {} {} {} {} {} {}\n".format(n_evals, len(archive.keys()),
-                    fit_list.max(), np.mean(fit_list), np.median(fit_list),
-                    np.percentile(fit_list, 5), np.percentile(fit_list, 95)))
-            log_file.flush()
+        if log is not None:
+            log.write(n_evals, archive, fidelity_counts, __surrogate_counts(surrogate))
     # END - main loop
-    cm.__save_archive(archive, n_evals,name_of_run=checkpoint_filenameprefix)
+    dispatcher.close()
+    if surrogate is not None:
+        surrogate.close()
+    __print_step_counts(step_counts)
+    __print_fidelity_counts(fidelity_counts)
+    __print_surrogate_counts(surrogate)
+    if log is not None:
+        log.close()
+    cm.__save_archive(archive, n_evals,name_of_run=checkpoint_filenameprefix, params=params)
     # if checkpoint_filename_prefix is not None:
     pickler.save_checkpoint(archive, n_evals, to_evaluate, dim_map, n_niches)
     
@@ -192,11 +493,18 @@ def compute_from_checkpoint(
     params=cm.default_params,
     log_file=None,
     variation_operator=cm.variation,
-    seeded_individuals=True,):
+    seeded_individuals=True,
+    screen_function=None,
+    stats_file=None,):
     """CVT MAP-Elites algorithm
     
     Vassiliades V, Chatzilygeroudis K, Mouret JB. Using centroidal voronoi tessellations to scale up the multidimensional archive of phenotypic elites algorithm. IEEE Transactions on Evolutionary Computation. 2017 Aug 3;22(4):623-30.
     Format of the logfile: evals archive_size max mean median 5%_percentile, 95%_percentile
+    (followed by screened promoted, the number of offspring screened / promoted to the full
+    evaluation so far, when a screen_function is given, then by scored error, the candidate
+    offspring scored by the surrogate so far and its mean absolute fitness error on the evaluations
+    since the previous line, with params['surrogate']). The evaluations counted are the real
+    ones only: candidates rejected by the surrogate or by the screening are not.
 
     Args:
         checkpoint_file: File to restore from
@@ -207,35 +515,57 @@ def compute_from_checkpoint(
         log_file: file to log to
         variation_operator: evolutionary variation opperator to use 
         seeded_individuals: the individuals to seed the map with (optional) - used for CPG controller
+        screen_function: cheap low-fidelity version of f (e.g. a shorter rollout) used to screen the
+            offspring before the full evaluation (optional) - see the screen_* params
+        stats_file: binary log of the archive statistics (coverage, QD-score, insertions...) - see stats_log.py
 
     Returns:
         The map (archive)
     """
-    # setup the parallel processing pool
-    if USE_MPI:
-        pool = MPIPoolExecutor()
-    else:
-        num_cores = multiprocessing.cpu_count()
-        pool = multiprocessing.Pool(num_cores)
+    params = {**cm.default_params, **params}
 
     # load the checkpoint
-    archive, n_evals, to_evaluate, dim_map, n_niches = Pickler.restore_checkpoint(checkpoint_file)
+    archive, n_evals, to_evaluate, dim_map, n_niches = __restore_checkpoint(checkpoint_file)
     to_evaluate_seed = []
-    for x,y in to_evaluate:
-        to_evaluate_seed += [(x, f)]
+    for t in to_evaluate:
+        to_evaluate_seed += [(t[0], f)]
 
-    # create the CVT
-    c = cm.cvt(n_niches, dim_map, params['cvt_samples'], params['cvt_use_cache'])
-    kdt = KDTree(c, leaf_size=30, metric='euclidean')
-    cm.__write_centroids(c)
+    # the centroids of the run: saved in the checkpoint (Archive), or the CVT of the same params
+    if isinstance(archive, Archive):
+        c, index = archive.centroids, make_niche_index(archive.centroids, params['niche_index'])
+    else:
+        c, index = load_cvt(n_niches, dim_map, params['cvt_samples'], params['cvt_seed'], params['cvt_algorithm'],
+            params['niche_index'], params['cvt_use_cache'])
 
+    # checkpoints written before the array-backed archive store a dict of Species
+    if isinstance(archive, dict):
+        archive = Archive.from_species(archive, c, len(next(iter(archive.values())).x), index)
+    # journal checkpoints store batches of elites to replay
+    elif isinstance(archive, list):
+        archive = Journal.replay(archive, Archive(c, archive[0][1].shape[1]))
     # archive = archive # init archive (empty)
+    # setup the parallel processing pool
+    dispatcher = __make_dispatcher(f, screen_function, archive.dim_x, dim_map, params, len(to_evaluate_seed))
+    log = __make_log(log_file, stats_file, params, archive)
+    batch_variation = cm.batch_operator(variation_operator)
     # n_evals = n_evals # number of evaluations since the beginning
     b_evals = 0 # number evaluation since the last dump
-    have_seeded_individuals = False
+    # nothing left to evaluate (journal restored after the snapshot): go on with the variation
+    have_seeded_individuals = len(to_evaluate_seed) == 0
+    step_counts = {'steps': 0, 'max_steps': 0, 'terminated_early': 0}
+    fidelity_counts = {'screened': 0, 'promoted': 0} if screen_function is not None else None
+    surrogate = __make_surrogate(archive, params)
 
     # Checkpointer
-    pickler = Pickler(checkpoint_file+"-cont-") 
+    pickler = __make_checkpointer(Journal.base_name(checkpoint_file)+"-cont-", params)
+    if continue_checkpointing:
+        pickler.start(archive, n_evals, to_evaluate_seed, dim_map, n_niches)
+
+    if params['asynchronous']:
+        n_evals, to_evaluate = __compute_async(f, dispatcher, archive, index,
+            pickler if continue_checkpointing else None, n_evals, max_evals,
+            [t[0] for t in to_evaluate_seed], -1, params, log, batch_variation, dim_map, None, step_counts,
+            screen_function, fidelity_counts, surrogate)
 
     # main loop
     while (n_evals < max_evals):
@@ -244,41 +574,42 @@ def compute_from_checkpoint(
             to_evaluate = to_evaluate_seed
             have_seeded_individuals = True
         else:  # variation/selection loop
-            keys = list(archive.keys())
-            # we select all the parents at the same time because randint is slow
-            rand1 = np.random.randint(len(keys), size=params['batch_size'])
-            rand2 = np.random.randint(len(keys), size=params['batch_size'])
-            for n in range(0, params['batch_size']):
-                # parent selection
-                x = archive[keys[rand1[n]]]
-                y = archive[keys[rand2[n]]]
-                # copy & add variation
-                z = variation_operator(x.x, y.x, params)
-                to_evaluate += [(z, f)]
+            to_evaluate += __variation(archive, params['batch_size'], batch_variation, f, params, surrogate, index)
+            if screen_function is not None:
+                to_evaluate = __screen(to_evaluate, screen_function, archive, index, dispatcher, params, fidelity_counts)
         # evaluation of the fitness for to_evaluate
-        s_list = cm.parallel_eval(__evaluate, to_evaluate, pool, params)
+        s_list = dispatcher.evaluate(to_evaluate)
+        # rollouts stopped by a bound the elite of their niche does not reach run again, unbounded
+        s_list += dispatcher.evaluate(__unsettled(s_list, archive, index, f))
         # natural selection
-        for s in s_list:
-            __add_to_archive(s, s.desc, archive, kdt)
+        changed = __add_to_archive(s_list, archive, index)
+        __add_to_surrogate(s_list, surrogate)
+        __count_steps(step_counts, s_list)
         # count evals
-        n_evals += len(to_evaluate)
-        b_evals += len(to_evaluate)
+        n_evals += len(s_list)
+        b_evals += len(s_list)
+        if continue_checkpointing:
+            pickler.record(archive, changed, n_evals)
 
         # write archive
         if b_evals >= params['dump_period'] and params['dump_period'] != -1:
             print("[{}/{}]".format(n_evals, int(max_evals)), end=" ", flush=True)
-            cm.__save_archive(archive, n_evals)
+            cm.__save_archive(archive, n_evals, params=params)
             if continue_checkpointing:
                 pickler.save_checkpoint(archive, n_evals, to_evaluate, dim_map, n_niches)
             b_evals = 0
         # write log
-        if log_file != None:
-            fit_list = np.array([x.fitness for x in archive.values()])
-            log_file.write("{} {} {} {} {} {} {}\n".format(n_evals, len(archive.keys()),
-                    fit_list.max(), np.mean(fit_list), np.median(fit_list),
-                    np.percentile(fit_list, 5), np.percentile(fit_list, 95)))
-            log_file.flush()
-    cm.__save_archive(archive, n_evals, name_of_run=checkpoint_file)
+        if log is not None:
+            log.write(n_evals, archive, fidelity_counts, __surrogate_counts(surrogate))
+    dispatcher.close()
+    if surrogate is not None:
+        surrogate.close()
+    __print_step_counts(step_counts)
+    __print_fidelity_counts(fidelity_counts)
+    __print_surrogate_counts(surrogate)
+    if log is not None:
+        log.close()
+    cm.__save_archive(archive, n_evals, name_of_run=checkpoint_file, params=params)
     if continue_checkpointing:
         pickler.save_checkpoint(archive, n_evals, to_evaluate, dim_map, n_niches)
     
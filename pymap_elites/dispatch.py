@@ -0,0 +1,182 @@
+"""Dispatch of the evaluations to the workers without pickling the genomes or the fitness function
+
+The fitness functions (f and the optional screen_function) are bound once, when a worker starts.
+With multiprocessing, the genomes of a batch are written to a shared-memory matrix, the workers
+receive only ranges of rows and write the fitness, descriptor and evaluation details of every row
+to a shared result matrix. With the MPI and socket backends (workers possibly on other nodes, see
+executors.py), every task carries its block of rows as a single array and returns the block of
+results. The worker side is in worker.py. Result row layout:
+
+    Columns             Content
+    _________________   _______________________________________________________________
+    0                   fitness
+    1 .. dim_map        descriptor
+    dim_map + 1         1 if the fitness function returned an info dict (return_info), else 0
+    dim_map + 2 ..      info: descriptor_valid, steps, max_steps, terminated_early, fitness_valid
+
+The rows of a batch are split into tasks of decreasing size (guided scheduling, see task_sizes):
+each task takes 1 / (2 * n_workers) of the rows left, so the first tasks are large (few messages)
+and the last ones are small (no worker is left with a long task at the end of the batch). No task
+holds more rows than fit in params['task_duration'] seconds at the observed time per row.
+"""
+import numpy as np
+from pymap_elites import common as cm
+from pymap_elites import executors
+from pymap_elites.worker import INFO_KEYS, init_worker, evaluate_rows, evaluate_block
+
+def task_sizes(n, n_workers, row_time, task_duration):
+    """Rows of each task of a batch of n rows (guided scheduling)
+
+    Args:
+        row_time: observed time to evaluate a row (s), None if unknown
+        task_duration: longest wanted task (s)
+    """
+    max_rows = n if row_time is None or row_time <= 0 else max(1, int(task_duration / row_time))
+    sizes = []
+    left = n
+    while left > 0:
+        sizes.append(min(max_rows, max(1, -(-left // (2 * n_workers)))))
+        left -= sizes[-1]
+    return sizes
+
+
+class Dispatcher:
+    """Evaluates batches (or, in asynchronous mode, single individuals) on a pool of workers
+
+    Args:
+        functions: the fitness functions the tasks can refer to (f, screen_function, ...)
+        dim_x: size of the genomes
+        dim_map: size of the descriptors
+        params: CVT MAP-Elites parameters (the backend, see executors.make_executor, and "task_duration")
+        capacity: initial number of rows of the shared matrices (grown when needed)
+    """
+    def __init__(self, functions, dim_x, dim_map, params, capacity=0):
+        self.functions = list(functions)
+        self.dim_x = dim_x
+        self.dim_map = dim_map
+        self.width = dim_map + 2 + len(INFO_KEYS)
+        self.params = params
+        # remote workers get blocks of rows, local workers share memory (serial runs use the same code)
+        self.blocks = not executors.shares_memory(params)
+        self.capacity = 0
+        self.shm = []
+        self.free_slots = []
+        # observed evaluation time of a row (s)
+        self.row_time = None
+        # allocated before the workers start, so they share the resource tracker of this process
+        self.reserve(max(capacity, 1))
+        self.pool, self.n_workers = executors.make_executor(params, init_worker, (self.functions,))
+
+    def reserve(self, n):
+        """Makes room for n rows (the matrices are reallocated, so nothing may be in flight)"""
+        if n <= self.capacity:
+            return
+        self.__release()
+        self.capacity = n
+        if self.blocks:
+            self.genomes = np.zeros((n, self.dim_x))
+            self.incumbents = np.zeros(n)
+            self.results = np.zeros((n, self.width))
+        else:
+            from multiprocessing import shared_memory
+            arrays = []
+            for shape in [(n, self.dim_x), (n,), (n, self.width)]:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))) * 8)
+                self.shm.append((shm, shape))
+                arrays.append(np.ndarray(shape, dtype=np.float64, buffer=shm.buf))
+            self.genomes, self.incumbents, self.results = arrays
+        self.free_slots = list(range(n))
+
+    def __release(self):
+        self.genomes = self.incumbents = self.results = None
+        for shm, _ in self.shm:
+            shm.close()
+            shm.unlink()
+        self.shm = []
+
+    def close(self):
+        """Stops the workers and frees the shared memory"""
+        executors.close_executor(self.pool)
+        self.pool = None
+        self.__release()
+
+    def __function_id(self, f):
+        for i, g in enumerate(self.functions):
+            if g is f:
+                return i
+        raise Exception("The fitness function of the task was not given to the Dispatcher")
+
+    def __write(self, t, row):
+        """Writes the genome (and the incumbent fitness) of task t = (x, f[, kwargs]) to a row
+
+        Returns:
+            the id of the function and whether the evaluation is bounded (early termination)
+        """
+        self.genomes[row] = t[0]
+        bounded = len(t) > 2
+        if bounded:
+            self.incumbents[row] = t[2]["incumbent_fitness"]
+        return self.__function_id(t[1]), bounded
+
+    def __species(self, t, row):
+        """Species of task t from a (copied) result row (the info of a bounded task also holds its incumbent_fitness)"""
+        info = None
+        if row[1 + self.dim_map]:
+            values = row[2 + self.dim_map:]
+            info = {"descriptor_valid": bool(values[0]), "steps": int(values[1]), "max_steps": int(values[2]),
+                "terminated_early": bool(values[3]), "fitness_valid": bool(values[4])}
+            if len(t) > 2:
+                info["incumbent_fitness"] = t[2]["incumbent_fitness"]
+        return cm.Species(t[0], row[1:1 + self.dim_map], row[0], info=info)
+
+    def __task(self, function_id, start, end, bounded):
+        if self.blocks:
+            return (function_id, self.genomes[start:end].copy(),
+                self.incumbents[start:end].copy() if bounded else None, self.width)
+        return ([(shm.name, shape) for shm, shape in self.shm], function_id, start, end, bounded)
+
+    def evaluate(self, to_evaluate):
+        """Evaluates a batch of tasks (x, f[, kwargs]) that all use the same function and kwargs
+
+        Returns:
+            the list of Species, in the order of to_evaluate
+        """
+        n = len(to_evaluate)
+        if n == 0:
+            return []
+        self.reserve(n)
+        for i, t in enumerate(to_evaluate):
+            function_id, bounded = self.__write(t, i)
+        ends = np.cumsum(task_sizes(n, self.n_workers, self.row_time, self.params['task_duration']))
+        tasks = [self.__task(function_id, int(end - size), int(end), bounded)
+            for end, size in zip(ends, np.diff(ends, prepend=0))]
+        if self.blocks:
+            replies = cm.parallel_eval(evaluate_block, tasks, self.pool, self.params, chunksize=1)
+            self.results[:n] = np.concatenate([results for results, _ in replies])
+            durations = [duration for _, duration in replies]
+        else:
+            durations = cm.parallel_eval(evaluate_rows, tasks, self.pool, self.params, chunksize=1)
+        # time per row, averaged over the recent batches
+        row_time = sum(durations) / n
+        self.row_time = row_time if self.row_time is None else 0.5 * (self.row_time + row_time)
+        results = self.results[:n].copy()
+        return [self.__species(t, row) for t, row in zip(to_evaluate, results)]
+
+    def submit(self, t, callback, error_callback):
+        """Starts the evaluation of task t = (x, f[, kwargs]); callback(species) is called once it is done.
+        At most capacity evaluations (see reserve) may be in flight."""
+        slot = self.free_slots.pop()
+        function_id, bounded = self.__write(t, slot)
+
+        def done(result):
+            if self.blocks:
+                self.results[slot] = result[0][0]
+            s = self.__species(t, self.results[slot].copy())
+            self.free_slots.append(slot)
+            callback(s)
+
+        def failed(e):
+            self.free_slots.append(slot)
+            error_callback(e)
+        cm.submit_eval(evaluate_block if self.blocks else evaluate_rows, self.__task(function_id, slot, slot + 1, bounded),
+            self.pool, self.params, done, failed)
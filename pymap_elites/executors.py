@@ -0,0 +1,201 @@
+"""Parallel backends of the evaluations, selected at runtime (params['executor'], generate_map -ex)
+
+    Name        Backend                                             Workers
+    _________   _________________________________________________   ______________________________
+    serial      no pool, evaluations in the main process            -
+    process     multiprocessing.Pool                                num_workers (default: all cores)
+    mpi         mpi4py.futures.MPIPoolExecutor                      the MPI processes but the master
+                (run with mpirun ... python3 -m mpi4py.futures)
+    socket      SocketExecutor: workers connected to the master     num_workers started locally, plus
+                through sockets (multiprocessing.connection)        any started on other hosts
+
+The process pool shares memory with the master (see dispatch.py), the other backends send the
+genomes with every task. A socket worker on another host runs, from the highest level in the
+directory tree and with the same PYMAP_ELITES_AUTHKEY environment variable as the master:
+```bash
+python3 -m pymap_elites.executors --connect <master host>:<port>
+```
+"""
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+import queue
+import socket
+import sys
+import threading
+from multiprocessing.connection import Listener, Client
+
+EXECUTORS = ["serial", "process", "mpi", "socket"]
+AUTHKEY_VARIABLE = "PYMAP_ELITES_AUTHKEY"
+
+
+def parse_address(address):
+    """"host:port" -> (host, port)"""
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+def _authkey():
+    if AUTHKEY_VARIABLE not in os.environ:
+        # only the local workers, which inherit it, can connect
+        os.environ[AUTHKEY_VARIABLE] = os.urandom(16).hex()
+    return os.environ[AUTHKEY_VARIABLE].encode()
+
+def _no_delay(connection):
+    """Disables Nagle's algorithm: Connection.send writes the header of a large message separately,
+    which would otherwise wait for the delayed acknowledgement of the previous segment"""
+    s = socket.socket(fileno=os.dup(connection.fileno()))
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    s.close()
+
+def serve(address, authkey):
+    """Socket worker: runs the initializer sent by the master, then the tasks, until told to stop"""
+    with Client(address, authkey=authkey) as connection:
+        _no_delay(connection)
+        initializer, initargs = connection.recv()
+        if initializer is not None:
+            initializer(*initargs)
+        while True:
+            message = connection.recv()
+            if message is None:
+                return
+            fn, arg = message
+            try:
+                result = (True, fn(arg))
+            except Exception as e:
+                result = (False, e)
+            connection.send(result)
+
+
+class SocketExecutor(concurrent.futures.Executor):
+    """Executor whose workers are processes connected through sockets, on this host or others
+
+    The initializer and its arguments are sent once to every worker when it connects; every task is
+    then a pickled (function, argument) pair. Each connected worker has a thread of the master that
+    feeds it one task at a time from a shared queue, so a worker that joins late simply starts
+    taking tasks and a worker that disconnects fails only its current task.
+
+    Args:
+        n_workers: number of workers started on this host
+        address: "host:port" the master listens on (port 0: any free port)
+        initializer, initargs: run by every worker before its first task
+    """
+    def __init__(self, n_workers, address="localhost:0", initializer=None, initargs=()):
+        self.authkey = _authkey()
+        self.listener = Listener(parse_address(address), authkey=self.authkey)
+        self.address = self.listener.address
+        self.init = (initializer, initargs)
+        self.tasks = queue.Queue()
+        self.n_connected = 0
+        self.closed = False
+        self.local_workers = [multiprocessing.Process(target=serve, args=(self.address, self.authkey), daemon=True) for _ in range(n_workers)]
+        for p in self.local_workers:
+            p.start()
+        threading.Thread(target=self.__accept, daemon=True).start()
+        print("socket executor listening on {}:{}".format(socket.getfqdn() if self.address[0] in ("", "0.0.0.0") else self.address[0], self.address[1]))
+
+    def __accept(self):
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError):
+                if self.closed:
+                    return
+                continue
+            _no_delay(connection)
+            connection.send(self.init)
+            self.n_connected += 1
+            threading.Thread(target=self.__feed, args=(connection,), daemon=True).start()
+
+    def __feed(self, connection):
+        """Sends the tasks of the queue to one worker"""
+        while True:
+            item = self.tasks.get()
+            if item is None:
+                try:
+                    connection.send(None)
+                    connection.close()
+                except OSError:
+                    pass
+                return
+            future, fn, arg = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                connection.send((fn, arg))
+                ok, result = connection.recv()
+            except (OSError, EOFError) as e:
+                future.set_exception(e)
+                self.n_connected -= 1
+                return
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+    def submit(self, fn, arg):
+        future = concurrent.futures.Future()
+        self.tasks.put((future, fn, arg))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.closed = True
+        for _ in range(max(self.n_connected, len(self.local_workers))):
+            self.tasks.put(None)
+        self.listener.close()
+        if wait:
+            for p in self.local_workers:
+                p.join(timeout=10)
+
+
+def executor_kind(params):
+    """params['executor'], or "serial" when params['parallel'] is not True"""
+    kind = params['executor'] if params['parallel'] == True else "serial"
+    if kind not in EXECUTORS:
+        raise Exception("Invalid executor \"{}\" - use one of {}".format(kind, ", ".join(EXECUTORS)))
+    return kind
+
+def shares_memory(params):
+    """Whether the workers of the backend run on this host, as children of this process"""
+    return executor_kind(params) in ("serial", "process")
+
+def make_executor(params, initializer=None, initargs=()):
+    """Starts the parallel backend of params (see executor_kind)
+
+    Args:
+        params: CVT MAP-Elites parameters ("parallel", "executor", "num_workers", "executor_address", "remote_workers")
+        initializer, initargs: run by every worker before its first task (by this process when serial)
+
+    Returns:
+        the pool (None when serial) and its number of workers
+    """
+    kind = executor_kind(params)
+    n_workers = params['num_workers'] or multiprocessing.cpu_count()
+    if kind == "serial":
+        if initializer is not None:
+            initializer(*initargs)
+        return None, 1
+    if kind == "process":
+        return multiprocessing.Pool(n_workers, initializer=initializer, initargs=initargs), n_workers
+    if kind == "mpi":
+        from mpi4py import MPI
+        from mpi4py.futures import MPIPoolExecutor
+        return MPIPoolExecutor(initializer=initializer, initargs=initargs), max(1, MPI.COMM_WORLD.Get_size() - 1)
+    executor = SocketExecutor(n_workers, params['executor_address'], initializer, initargs)
+    return executor, n_workers + params['remote_workers']
+
+def close_executor(pool):
+    if pool is None:
+        return
+    if hasattr(pool, 'terminate'):
+        pool.terminate()
+    else:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Socket worker of the MAP-Elites evaluations.')
+    parser.add_argument('--connect', required=True, type=str, help='host:port of the master')
+    args = parser.parse_args()
+    sys.path.append(os.path.abspath("."))
+    serve(parse_address(args.connect), os.environ[AUTHKEY_VARIABLE].encode())
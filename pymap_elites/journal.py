@@ -0,0 +1,237 @@
+"""Checkpoints made of a periodic snapshot of the archive and an append-only journal of its improvements
+
+The Pickler writes the whole archive to a new gzip-pickle at every dump, which gets slower and
+bigger as the archive fills up, and a crash loses everything since the last dump. The Journal
+instead appends, after every batch, only the elites that changed:
+
+    <prefix>journal.log     header (magic, dim_map, dim_x, n_niches), then one block per batch:
+                            n_evals and number of records (2 x int64), the random and
+                            numpy.random states after the batch (RANDOM_STATES bytes), then the
+                            records (niche, fitness, desc, x) as float64 rows
+    <prefix>journal.snap    the archive (elites in the order their niches were filled), the
+                            individuals to evaluate and the random and numpy.random states,
+                            rewritten (atomically) at a dump once the journal has grown bigger
+                            than the snapshot, after which the journal restarts
+
+Restoring replays the snapshot and then every complete block of the journal, and continues with
+the random states of the last block replayed, so a resumed run draws the same offspring as an
+uninterrupted one. Journals written before the blocks held the random states (MAGIC_V1) are still
+read, with the random states of the snapshot.
+"""
+import os
+import pickle
+import random
+import struct
+import numpy as np
+
+MAGIC_V1 = b"MEJRNL01"
+MAGIC = b"MEJRNL02"
+HEADER = struct.Struct('<qqq')
+BLOCK = struct.Struct('<qq')
+# random: 625 words of the Mersenne twister (with its position), numpy.random: 624 words of the
+# Mersenne twister, then numpy's position, has_gauss, cached_gaussian and random's gauss_next
+STATE_TAIL = struct.Struct('<qqd?d')
+RANDOM_STATES = 4 * 625 + 4 * 624 + STATE_TAIL.size
+
+
+def pack_random_states():
+    """The states of random and numpy.random as RANDOM_STATES bytes"""
+    _, internal, gauss_next = random.getstate()
+    _, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return (np.asarray(internal, dtype=np.uint32).tobytes() + np.asarray(keys, dtype=np.uint32).tobytes()
+            + STATE_TAIL.pack(pos, has_gauss, cached_gaussian, gauss_next is not None, gauss_next or 0.0))
+
+def unpack_random_states(data):
+    """Sets the states of random and numpy.random from bytes written by pack_random_states"""
+    internal = np.frombuffer(data, dtype=np.uint32, count=625)
+    keys = np.frombuffer(data, dtype=np.uint32, count=624, offset=4 * 625)
+    pos, has_gauss, cached_gaussian, has_gauss_next, gauss_next = STATE_TAIL.unpack_from(data, 4 * (625 + 624))
+    random.setstate((3, tuple(int(k) for k in internal), gauss_next if has_gauss_next else None))
+    np.random.set_state(("MT19937", keys.copy(), pos, has_gauss, cached_gaussian))
+
+
+class Journal:
+    """Snapshot + journal checkpoints (same interface as the Pickler)
+
+    Args:
+        filename_prefix: prefix of the snapshot and journal files
+        fsync: force every journal block to disk (survives power losses, not only crashes)
+    """
+    DEFAULT_FILENAME_PREFIX = "mapelites-checkpoint-"
+
+    def __init__(self, filename_prefix=DEFAULT_FILENAME_PREFIX, fsync=True):
+        if filename_prefix is None:
+            filename_prefix = self.DEFAULT_FILENAME_PREFIX
+        self.base = self.base_name(filename_prefix.replace(".bu", "") + "journal")
+        self.fsync = fsync
+        self.size = 0 # elites already in the snapshot + journal
+        self.bytes_written = 0
+        self.journal_bytes = 0 # size of the journal since the last snapshot
+        self.snapshot_bytes = 0
+
+    @staticmethod
+    def base_name(filename):
+        """<prefix>journal for <prefix>journal, <prefix>journal.snap or <prefix>journal.log"""
+        root, extension = os.path.splitext(filename)
+        return root if extension in (".snap", ".log") else filename
+
+    @staticmethod
+    def is_checkpoint(filename):
+        base = Journal.base_name(filename)
+        return os.path.exists(base + ".snap") or os.path.exists(base + ".log")
+
+    def start(self, archive, n_evals, to_evaluate, dim_map, n_niches):
+        """Writes the initial snapshot (empty archive or restored checkpoint)"""
+        self.snapshot(archive, n_evals, to_evaluate, dim_map, n_niches)
+
+    def record(self, archive, changed, n_evals):
+        """Appends the elites that changed in the last batch to the journal
+
+        Args:
+            archive: the archive
+            changed: ids of the niches whose elite changed
+            n_evals: number of evaluations so far
+        """
+        niches = archive.niches()
+        # new niches last, in the order they were filled, so that replaying rebuilds the same order
+        new = niches[self.size:]
+        improved = np.setdiff1d(changed, new)
+        ids = np.concatenate((improved, new)).astype(np.intp)
+        records = np.hstack((ids[:, None], archive.fitness[ids, None], archive.desc[ids], archive.x[ids]))
+        block = BLOCK.pack(int(n_evals), len(ids)) + pack_random_states() + records.astype(np.float64).tobytes()
+        with open(self.base + ".log", 'ab') as f:
+            f.write(block)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self.size = len(niches)
+        self.bytes_written += len(block)
+        self.journal_bytes += len(block)
+
+    def save_checkpoint(self, archive, n_evals, to_evaluate, dim_map, n_niches):
+        """Called at every dump: the journal already holds every change, so a new snapshot is only
+        written when replaying the journal would cost more than reading a snapshot
+
+        Args:
+            archive: the archive that stores all maps
+            n_evals: max number of evaluations
+            to_evaluate: parameters that need to be tested
+            dim_map: dimension of the map
+            n_niches: number of niches in the map (20k / 40k)
+        """
+        if self.journal_bytes >= self.snapshot_bytes:
+            self.snapshot(archive, n_evals, to_evaluate, dim_map, n_niches)
+
+    def snapshot(self, archive, n_evals, to_evaluate, dim_map, n_niches):
+        """Writes a snapshot of the archive and restarts the journal
+
+        Args:
+            archive: the archive that stores all maps
+            n_evals: max number of evaluations
+            to_evaluate: parameters that need to be tested
+            dim_map: dimension of the map
+            n_niches: number of niches in the map (20k / 40k)
+        """
+        niches = archive.niches().copy()
+        data = {
+            "n_evals": n_evals, "dim_map": dim_map, "n_niches": n_niches, "dim_x": archive.dim_x,
+            "niches": niches, "fitness": archive.fitness[niches], "desc": archive.desc[niches], "x": archive.x[niches],
+            "to_evaluate": np.array([t[0] for t in to_evaluate]).reshape(-1, archive.dim_x),
+            "random_state": random.getstate(), "np_random_state": np.random.get_state(),
+        }
+        tmp = self.base + ".snap.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.base + ".snap")
+        # blocks older than the snapshot would be skipped anyway: start a new journal
+        header = MAGIC + HEADER.pack(dim_map, archive.dim_x, n_niches)
+        with open(self.base + ".log", 'wb') as f:
+            f.write(header)
+        self.size = len(niches)
+        self.snapshot_bytes = os.path.getsize(self.base + ".snap")
+        self.journal_bytes = 0
+        self.bytes_written += self.snapshot_bytes + len(header)
+
+    @staticmethod
+    def read_journal(filename):
+        """Reads the complete blocks of a journal file
+
+        Returns:
+            dim_map, dim_x, n_niches and the list of (n_evals, records, random states) blocks
+            (random states: bytes for unpack_random_states, None in a MAGIC_V1 journal)
+        """
+        with open(filename, 'rb') as f:
+            data = f.read()
+        if data[:len(MAGIC)] not in (MAGIC, MAGIC_V1):
+            raise ValueError("{} is not a MAP-Elites journal".format(filename))
+        states_size = RANDOM_STATES if data[:len(MAGIC)] == MAGIC else 0
+        dim_map, dim_x, n_niches = HEADER.unpack_from(data, len(MAGIC))
+        width = 2 + dim_map + dim_x
+        blocks = []
+        offset = len(MAGIC) + HEADER.size
+        while offset + BLOCK.size <= len(data):
+            n_evals, n = BLOCK.unpack_from(data, offset)
+            start = offset + BLOCK.size + states_size
+            end = start + 8 * n * width
+            if end > len(data): # interrupted while writing this block
+                break
+            states = data[offset + BLOCK.size:start] if states_size > 0 else None
+            records = np.frombuffer(data, dtype=np.float64, count=n * width, offset=start).reshape(n, width)
+            blocks.append((n_evals, records, states))
+            offset = end
+        return dim_map, dim_x, n_niches, blocks
+
+    @staticmethod
+    def restore_checkpoint(filename):
+        """Restores previous state of MAP-Elites run from the snapshot and journal files.
+
+        Args:
+            filename: <prefix>journal (or the .snap/.log file)
+
+        Returns:
+            batches: list of (niches, x, desc, fitness) batches of elites to replay in order (see replay)
+            n_evals: max number of evaluations
+            to_evaluate: parameters that need to be tested
+            dim_map: dimension of the map
+            n_niches: number of niches in the map (20k / 40k)
+        """
+        base = Journal.base_name(filename)
+        batches, n_evals, to_evaluate = [], 0, []
+        dim_map = n_niches = None
+        if os.path.exists(base + ".snap"):
+            with open(base + ".snap", 'rb') as f:
+                data = pickle.load(f)
+            random.setstate(data["random_state"])
+            np.random.set_state(data["np_random_state"])
+            n_evals, dim_map, n_niches = data["n_evals"], data["dim_map"], data["n_niches"]
+            batches.append((data["niches"], data["x"], data["desc"], data["fitness"]))
+            to_evaluate = [(x,) for x in data["to_evaluate"]]
+        if os.path.exists(base + ".log"):
+            dim_map, dim_x, n_niches, blocks = Journal.read_journal(base + ".log")
+            states = None
+            for block_evals, records, block_states in blocks:
+                # a block written before the last snapshot (crash while rotating)
+                if block_evals <= n_evals:
+                    continue
+                n_evals = block_evals
+                # these batches were evaluated after the snapshot was taken
+                to_evaluate = []
+                batches.append((records[:, 0].astype(np.intp), records[:, 2+dim_map:], records[:, 2:2+dim_map], records[:, 1]))
+                states = block_states
+            # continue from the last batch replayed, not from the snapshot
+            if states is not None:
+                unpack_random_states(states)
+        return batches, n_evals, to_evaluate, dim_map, n_niches
+
+    @staticmethod
+    def replay(batches, archive):
+        """Adds the restored batches of elites to an (empty) archive
+
+        Returns:
+            the archive
+        """
+        for niches, x, desc, fitness in batches:
+            archive.add_batch(niches, x, desc, fitness)
+        return archive
@@ -0,0 +1,96 @@
+"""Nearest-centroid indexes used to assign descriptors to CVT niches
+
+All indexes share the same interface: they are built once from the centroids and
+`query(points)` returns the niche id (row of the closest centroid) of every point in
+a (n, dim_map) batch with a single call.
+
+    Name        Index                                       Notes
+    _________   _________________________________________   ______________________________
+    kdtree      sklearn.neighbors.KDTree                    default, same as the original code
+    ckdtree     scipy.spatial.cKDTree                       queries run on all cores
+    brute       NumPy/BLAS distance matrix                  fastest for small maps
+"""
+import numpy as np
+
+
+class KDTreeIndex:
+    """sklearn KDTree over the centroids"""
+
+    def __init__(self, centroids, leaf_size=30):
+        from sklearn.neighbors import KDTree
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.kdt = KDTree(self.centroids, leaf_size=leaf_size, metric='euclidean')
+
+    def query(self, points):
+        return self.kdt.query(np.asarray(points, dtype=np.float64), k=1, return_distance=False)[:, 0]
+
+
+class CKDTreeIndex:
+    """scipy cKDTree over the centroids
+
+    Args:
+        workers: number of threads used for a query (-1 = all cores)
+    """
+
+    def __init__(self, centroids, leafsize=16, workers=-1):
+        from scipy.spatial import cKDTree
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.tree = cKDTree(self.centroids, leafsize=leafsize)
+        self.workers = workers
+
+    def query(self, points):
+        return self.tree.query(np.asarray(points, dtype=np.float64), k=1, workers=self.workers)[1]
+
+
+class BruteForceIndex:
+    """Exhaustive search using |p - c|^2 = |c|^2 - 2 p.c (+ |p|^2, constant per point)
+
+    Args:
+        max_block: maximum number of entries in the distance block computed at once
+    """
+
+    def __init__(self, centroids, max_block=2**23):
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.sq_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        self.rows_per_block = max(1, max_block // self.centroids.shape[0])
+
+    def query(self, points):
+        points = np.asarray(points, dtype=np.float64)
+        niches = np.empty(points.shape[0], dtype=np.intp)
+        for start in range(0, points.shape[0], self.rows_per_block):
+            block = points[start:start + self.rows_per_block]
+            dist = self.sq_norms - 2.0 * (block @ self.centroids.T)
+            niches[start:start + self.rows_per_block] = np.argmin(dist, axis=1)
+        return niches
+
+
+NICHE_INDEXES = {
+    "kdtree": KDTreeIndex,
+    "ckdtree": CKDTreeIndex,
+    "brute": BruteForceIndex,
+}
+
+# below this number of niches the brute force search beats the trees
+AUTO_BRUTE_FORCE_MAX_NICHES = 2000
+
+
+def niche_index_kind(n_niches, kind="kdtree"):
+    """Resolves "auto" (brute force for small maps, cKDTree otherwise) and checks the kind"""
+    if kind == "auto":
+        kind = "brute" if n_niches <= AUTO_BRUTE_FORCE_MAX_NICHES else "ckdtree"
+    if kind not in NICHE_INDEXES:
+        raise Exception("Invalid niche index \"{}\" - use one of {}".format(kind, ", ".join(list(NICHE_INDEXES) + ["auto"])))
+    return kind
+
+
+def make_niche_index(centroids, kind="kdtree"):
+    """Builds a niche index over the centroids
+
+    Args:
+        centroids: (n_niches, dim_map) array of CVT centroids
+        kind: "kdtree", "ckdtree", "brute" or "auto" (brute force for small maps, cKDTree otherwise)
+
+    Returns:
+        The niche index
+    """
+    return NICHE_INDEXES[niche_index_kind(len(centroids), kind)](centroids)
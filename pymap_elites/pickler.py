@@ -3,7 +3,7 @@
 import pickle
 import gzip
 import random
-from unittest.mock import DEFAULT
+import numpy as np
 
 class Pickler:
     """Creates checkpoints in order to be able to stop and continue runs of the MAP-Elites algorithm 
@@ -18,6 +18,12 @@ class Pickler:
         if filename_prefix is None:
             self.filename_prefix = self.DEFAULT_FILENAME_PREFIX
 
+    def start(self, archive, n_evals, to_evaluate, dim_map, n_niches):
+        """Nothing to do before the first batch (full checkpoints are written at every dump)"""
+
+    def record(self, archive, changed, n_evals):
+        """Nothing to do after each batch (full checkpoints are written at every dump)"""
+
     def save_checkpoint(self, archive, n_evals, to_evaluate, dim_map, n_niches):
         """Saves current state of MAP-Elites runs to file.
 
@@ -28,7 +34,7 @@ class Pickler:
             dim_map: dimension of the map
             n_niches: number of niches in the map (20k / 40k)
         """
-        data = (archive, n_evals, to_evaluate, dim_map, n_niches, random.getstate())
+        data = (archive, n_evals, to_evaluate, dim_map, n_niches, random.getstate(), np.random.get_state())
 
         filename = '{0}{1}.bu'.format(self.filename_prefix.replace(".bu",""), n_evals)
         with gzip.open(filename, 'w', compresslevel=5) as f:
@@ -49,7 +55,11 @@ class Pickler:
             n_niches: number of niches in the map (20k / 40k)
         """
         with gzip.open(filename) as f:
-            archive, n_evals, to_evaluate, dim_map, n_niches, rndstate = pickle.load(f)
+            data = pickle.load(f)
+            archive, n_evals, to_evaluate, dim_map, n_niches, rndstate = data[:6]
             random.setstate(rndstate)
+            # checkpoints written before the numpy state was saved only have the random state
+            if len(data) > 6:
+                np.random.set_state(data[6])
             return (archive, n_evals, to_evaluate, dim_map, n_niches)
 
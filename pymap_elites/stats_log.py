@@ -0,0 +1,130 @@
+"""Log of the archive statistics during a MAP-Elites run: text log file and binary time series
+
+The text log keeps its format (evals archive_size max mean median 5%_percentile 95%_percentile
+[screened promoted] [scored error]). The binary log has one fixed-size record per log line (see COLUMNS) after
+a header:
+
+    Offset  Content
+    ______  ________________________________________________________________________
+    0       magic b"MESTATS1"
+    8       header length (uint32, little endian)
+    12      JSON header: the numpy dtype of the records
+    ...     records
+
+so read_stats loads a whole run as a numpy structured array in one read, and a run that was interrupted keeps every
+complete record.
+
+Max, mean, coverage and QD-score come from the running statistics of the archive. The
+percentiles need a pass over the archive: the text log has them on every line, the binary log
+only every percentile_period records (nan in between) when there is no text log to write.
+"""
+import json
+import struct
+import numpy as np
+
+MAGIC = b"MESTATS1"
+COLUMNS = [
+    ('n_evals', '<i8'),
+    ('size', '<i8'),
+    ('coverage', '<f8'),
+    ('qd_score', '<f8'),
+    ('max', '<f8'),
+    ('mean', '<f8'),
+    ('p5', '<f8'),
+    ('median', '<f8'),
+    ('p95', '<f8'),
+    ('inserted', '<i8'), # elites added to an empty niche since the previous record
+    ('improved', '<i8'), # elites replaced by a fitter one since the previous record
+    ('screened', '<i8'), # offspring screened / promoted to the full evaluation so far (multi-fidelity)
+    ('promoted', '<i8'),
+    ('surrogate_scored', '<i8'), # candidate offspring scored by the surrogate so far
+    ('surrogate_error', '<f8'), # its mean absolute fitness error on the evaluations since the previous record
+]
+DTYPE = np.dtype(COLUMNS)
+
+
+class ArchiveLog:
+    """Writes the statistics of the archive to the text log and/or the binary time series
+
+    Args:
+        log_file: open text file (or None)
+        stats_file: name of the binary file (or None)
+        percentile_period: compute the percentiles of the binary log every this many records
+            (the text log has them on every line)
+        archive: archive the run starts from (restored checkpoints), for the first insertion counts
+    """
+
+    def __init__(self, log_file=None, stats_file=None, percentile_period=1, archive=None):
+        self.log_file = log_file
+        self.stats_file = None
+        self.percentile_period = max(1, int(percentile_period))
+        self.n_lines = 0
+        self.inserted = archive.n_inserted if archive is not None else 0
+        self.improved = archive.n_improved if archive is not None else 0
+        if stats_file is not None:
+            header = json.dumps(DTYPE.descr).encode()
+            self.stats_file = open(stats_file, 'wb')
+            self.stats_file.write(MAGIC + struct.pack('<I', len(header)) + header)
+            self.stats_file.flush()
+
+    def write(self, n_evals, archive, fidelity_counts=None, surrogate_counts=None):
+        """Writes one line / record
+
+        Args:
+            n_evals: number of evaluations so far
+            archive: the archive
+            fidelity_counts: offspring screened / promoted so far (multi-fidelity runs)
+            surrogate_counts: offspring scored so far and prediction error (surrogate-assisted
+                runs, see surrogate.Surrogate.counts)
+        """
+        stats = archive.stats()
+        if self.log_file is not None or self.n_lines % self.percentile_period == 0:
+            p5, median, p95 = archive.percentiles()
+        else:
+            p5 = median = p95 = np.nan
+        self.n_lines += 1
+        if self.log_file is not None:
+            line = "{} {} {} {} {} {} {}".format(n_evals, stats['size'], stats['max'], stats['mean'], median, p5, p95)
+            if fidelity_counts is not None:
+                line += " {} {}".format(fidelity_counts['screened'], fidelity_counts['promoted'])
+            if surrogate_counts is not None:
+                line += " {} {}".format(surrogate_counts['scored'], surrogate_counts['error'])
+            self.log_file.write(line + "\n")
+            self.log_file.flush()
+        if self.stats_file is not None:
+            record = np.zeros(1, dtype=DTYPE)
+            record['n_evals'], record['size'], record['coverage'] = n_evals, stats['size'], stats['coverage']
+            record['qd_score'], record['max'], record['mean'] = stats['qd_score'], stats['max'], stats['mean']
+            record['p5'], record['median'], record['p95'] = p5, median, p95
+            record['inserted'] = stats['inserted'] - self.inserted
+            record['improved'] = stats['improved'] - self.improved
+            if fidelity_counts is not None:
+                record['screened'], record['promoted'] = fidelity_counts['screened'], fidelity_counts['promoted']
+            record['surrogate_error'] = np.nan
+            if surrogate_counts is not None:
+                record['surrogate_scored'], record['surrogate_error'] = surrogate_counts['scored'], surrogate_counts['error']
+            self.stats_file.write(record.tobytes())
+            self.stats_file.flush()
+        self.inserted, self.improved = stats['inserted'], stats['improved']
+
+    def close(self):
+        if self.stats_file is not None:
+            self.stats_file.close()
+            self.stats_file = None
+
+
+def read_stats(filename):
+    """Reads a binary statistics log
+
+    Returns:
+        structured array with one record per log line (fields: see COLUMNS)
+    """
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a MAP-Elites statistics log".format(filename))
+        header_size = struct.unpack('<I', f.read(4))[0]
+        dtype = np.dtype([tuple(c) for c in json.loads(f.read(header_size).decode())])
+        data = f.read()
+    # drop an incomplete last record (run interrupted while writing it)
+    n = len(data) // dtype.itemsize
+    return np.frombuffer(data, dtype=dtype, count=n).copy()
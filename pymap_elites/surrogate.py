@@ -0,0 +1,171 @@
+"""Surrogate model of the fitness function for surrogate-assisted MAP-Elites (params['surrogate'])
+
+An ensemble of regressors predicts the fitness and descriptor of a genome from the real
+evaluations made so far; the spread of its members' predictions is the uncertainty. The master
+oversamples offspring (params['surrogate_pool'] candidates per evaluation), scores them with the
+ensemble and only sends to the workers those predicted to improve their niche or fill an empty
+one, plus the most uncertain ones (params['surrogate_explore']), see cvt.py.
+
+Each member is a ridge regression on random Fourier features of the genome (an approximate GP
+with an RBF kernel) and on the genome itself (linear trends, which the RBF features of a 156
+dimensional genome miss), fitted to a bootstrap sample of the evaluations with random features of
+its own, so fitting and predicting are a few NumPy matrix products. The Surrogate keeps the latest
+params['surrogate_max_samples'] evaluations and refits the ensemble in a background thread
+whenever new evaluations arrive: the master adds evaluations and reads the latest ensemble
+without ever waiting for a fit (the first params['surrogate_min_samples'] evaluations are made
+without a model).
+
+Example:
+```python
+surrogate = Surrogate(dim_x=156, dim_map=6)
+surrogate.add(x, fitness, desc) # after every batch of real evaluations
+prediction = surrogate.predict(candidates) # None until the first ensemble is fitted
+if prediction is not None:
+    mean, std, uncertainty = prediction
+surrogate.close()
+```
+"""
+import threading
+import numpy as np
+
+N_FEATURES = 128 # random Fourier features per member
+RIDGE = 1e-3 # ridge penalty (targets are standardized)
+
+
+class Ensemble:
+    """Random-feature ridge regressors fitted to bootstrap samples of (x, y)
+
+    Args:
+        x: (n, dim_x) genomes
+        y: (n, dim_y) targets (fitness and descriptor)
+        n_models: members of the ensemble
+        rng: numpy RandomState
+    """
+
+    def __init__(self, x, y, n_models, rng):
+        n, dim_x = x.shape
+        self.offset = y.mean(axis=0)
+        self.scale = np.maximum(y.std(axis=0), 1e-12)
+        y = (y - self.offset) / self.scale
+        # median distance between two genomes as the length scale (median heuristic)
+        pairs = rng.randint(n, size=(min(1000, n * n), 2))
+        lengthscale = max(np.median(np.linalg.norm(x[pairs[:, 0]] - x[pairs[:, 1]], axis=1)), 1e-6)
+        self.center = x.mean(axis=0)
+        self.members = []
+        for _ in range(n_models):
+            w = rng.normal(scale=1.0 / lengthscale, size=(dim_x, N_FEATURES))
+            b = rng.uniform(0, 2 * np.pi, size=N_FEATURES)
+            sample = rng.randint(n, size=n)
+            features = self._features(x[sample], w, b)
+            gram = features.T @ features + RIDGE * n * np.eye(features.shape[1])
+            self.members.append((w, b, np.linalg.solve(gram, features.T @ y[sample])))
+
+    def _features(self, x, w, b):
+        return np.hstack([np.sqrt(2.0 / N_FEATURES) * np.cos(x @ w + b), x - self.center])
+
+    def predict(self, x):
+        """Mean and standard deviation of the members' predictions (n, dim_y), and the uncertainty
+        (n,): the standard deviation averaged over the standardized targets"""
+        predictions = np.array([self._features(x, w, b) @ coefficients for w, b, coefficients in self.members])
+        std = predictions.std(axis=0)
+        return predictions.mean(axis=0) * self.scale + self.offset, std * self.scale, std.mean(axis=1)
+
+
+class Surrogate:
+    """Keeps an Ensemble fitted to the latest real evaluations, refitted in a background thread
+
+    Args:
+        dim_x: genome size
+        dim_map: descriptor size
+        n_models: members of the ensemble
+        min_samples: evaluations needed before the first fit
+        max_samples: the ensemble is fitted to this many of the latest evaluations
+        background: refit in a background thread (False: refit in add(), for reproducible runs)
+        seed: seed of the bootstrap samples and random features
+    """
+
+    def __init__(self, dim_x, dim_map, n_models=5, min_samples=500, max_samples=20000, background=True, seed=None):
+        self.n_models = n_models
+        self.min_samples = min_samples
+        self.x = np.zeros((max_samples, dim_x))
+        self.y = np.zeros((max_samples, 1 + dim_map))
+        self.n_samples = 0 # evaluations added so far (the buffer keeps the last max_samples)
+        self.ensemble = None
+        self.n_fits = 0
+        self.rng = np.random.RandomState(seed)
+        # prediction error of the current ensemble on the evaluations added since the last counts()
+        self.scored = 0
+        self.errors = []
+        self.lock = threading.Lock()
+        self.new_samples = threading.Event()
+        self.closed = False
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self.__fit_loop, daemon=True)
+            self.thread.start()
+
+    def add(self, x, fitness, desc):
+        """Adds a batch of real evaluations
+
+        Args:
+            x: (n, dim_x) genomes
+            fitness: (n,) fitness
+            desc: (n, dim_map) descriptors
+        """
+        x = np.asarray(x, dtype=np.float64).reshape(-1, self.x.shape[1])
+        if len(x) == 0:
+            return
+        y = np.column_stack([fitness, desc])
+        ensemble = self.ensemble
+        if ensemble is not None:
+            # out-of-sample error: these evaluations were not part of the fit
+            self.errors.append(np.abs(ensemble.predict(x)[0][:, 0] - y[:, 0]))
+        x, y = x[-len(self.x):], y[-len(self.x):]
+        with self.lock:
+            rows = np.arange(self.n_samples, self.n_samples + len(x)) % len(self.x)
+            self.x[rows], self.y[rows] = x, y
+            self.n_samples += len(x)
+        if self.thread is not None:
+            self.new_samples.set()
+        else:
+            self.__fit()
+
+    def predict(self, x):
+        """Predictions of the latest ensemble for the genomes x: (mean, std, uncertainty), see
+        Ensemble.predict, or None while there is no ensemble"""
+        ensemble = self.ensemble
+        if ensemble is None:
+            return None
+        self.scored += len(x)
+        return ensemble.predict(np.asarray(x, dtype=np.float64))
+
+    def counts(self):
+        """Offspring scored so far and the mean absolute fitness error of the ensemble on the
+        evaluations added since the previous call (nan if none), for the statistics log"""
+        error = float(np.concatenate(self.errors).mean()) if len(self.errors) > 0 else np.nan
+        self.errors = []
+        return {'scored': self.scored, 'error': error}
+
+    def __fit(self):
+        with self.lock:
+            n = min(self.n_samples, len(self.x))
+            if n < self.min_samples:
+                return
+            x, y = self.x[:n].copy(), self.y[:n].copy()
+        self.ensemble = Ensemble(x, y, self.n_models, self.rng)
+        self.n_fits += 1
+
+    def __fit_loop(self):
+        while True:
+            self.new_samples.wait()
+            if self.closed:
+                return
+            self.new_samples.clear()
+            self.__fit()
+
+    def close(self):
+        """Stops the background thread"""
+        self.closed = True
+        self.new_samples.set()
+        if self.thread is not None:
+            self.thread.join()
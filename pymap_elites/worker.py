@@ -0,0 +1,66 @@
+"""Worker side of the dispatch of the evaluations (see dispatch.py)
+
+Kept apart from the master code, so that a worker imports nothing but numpy and the fitness
+functions it is given (the simulator and controllers load on their first use).
+"""
+import time
+import numpy as np
+
+INFO_KEYS = ("descriptor_valid", "steps", "max_steps", "terminated_early", "fitness_valid")
+
+# the fitness functions bound at start and the shared matrices attached so far
+_functions = None
+_attached = {}
+
+
+def init_worker(functions):
+    global _functions
+    _functions = functions
+
+def _attach(buffers):
+    """Views of the shared matrices [(name, shape)] (attached once per worker, older blocks are released)"""
+    arrays = []
+    for name, shape in buffers:
+        if name not in _attached:
+            from multiprocessing import shared_memory
+            shm = shared_memory.SharedMemory(name=name)
+            _attached[name] = (shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf))
+        arrays.append(_attached[name][1])
+    names = [name for name, _ in buffers]
+    for name in [name for name in _attached if name not in names]:
+        shm, array = _attached.pop(name)
+        del array
+        shm.close()
+    return arrays
+
+def evaluate_into(f, genomes, incumbents, results):
+    """Evaluates every row of genomes with f (passing incumbent_fitness when incumbents is not None)
+
+    Returns:
+        the time taken (s)
+    """
+    start = time.perf_counter()
+    dim_map = results.shape[1] - len(INFO_KEYS) - 2
+    for i in range(genomes.shape[0]):
+        if incumbents is None:
+            result = f(genomes[i].copy())
+        else:
+            result = f(genomes[i].copy(), incumbent_fitness=incumbents[i], return_info=True)
+        results[i, 0] = result[0]
+        results[i, 1:1 + dim_map] = result[1]
+        results[i, 1 + dim_map] = len(result) > 2
+        if len(result) > 2:
+            results[i, 2 + dim_map:] = [result[2][k] for k in INFO_KEYS]
+    return time.perf_counter() - start
+
+def evaluate_rows(task):
+    """Shared memory task: (buffers, function id, first row, end row, bounded?) -> time taken"""
+    buffers, function_id, start, end, bounded = task
+    genomes, incumbents, results = _attach(buffers)
+    return evaluate_into(_functions[function_id], genomes[start:end], incumbents[start:end] if bounded else None, results[start:end])
+
+def evaluate_block(task):
+    """Block task: (function id, genomes, incumbents or None, width of a result row) -> (results, time taken)"""
+    function_id, genomes, incumbents, width = task
+    results = np.zeros((genomes.shape[0], width))
+    return results, evaluate_into(_functions[function_id], genomes, incumbents, results)
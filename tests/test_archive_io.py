@@ -0,0 +1,83 @@
+"""Checks the binary archive format (pymap_elites/archive_io.py) against the text maps
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_archive_io.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import tempfile
+import time
+import numpy as np
+from pymap_elites import archive_io
+from pymap_elites.archive import Archive
+from pymap_elites import common as cm
+import adapt.MBOA as mboa
+
+MAP = os.path.join("maps", "CPG", "20k", "map_1.dat")
+
+def test_round_trip():
+    with tempfile.TemporaryDirectory() as directory:
+        text = archive_io.load_archive(MAP)
+        binary = os.path.join(directory, "map_1.bin")
+        archive_io.save_archive(binary, text.fitness, text.centroid, text.desc, text.x)
+        assert archive_io.is_binary(binary) and not archive_io.is_binary(MAP)
+        a = archive_io.load_archive(binary)
+        assert isinstance(a.x, np.memmap) and a.x.ctypes.data % archive_io.ALIGNMENT == 0
+        assert np.array_equal(a.rows(), np.loadtxt(MAP), equal_nan=True)
+        # export back to text
+        exported = os.path.join(directory, "map_1.dat")
+        archive_io.export_text(a, exported)
+        assert np.array_equal(np.loadtxt(exported), np.loadtxt(MAP), equal_nan=True)
+
+def test_float32_and_empty():
+    with tempfile.TemporaryDirectory() as directory:
+        a = archive_io.load_archive(MAP)
+        filename = os.path.join(directory, "map.bin")
+        archive_io.save_archive(filename, a.fitness, a.centroid, a.desc, a.x, dtype=np.float32)
+        b = archive_io.load_archive(filename)
+        assert b.x.dtype == np.float32
+        assert np.allclose(b.rows(), a.rows(), equal_nan=True)
+        archive_io.save_archive(filename, np.zeros(0), np.zeros((0, 6)), np.zeros((0, 6)), np.zeros((0, 156)))
+        b = archive_io.load_archive(filename)
+        assert len(b) == 0 and b.dim_x == 156
+
+def test_find_archive():
+    with tempfile.TemporaryDirectory() as directory:
+        text = os.path.join(directory, "map_1.dat")
+        with open(MAP) as src, open(text, "w") as dst:
+            dst.write(src.read())
+        assert archive_io.find_archive(text) == text
+        binary = archive_io.convert(text)
+        assert archive_io.find_archive(text) == binary
+        # a text map written after its binary version is used instead of the stale binary file
+        t = time.time()
+        os.utime(binary, (t - 10, t - 10))
+        assert archive_io.find_archive(text) == text
+        fits, descs, ctrls = mboa.load_map(text)
+        assert np.array_equal(fits, np.loadtxt(MAP)[:, 0])
+
+def test_save_archive():
+    archive = Archive(np.random.rand(10, 2), 3)
+    for i in [0, 4, 7]:
+        archive.add(i, np.random.rand(3), np.random.rand(2), float(i))
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            cm.__save_archive(archive, 5, "run-", dict(cm.default_params, archive_format="both"))
+            a = archive_io.load_archive("archive_run-5.bin")
+            assert np.array_equal(a.rows(), np.loadtxt("archive_run-5.dat"))
+            assert sorted(a.fitness) == [0.0, 4.0, 7.0]
+        finally:
+            os.chdir(cwd)
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_float32_and_empty()
+    test_find_archive()
+    test_save_archive()
+    print("archive format ok")
@@ -0,0 +1,103 @@
+"""Checks the running statistics of the archive and the binary statistics log (pymap_elites/stats_log.py)
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_archive_stats.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import io
+import pickle
+import tempfile
+import numpy as np
+from pymap_elites.archive import Archive
+from pymap_elites.stats_log import ArchiveLog, read_stats
+
+def fill(archive, rng, batches=30):
+    for i in range(batches):
+        niches = rng.randint(archive.n_niches, size=40)
+        fitness = rng.randn(40) + 0.05 * i
+        if i % 3 == 0:
+            for n, f in zip(niches, fitness):
+                archive.add(n, rng.rand(archive.dim_x), rng.rand(2), f)
+        else:
+            archive.add_batch(niches, rng.rand(40, archive.dim_x), rng.rand(40, 2), fitness)
+
+def test_running_stats():
+    rng = np.random.RandomState(0)
+    archive = Archive(np.zeros((300, 2)), 3)
+    assert archive.stats()['size'] == 0 and archive.stats()['max'] == -np.inf
+    fill(archive, rng)
+    stats, fitness = archive.stats(), archive.fitness_values()
+    assert stats['size'] == len(fitness) and stats['coverage'] == len(fitness) / 300
+    assert np.isclose(stats['qd_score'], fitness.sum()) and np.isclose(stats['mean'], fitness.mean())
+    assert stats['max'] == fitness.max()
+    assert stats['inserted'] == len(fitness) and stats['improved'] > 0
+
+def test_batch_counts_as_add():
+    rng = np.random.RandomState(3)
+    one_by_one, batched = Archive(np.zeros((20, 2)), 3), Archive(np.zeros((20, 2)), 3)
+    for i in range(10):
+        # many individuals per niche, with ties
+        niches = rng.randint(20, size=60)
+        fitness = np.round(rng.randn(60) + 0.2 * i, 1)
+        x, desc = rng.rand(60, 3), rng.rand(60, 2)
+        for j in range(60):
+            one_by_one.add(niches[j], x[j], desc[j], fitness[j])
+        batched.add_batch(niches, x, desc, fitness)
+        a, b = one_by_one.stats(), batched.stats()
+        assert all(a[key] == b[key] for key in ['size', 'max', 'inserted', 'improved'])
+        assert np.isclose(a['qd_score'], b['qd_score'])
+
+def test_unpickle_old_archive():
+    archive = Archive(np.zeros((300, 2)), 3)
+    fill(archive, np.random.RandomState(1))
+    state = archive.__dict__.copy()
+    for key in ['qd_score', 'max_fitness', 'n_inserted', 'n_improved']:
+        del state[key]
+    old = Archive.__new__(Archive)
+    old.__setstate__(state)
+    assert np.isclose(old.stats()['qd_score'], archive.qd_score) and old.stats()['max'] == archive.max_fitness
+
+def test_stats_log():
+    rng = np.random.RandomState(2)
+    archive = Archive(np.zeros((300, 2)), 3)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "stats.bin")
+        text = io.StringIO()
+        log = ArchiveLog(text, filename, percentile_period=2)
+        inserted = []
+        for i in range(5):
+            before = len(archive)
+            fill(archive, rng, batches=1)
+            inserted.append(len(archive) - before)
+            log.write((i + 1) * 40, archive)
+        log.close()
+        with open(filename, 'ab') as f:
+            f.write(b'\0' * 7) # interrupted record
+        stats = read_stats(filename)
+        assert len(stats) == 5 and list(stats['n_evals']) == [40, 80, 120, 160, 200]
+        assert list(stats['inserted']) == inserted
+        assert np.isclose(stats['qd_score'][-1], archive.fitness_values().sum())
+        # with a text log, the percentiles are on every line and every record
+        assert not np.any(np.isnan(stats['median']))
+        lines = text.getvalue().splitlines()
+        assert float(lines[-1].split()[2]) == archive.fitness_values().max()
+        assert not any(np.isnan(float(line.split()[4])) for line in lines)
+        # without one, the binary log only has them every percentile_period records
+        log = ArchiveLog(None, filename, percentile_period=2)
+        for i in range(3):
+            log.write((i + 1) * 40, archive)
+        log.close()
+        stats = read_stats(filename)
+        assert not np.isnan(stats['median'][0]) and np.isnan(stats['median'][1]) and not np.isnan(stats['median'][2])
+
+if __name__ == "__main__":
+    test_running_stats()
+    test_batch_counts_as_add()
+    test_unpickle_old_archive()
+    test_stats_log()
+    print("archive statistics ok")
@@ -0,0 +1,157 @@
+"""Checks the snapshot + journal checkpoints (pymap_elites/journal.py), the random states saved by the checkpoints
+and that a run resumed after a crash goes on like the run that was not interrupted
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_checkpoint_journal.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import random
+import tempfile
+import numpy as np
+from pymap_elites import common as cm
+from pymap_elites import cvt
+from pymap_elites.archive import Archive
+from pymap_elites.journal import Journal
+from pymap_elites.pickler import Pickler
+
+N_NICHES = 50
+
+def random_batches(n, size=20, dim_x=4, seed=0):
+    rng = np.random.RandomState(seed)
+    return [(rng.randint(N_NICHES, size=size), rng.rand(size, dim_x), rng.rand(size, 2), rng.rand(size) + 0.1 * i) for i in range(n)]
+
+def run(journal, batches, dump_period):
+    archive = Archive(np.zeros((N_NICHES, 2)), 4)
+    journal.start(archive, 0, [], 2, N_NICHES)
+    for i, batch in enumerate(batches):
+        changed = archive.add_batch(*batch)
+        journal.record(archive, changed, (i + 1) * 20)
+        if (i + 1) % dump_period == 0:
+            journal.save_checkpoint(archive, (i + 1) * 20, [(x,) for x in batch[1]], 2, N_NICHES)
+    return archive
+
+def restore(filename):
+    batches, n_evals, to_evaluate, dim_map, n_niches = Journal.restore_checkpoint(filename)
+    assert dim_map == 2 and n_niches == N_NICHES
+    return Journal.replay(batches, Archive(np.zeros((n_niches, dim_map)), 4)), n_evals, to_evaluate
+
+def test_replay():
+    with tempfile.TemporaryDirectory() as directory:
+        journal = Journal(os.path.join(directory, "run-"), fsync=False)
+        archive = run(journal, random_batches(23), dump_period=5)
+        restored, n_evals, to_evaluate = restore(journal.base + ".log")
+        assert n_evals == 23 * 20 and to_evaluate == []
+        assert np.array_equal(restored.niches(), archive.niches())
+        for a in ["fitness", "desc", "x"]:
+            assert np.array_equal(getattr(restored, a)[archive.niches()], getattr(archive, a)[archive.niches()])
+
+def test_interrupted_block():
+    with tempfile.TemporaryDirectory() as directory:
+        journal = Journal(os.path.join(directory, "run-"), fsync=False)
+        batches = random_batches(12)
+        run(journal, batches, dump_period=100)
+        # crash in the middle of the last block: the archive of the previous batch is restored
+        with open(journal.base + ".log", 'r+b') as f:
+            f.truncate(os.path.getsize(journal.base + ".log") - 10)
+        restored, n_evals, _ = restore(journal.base)
+        expected = run(Journal(os.path.join(directory, "ref-"), fsync=False), batches[:-1], dump_period=100)
+        assert n_evals == 11 * 20
+        assert np.array_equal(restored.niches(), expected.niches())
+        assert np.array_equal(restored.fitness, expected.fitness)
+
+def test_random_states():
+    with tempfile.TemporaryDirectory() as directory:
+        archive = Archive(np.zeros((N_NICHES, 2)), 4)
+        journal = Journal(os.path.join(directory, "run-"), fsync=False)
+        pickler = Pickler(os.path.join(directory, "run-"))
+        random.seed(1)
+        np.random.seed(1)
+        journal.snapshot(archive, 0, [], 2, N_NICHES)
+        pickler.save_checkpoint(archive, 0, [], 2, N_NICHES)
+        expected = (random.random(), np.random.rand())
+        for restore_checkpoint, filename in [(Journal.restore_checkpoint, journal.base), (Pickler.restore_checkpoint, pickler.filename_prefix + "0.bu")]:
+            random.seed(2)
+            np.random.seed(2)
+            restore_checkpoint(filename)
+            assert (random.random(), np.random.rand()) == expected
+
+def test_random_states_of_the_journal():
+    # restored from the journal blocks written after the snapshot: the random states are those of the last block
+    with tempfile.TemporaryDirectory() as directory:
+        random.seed(3)
+        np.random.seed(3)
+        archive = Archive(np.zeros((N_NICHES, 2)), 4)
+        journal = Journal(os.path.join(directory, "run-"), fsync=False)
+        journal.start(archive, 0, [], 2, N_NICHES)
+        for i, batch in enumerate(random_batches(7)):
+            # the variation of the batch (odd numbers of gaussians leave one cached)
+            np.random.rand(5), np.random.standard_normal(3), random.random(), random.gauss(0, 1)
+            journal.record(archive, archive.add_batch(*batch), (i + 1) * 20)
+        expected = (random.random(), random.gauss(0, 1), np.random.rand(), np.random.standard_normal())
+        random.seed(4)
+        np.random.seed(4)
+        Journal.restore_checkpoint(journal.base)
+        assert (random.random(), random.gauss(0, 1), np.random.rand(), np.random.standard_normal()) == expected
+
+def fitness(x):
+    return float(-np.sum((x - 0.5) ** 2)), x[:2].copy()
+
+class Crashing:
+    """fitness, raising after n evaluations"""
+    def __init__(self, n):
+        self.n = n
+
+    def __call__(self, x):
+        self.n -= 1
+        if self.n < 0:
+            raise RuntimeError("crash")
+        return fitness(x)
+
+def test_resumed_run():
+    # a seeded CVT: computing or loading it leaves the global random state alone
+    params = {**cm.default_params, "cvt_samples": 2000, "cvt_seed": 1, "batch_size": 100, "random_init_batch": 100, "dump_period": 1000,
+        "parallel": False, "executor": "serial", "checkpoint_mode": "journal"}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            random.seed(5)
+            np.random.seed(5)
+            with open("full.dat", "w") as log:
+                full = cvt.compute(2, 8, fitness, n_niches=100, max_evals=2000, params=params, log_file=log,
+                    checkpoint_filenameprefix="full-")
+            # crash in the middle of the batch after 1500 evaluations: the journal has the batches since the snapshot at 1000
+            random.seed(5)
+            np.random.seed(5)
+            try:
+                with open("crashed.dat", "w") as log:
+                    cvt.compute(2, 8, Crashing(1550), n_niches=100, max_evals=2000, params=params, log_file=log,
+                        checkpoint_filenameprefix="part-")
+            except RuntimeError:
+                pass
+            random.seed(6)
+            np.random.seed(6)
+            with open("resumed.dat", "w") as log:
+                resumed = cvt.compute_from_checkpoint("part-journal", fitness, max_evals=2000, params=params, log_file=log)
+            with open("full.dat") as log:
+                full_lines = log.readlines()
+            with open("resumed.dat") as log:
+                resumed_lines = log.readlines()
+        finally:
+            os.chdir(cwd)
+    # the resumed log goes on with the batch that crashed, as the uninterrupted run did
+    assert resumed_lines == full_lines[15:]
+    assert np.array_equal(resumed.niches(), full.niches()) and np.array_equal(resumed.fitness, full.fitness)
+
+if __name__ == "__main__":
+    test_replay()
+    test_interrupted_block()
+    test_random_states()
+    test_random_states_of_the_journal()
+    test_resumed_run()
+    print("checkpoint journal ok")
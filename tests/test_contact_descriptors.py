@@ -0,0 +1,104 @@
+"""Checks that the streaming contact accumulation gives the same descriptors as the full contact history
+
+The evaluators used to grow a (6, steps) contact sequence with np.append and summarise it at the end.
+This compares that against controller_tools.ContactCounter, first on recorded contact patterns and
+then on the best gaits of a shipped map.
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_contact_descriptors.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import numpy as np
+import pytest
+# needs the simulator of the hexapod package (a git submodule)
+pytest.importorskip("hexapod")
+from hexapod.controllers.cpg_controller import CPGController
+from hexapod.controllers.cpg_controller import CPGParameterHandlerMAPElites
+from hexapod.simulator import Simulator
+import adapt.MBOA as map_handler
+import controller_tools
+
+class RecordedContacts:
+    """Replays a recorded (6, steps) contact sequence through supporting_legs()"""
+    def __init__(self, sequence):
+        self.sequence = sequence
+        self.t = 0
+
+    def supporting_legs(self):
+        contacts = self.sequence[:, self.t]
+        self.t += 1
+        return contacts
+
+def legacy_descriptor(simulator, steps):
+    """The original descriptor computation: append every step, summarise at the end"""
+    contact_sequence = np.full((6, 0), False)
+    for _ in range(steps):
+        contact_sequence = np.append(contact_sequence, simulator.supporting_legs().reshape(-1,1), axis=1)
+    return np.nan_to_num(np.sum(contact_sequence, axis=1) / np.size(contact_sequence, axis=1), nan=0.0, posinf=0.0, neginf=0.0)
+
+def legacy_evaluate_gait_cpg(x, duration=5, collision_fatal=True, failed_legs=[]):
+    """evaluate_gait_cpg as it was before the streaming contact accumulation"""
+    intrinsic_amplitudes = CPGParameterHandlerMAPElites.scale_intrinsic_amplitudes(x[:12])
+    phase_biases = CPGParameterHandlerMAPElites.scale_phase_biases(x[12:])
+    try:
+        controller = CPGController(intrinsic_amplitudes=intrinsic_amplitudes, phase_biases=phase_biases, seconds=duration, velocity=0, crab_angle=0)
+        simulator = Simulator(controller=controller, visualiser=False, collision_fatal=collision_fatal, failed_legs=failed_legs)
+        contact_sequence = np.full((6, 0), False)
+        t=0
+        while t<(240*duration)-1:
+            simulator.step()
+            contact_sequence = np.append(contact_sequence, simulator.supporting_legs().reshape(-1,1), axis=1)
+            t=t+1
+        fitness = simulator.base_pos()[0]
+        simulator.terminate()
+    except:
+        return 0.0, np.zeros(6)
+    descriptor = np.nan_to_num(np.sum(contact_sequence, axis=1) / np.size(contact_sequence, axis=1), nan=0.0, posinf=0.0, neginf=0.0)
+    return fitness, descriptor
+
+def test_running_count_matches_history():
+    rng = np.random.RandomState(0)
+    for steps in [0, 1, 7, 1199]:
+        sequence = rng.rand(6, steps) < rng.rand(6, 1)
+        expected = legacy_descriptor(RecordedContacts(sequence), steps)
+
+        counter = controller_tools.ContactCounter(keep_sequence=True, max_steps=steps)
+        simulator = RecordedContacts(sequence)
+        for _ in range(steps):
+            counter.record(simulator)
+        assert np.array_equal(counter.descriptor(), expected)
+        assert np.array_equal(counter.contact_sequence(), sequence)
+
+def test_sample_period():
+    rng = np.random.RandomState(1)
+    steps, period = 1199, 4
+    sequence = rng.rand(6, steps) < 0.5
+    expected = legacy_descriptor(RecordedContacts(sequence[:, ::period]), len(range(0, steps, period)))
+
+    counter = controller_tools.ContactCounter(sample_period=period)
+    simulator = RecordedContacts(sequence[:, ::period])
+    for _ in range(steps):
+        counter.record(simulator)
+    assert np.array_equal(counter.descriptor(), expected)
+
+def test_evaluator_matches_legacy(map_num=1, top=3):
+    map_path = os.path.join(os.path.dirname(__file__), "..", "maps", "CPG", "20k", f"map_{map_num}.dat")
+    fits, descs, ctrls = map_handler.load_map(map_path)
+    for index in np.argsort(fits)[::-1][:top]:
+        x = CPGParameterHandlerMAPElites.convert_non_mapelites_parameters(ctrls[index])
+        for failed_legs in [[], [1]]:
+            fitness, descriptor = controller_tools.evaluate_gait_cpg(x, collision_fatal=False, failed_legs=failed_legs)
+            legacy_fitness, legacy_descriptor = legacy_evaluate_gait_cpg(x, collision_fatal=False, failed_legs=failed_legs)
+            assert fitness == legacy_fitness
+            assert np.array_equal(descriptor, legacy_descriptor)
+
+if __name__ == "__main__":
+    test_running_count_matches_history()
+    test_sample_period()
+    test_evaluator_matches_legacy()
+    print("descriptors identical")
@@ -0,0 +1,69 @@
+"""Checks the CVT algorithms and the keyed CVT cache (pymap_elites/centroids.py)
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_cvt_cache.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import tempfile
+import numpy as np
+from pymap_elites import centroids
+
+def in_tmp_dir(test):
+    """Runs the test in an empty directory (the cache lives in ./centroids)"""
+    def run():
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                test()
+            finally:
+                os.chdir(cwd)
+    run.__name__ = test.__name__
+    return run
+
+@in_tmp_dir
+def test_algorithms():
+    x = np.random.RandomState(3).rand(5000, 3)
+    for algorithm in centroids.CVT_ALGORITHMS:
+        c = centroids.build_cvt(50, 3, 5000, seed=0, algorithm=algorithm)
+        assert c.shape == (50, 3) and c.min() >= 0 and c.max() <= 1
+        assert len(np.unique(c, axis=0)) == 50
+        # a CVT quantizes uniform samples much better than random points
+        error = lambda p: np.mean(np.min(((x[:, None, :] - p[None]) ** 2).sum(-1), axis=1))
+        assert error(c) < 0.8 * error(np.random.RandomState(4).rand(50, 3))
+    assert np.array_equal(centroids.build_cvt(50, 3, 5000, 0, "lloyd"), centroids.build_cvt(50, 3, 5000, 0, "lloyd"))
+
+@in_tmp_dir
+def test_cache_key():
+    c, index = centroids.load_cvt(40, 2, 2000, seed=0, algorithm="lloyd")
+    warm, warm_index = centroids.load_cvt(40, 2, 2000, seed=0, algorithm="lloyd")
+    assert np.array_equal(c, warm)
+    points = np.random.rand(100, 2)
+    assert np.array_equal(index.query(points), warm_index.query(points))
+    other, _ = centroids.load_cvt(40, 2, 2000, seed=1, algorithm="lloyd")
+    assert not np.array_equal(c, other)
+    assert os.path.exists(centroids.centroids_filename(40, 2, 2000, 0, "lloyd"))
+    assert len(os.listdir(centroids.CACHE_DIR)) == 2
+    # another niche index is added to the cached entry
+    _, brute = centroids.load_cvt(40, 2, 2000, seed=0, algorithm="lloyd", index_kind="brute")
+    assert np.array_equal(brute.query(points), index.query(points))
+    assert len(os.listdir(centroids.CACHE_DIR)) == 2
+
+@in_tmp_dir
+def test_legacy_text_cache():
+    os.makedirs(centroids.CENTROIDS_DIR)
+    legacy = np.random.rand(30, 2)
+    centroids.write_centroids(legacy, centroids.centroids_filename(30, 2, 1000))
+    c, _ = centroids.load_cvt(30, 2, 1000)
+    assert np.allclose(c, legacy)
+
+if __name__ == "__main__":
+    test_algorithms()
+    test_cache_key()
+    test_legacy_text_cache()
+    print("CVT cache ok")
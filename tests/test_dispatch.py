@@ -0,0 +1,114 @@
+"""Checks the dispatch of the evaluations (pymap_elites/dispatch.py) on each parallel backend (pymap_elites/executors.py)
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_dispatch.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import queue
+import numpy as np
+from pymap_elites import common as cm
+from pymap_elites.dispatch import Dispatcher, task_sizes
+
+def fitness(x):
+    return float(-np.sum((x - 0.5) ** 2)), x[:2].copy()
+
+def bounded_fitness(x, incumbent_fitness=None, return_info=False):
+    fit, desc = fitness(x)
+    stopped = incumbent_fitness is not None and fit < incumbent_fitness
+    return fit, desc, {"terminated_early": stopped, "reason": None, "descriptor_valid": not stopped,
+        "fitness_valid": not stopped, "steps": 10 if stopped else 100, "max_steps": 100}
+
+def failing_fitness(x):
+    raise ValueError("rollout failed")
+
+BACKENDS = [(False, "process"), (True, "process"), (True, "socket")]
+
+def params(parallel, executor="process"):
+    return {**cm.default_params, "parallel": parallel, "executor": executor, "num_workers": 2}
+
+def test_batches():
+    x = list(np.random.RandomState(0).rand(25, 4))
+    for parallel, executor in BACKENDS:
+        # the matrices are grown for the second batch
+        dispatcher = Dispatcher([fitness, bounded_fitness], 4, 2, params(parallel, executor), capacity=10)
+        try:
+            s_list = dispatcher.evaluate([(z, fitness) for z in x[:10]])
+            assert [s.fitness for s in s_list] == [fitness(z)[0] for z in x[:10]]
+            assert all(s.x is z and np.array_equal(s.desc, z[:2]) and s.info is None for s, z in zip(s_list, x))
+            s_list = dispatcher.evaluate([(z, bounded_fitness, {"incumbent_fitness": -0.3, "return_info": True}) for z in x])
+            for s, z in zip(s_list, x):
+                expected = bounded_fitness(z, -0.3)
+                assert s.fitness == expected[0] and np.array_equal(s.desc, expected[1])
+                assert all(s.info[k] == expected[2][k] for k in ["terminated_early", "descriptor_valid", "fitness_valid", "steps", "max_steps"])
+                assert s.info["incumbent_fitness"] == -0.3
+        finally:
+            dispatcher.close()
+
+def test_submit():
+    x = list(np.random.RandomState(1).rand(12, 4))
+    for parallel, executor in BACKENDS:
+        dispatcher = Dispatcher([fitness], 4, 2, params(parallel, executor), capacity=4)
+        results = queue.Queue()
+        try:
+            # at most capacity evaluations in flight
+            for i in range(0, len(x), 4):
+                for j in range(i, i + 4):
+                    dispatcher.submit((x[j], fitness), lambda s, j=j: results.put((j, s)), lambda e: results.put((None, e)))
+                for _ in range(4):
+                    j, s = results.get(timeout=30)
+                    assert j is not None, s
+                    assert s.fitness == fitness(x[j])[0] and s.x is x[j]
+        finally:
+            dispatcher.close()
+
+def test_unknown_function():
+    dispatcher = Dispatcher([fitness], 4, 2, params(False))
+    try:
+        dispatcher.evaluate([(np.zeros(4), bounded_fitness)])
+        assert False, "a function not bound in the workers must be rejected"
+    except Exception as e:
+        assert "Dispatcher" in str(e)
+    finally:
+        dispatcher.close()
+
+def test_worker_error():
+    for parallel, executor in BACKENDS:
+        dispatcher = Dispatcher([failing_fitness], 4, 2, params(parallel, executor))
+        try:
+            dispatcher.evaluate([(np.zeros(4), failing_fitness)])
+            assert False, "the error of a worker must reach the master"
+        except ValueError as e:
+            assert "rollout failed" in str(e)
+        finally:
+            dispatcher.close()
+
+def test_task_sizes():
+    for n, n_workers, row_time in [(2390, 8, None), (2390, 8, 1e-5), (2390, 8, 0.1), (2390, 72, 2.0), (3, 8, None), (1, 1, None)]:
+        sizes = task_sizes(n, n_workers, row_time, 0.5)
+        assert sum(sizes) == n and min(sizes) >= 1
+        # decreasing sizes, down to a single row
+        assert all(a >= b for a, b in zip(sizes, sizes[1:])) and sizes[-1] == 1
+    # a sixteenth of the rows first, then fewer
+    assert task_sizes(2390, 8, None, 0.5)[:2] == [150, 140]
+    # slow rows: short tasks
+    assert max(task_sizes(2390, 8, 0.1, 0.5)) == 5
+    assert max(task_sizes(2390, 8, 2.0, 0.5)) == 1
+    dispatcher = Dispatcher([fitness], 4, 2, params(False))
+    try:
+        dispatcher.evaluate([(z, fitness) for z in np.random.rand(20, 4)])
+        assert dispatcher.row_time is not None and dispatcher.row_time > 0
+    finally:
+        dispatcher.close()
+
+if __name__ == "__main__":
+    test_batches()
+    test_submit()
+    test_unknown_function()
+    test_worker_error()
+    test_task_sizes()
+    print("dispatch ok")
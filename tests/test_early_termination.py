@@ -0,0 +1,127 @@
+"""Checks the early termination policies in controller_tools on scripted body trajectories
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_early_termination.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import tempfile
+import numpy as np
+import controller_tools
+from eval_cache import EvalCache
+from pymap_elites import common as cm
+from pymap_elites import cvt
+from pymap_elites.archive import Archive
+from pymap_elites.niche_index import make_niche_index
+
+class ScriptedBody:
+    """Replays a body trajectory through base_pos() and the client's getBasePositionAndOrientation()"""
+    dt = 1.0/240
+    hexapod = 0
+
+    def __init__(self, xs, tilts=None):
+        self.xs = xs
+        self.tilts = np.zeros(len(xs)) if tilts is None else tilts
+        self.step_count = 0
+        self.client = self
+
+    def step(self):
+        self.step_count += 1
+
+    def base_pos(self):
+        return np.array([self.xs[self.step_count - 1], 0.0, 0.0])
+
+    def getBasePositionAndOrientation(self, body):
+        # rotation of tilt radians about the y axis
+        tilt = self.tilts[self.step_count - 1]
+        return self.base_pos(), (0.0, np.sin(tilt/2), 0.0, np.cos(tilt/2))
+
+def run(policies, body, duration=5):
+    """Steps the body until a policy stops it, returns (policy, steps)"""
+    for policy in policies:
+        policy.reset(duration)
+    for step in range(len(body.xs)):
+        body.step()
+        stopped_by = controller_tools._check_early_termination(policies, body, step)
+        if stopped_by is not None:
+            return stopped_by, step + 1
+    return None, len(body.xs)
+
+def test_walking_gait_runs_to_the_end():
+    xs = np.linspace(0, 2.0, 1199)
+    policies = [controller_tools.FlipDetector(), controller_tools.StallDetector(), controller_tools.IncumbentBound(1.5)]
+    assert run(policies, ScriptedBody(xs)) == (None, 1199)
+
+def test_flip():
+    tilts = np.linspace(0, np.pi, 1199)
+    stopped_by, steps = run([controller_tools.FlipDetector()], ScriptedBody(np.zeros(1199), tilts))
+    assert isinstance(stopped_by, controller_tools.FlipDetector)
+    assert not stopped_by.descriptor_valid
+    assert steps <= 1199/2 + 2*controller_tools.EARLY_TERMINATION_CHECK_PERIOD
+
+def test_stall():
+    # walks for 2 s then stands still
+    xs = np.minimum(np.arange(1199) * 0.5/240, 1.0)
+    stopped_by, steps = run([controller_tools.StallDetector(window=1.0)], ScriptedBody(xs))
+    assert isinstance(stopped_by, controller_tools.StallDetector)
+    assert 3*240 <= steps <= 3*240 + controller_tools.EARLY_TERMINATION_CHECK_PERIOD
+
+def test_incumbent_bound_is_conservative():
+    # a gait walking at MAX_SPEED must never be stopped by an incumbent it can still match
+    xs = np.arange(1, 1200) * controller_tools.MAX_SPEED/240
+    assert run([controller_tools.IncumbentBound(xs[-1] - 1e-6)], ScriptedBody(xs))[0] is None
+    # a gait standing still is stopped as soon as the incumbent is out of reach
+    stopped_by, steps = run([controller_tools.IncumbentBound(3.0)], ScriptedBody(np.zeros(1199)))
+    assert isinstance(stopped_by, controller_tools.IncumbentBound)
+    assert steps * (1.0/240) >= 2.0 - 1e-9
+    assert steps * (1.0/240) <= 2.0 + controller_tools.EARLY_TERMINATION_CHECK_PERIOD/240
+
+def test_results_stopped_short_are_not_kept():
+    policies = [None, controller_tools.FlipDetector(), controller_tools.StallDetector(), controller_tools.IncumbentBound(1.0)]
+    results = [controller_tools._result(0.5, np.full(2, 0.25 * i), True, 600, 1199, policy) for i, policy in enumerate(policies)]
+    # neither the archive nor the evaluation cache take the flipped rollout or the one stopped by the bound
+    centroids = np.array([[0.0, 0.0], [0.25, 0.25], [0.5, 0.5], [0.75, 0.75]])
+    archive = Archive(centroids, 3)
+    add_to_archive = getattr(cvt, "__add_to_archive")
+    add_to_archive([cm.Species(np.zeros(3), desc, fitness, info=info) for fitness, desc, info in results],
+        archive, make_niche_index(centroids, "brute"))
+    assert list(archive.niches()) == [0, 2]
+    with tempfile.TemporaryDirectory() as directory:
+        cache = EvalCache(os.path.join(directory, "cache.sqlite"))
+        for i, result in enumerate(results):
+            cache.put(EvalCache.key(np.full(3, i)), *result)
+        assert [cache.get(EvalCache.key(np.full(3, i))) is not None for i in range(4)] == [True, False, True, False]
+
+def test_rollouts_stopped_by_the_bound_are_settled_in_their_niche():
+    # three offspring stopped by a bound of 1.0 land in an empty niche, in front of a weaker elite and a fitter one
+    centroids = np.array([[0.0, 0.0], [0.25, 0.25], [0.5, 0.5], [0.75, 0.75]])
+    archive = Archive(centroids, 3)
+    index = make_niche_index(centroids, "brute")
+    archive.add(1, np.zeros(3), centroids[1], 0.5)
+    archive.add(2, np.zeros(3), centroids[2], 1.5)
+    species = []
+    for i in range(3):
+        fitness, desc, info = controller_tools._result(0.2, centroids[i], True, 600, 1199, controller_tools.IncumbentBound(1.0))
+        info["incumbent_fitness"] = 1.0
+        species.append(cm.Species(np.full(3, float(i)), desc, fitness, info=info))
+    # only the one facing the weaker elite may still beat it: it is evaluated again without the bound
+    f = lambda x: (0.0, x[:2])
+    unsettled = getattr(cvt, "__unsettled")(species, archive, index, f)
+    assert [(t[0][0], t[1]) for t in unsettled] == [(1.0, f)]
+    # the one in the empty niche is kept with the distance walked so far, the elites are untouched
+    getattr(cvt, "__add_to_archive")(species, archive, index)
+    assert list(archive.niches()) == [1, 2, 0]
+    assert list(archive.fitness[:3]) == [0.2, 0.5, 1.5]
+
+if __name__ == "__main__":
+    test_walking_gait_runs_to_the_end()
+    test_flip()
+    test_stall()
+    test_incumbent_bound_is_conservative()
+    test_results_stopped_short_are_not_kept()
+    test_rollouts_stopped_by_the_bound_are_settled_in_their_niche()
+    print("early termination policies ok")
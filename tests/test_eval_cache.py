@@ -0,0 +1,124 @@
+"""Checks the persistent evaluation cache (eval_cache.py) and its use by controller_tools
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_eval_cache.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import multiprocessing
+import tempfile
+import numpy as np
+from eval_cache import EvalCache
+
+def test_key():
+    x = np.random.rand(156)
+    key = EvalCache.key(x, controller="CPG", failed_legs=[1], duration=5, collision_fatal=False)
+    assert key == EvalCache.key(x.copy(), duration=5, failed_legs=[1], controller="CPG", collision_fatal=False)
+    assert key != EvalCache.key(x, controller="CPG", failed_legs=[2], duration=5, collision_fatal=False)
+    assert key != EvalCache.key(x, controller="REF", failed_legs=[1], duration=5, collision_fatal=False)
+    y = x.copy()
+    y[-1] = np.nextafter(y[-1], 2)
+    assert key != EvalCache.key(y, controller="CPG", failed_legs=[1], duration=5, collision_fatal=False)
+
+def test_hits_misses_and_eviction():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = EvalCache(os.path.join(directory, "cache.sqlite"), max_entries=3)
+        keys = [EvalCache.key(np.full(4, i)) for i in range(5)]
+        assert cache.get(keys[0]) is None
+        cache.put(keys[0], 1.5, np.arange(6) / 6)
+        fitness, descriptor = cache.get(keys[0])
+        assert fitness == 1.5 and np.array_equal(descriptor, np.arange(6) / 6)
+        assert cache.hits == 1 and cache.misses == 1
+        for i in range(1, 5):
+            cache.put(keys[i], float(i))
+            if i == 2:
+                cache.get(keys[0]) # keys[0] becomes more recently used than keys[1]
+        assert len(cache) == 3
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) is not None
+
+def test_inserts_do_not_count_entries():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = EvalCache(os.path.join(directory, "cache.sqlite"), max_entries=150)
+        statements = []
+        cache._connect().set_trace_callback(statements.append)
+        for i in range(200):
+            cache.put(EvalCache.key(np.full(4, i)), float(i))
+        # one full count when the process first inserts, then only when the cache may be full
+        assert sum("COUNT(*)" in s for s in statements) <= 5
+        assert len(cache) <= 150 and cache.get(EvalCache.key(np.full(4, 199))) is not None
+
+def _put_range(args):
+    path, start = args
+    cache = EvalCache(path)
+    for i in range(start, start + 50):
+        cache.put(EvalCache.key(np.full(4, i)), float(i))
+
+def test_concurrent_writers():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite")
+        with multiprocessing.Pool(4) as pool:
+            pool.map(_put_range, [(path, start) for start in range(0, 200, 50)])
+        cache = EvalCache(path)
+        assert len(cache) == 200
+        assert all(cache.get(EvalCache.key(np.full(4, i)))[0] == i for i in range(200))
+
+class Tripod:
+    """A tripod gait whose swing amplitude is the first gene of a genome"""
+    def __init__(self, x):
+        self.amplitude = 0.5 * x[0]
+
+    def joint_angles(self, t):
+        phases = 2 * np.pi * t + np.array([0, np.pi] * 3)
+        lift = np.maximum(0.3 * np.sin(phases), 0.0)
+        return np.stack([self.amplitude * np.cos(phases), lift, -lift], axis=1).ravel()
+
+def evaluate_tripod(x, duration=5, visualiser=False, collision_fatal=True, failed_legs=[], contact_sample_period=1,
+                    early_termination=[], incumbent_fitness=None, return_info=False, physics_rate=240, control_period=1):
+    """Rollout of a Tripod on the selected simulator (no controller of the hexapod package needed)"""
+    import controller_tools
+    evaluate_tripod.calls += 1
+    simulator = controller_tools.SIMULATOR_CACHE.get(Tripod(x), collision_fatal=collision_fatal, failed_legs=failed_legs)
+    contacts = controller_tools.ContactCounter(sample_period=contact_sample_period)
+    for _ in range(int(physics_rate * duration) - 1):
+        simulator.step()
+        contacts.record(simulator)
+    fitness = simulator.base_pos()[0]
+    controller_tools.SIMULATOR_CACHE.release(simulator)
+    return fitness, contacts.descriptor()
+
+def test_evaluator_uses_cache():
+    import controller_tools
+    evaluate = controller_tools._cached_evaluation("TRIPOD")(evaluate_tripod)
+    evaluate_tripod.calls = 0
+    with tempfile.TemporaryDirectory() as directory:
+        controller_tools.use_eval_cache(EvalCache(os.path.join(directory, "cache.sqlite")))
+        # no physics needed to check the caching
+        controller_tools.use_simulator("kinematic")
+        try:
+            x = np.random.rand(156)
+            first = evaluate(x, collision_fatal=False, failed_legs=[1])
+            second = evaluate(x, collision_fatal=False, failed_legs=[1])
+            other = evaluate(x, collision_fatal=False, failed_legs=[2])
+            assert controller_tools.EVAL_CACHE.hits == 1 and controller_tools.EVAL_CACHE.misses == 2
+            assert evaluate_tripod.calls == 2
+            assert first[0] == second[0] and np.array_equal(first[1], second[1])
+            # the results of another simulator are kept apart
+            controller_tools.use_simulator("pybullet")
+            key = EvalCache.key(x, controller="TRIPOD", failed_legs=[1], duration=5, collision_fatal=False, contact_sample_period=1)
+            assert controller_tools.EVAL_CACHE.get(key) is None
+        finally:
+            controller_tools.use_simulator("pybullet")
+            controller_tools.use_eval_cache(None)
+
+if __name__ == "__main__":
+    test_key()
+    test_hits_misses_and_eviction()
+    test_inserts_do_not_count_entries()
+    test_concurrent_writers()
+    test_evaluator_uses_cache()
+    print("evaluation cache ok")
@@ -0,0 +1,90 @@
+"""Checks the kinematic simulator (kinematic_simulator.py): contacts, body progress, failed legs,
+collisions, and its use by the simulator cache of controller_tools
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_kinematic_simulator.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import numpy as np
+import controller_tools
+import kinematic_simulator
+
+STEPS = 1199
+
+class Tripod:
+    """A tripod gait: legs 1, 3, 5 half a cycle from legs 2, 4, 6, each foot lifted while it swings forwards"""
+    def joint_angles(self, t):
+        phases = 2 * np.pi * t + np.array([0, np.pi] * 3)
+        lift = np.maximum(-0.3 * np.sin(phases), 0.0)
+        return np.stack([0.3 * np.cos(phases), lift, -lift], axis=1).ravel()
+
+def run(simulator, steps=STEPS):
+    """Steps the simulator, returns the distance along x and the fraction of steps each foot touched the ground"""
+    contacts = np.zeros(6)
+    for _ in range(steps):
+        simulator.step()
+        contacts += simulator.supporting_legs()
+    return simulator.base_pos()[0], contacts / steps
+
+class SwingController:
+    """Swings leg 1 (front left) backwards and leg 2 (middle left) forwards, until they cross"""
+    def joint_angles(self, t):
+        angles = np.zeros(18)
+        angles[0], angles[3] = -np.pi/3 * min(t, 1.0), np.pi/3 * min(t, 1.0)
+        return angles
+
+def test_Tripod():
+    distance, contacts = run(kinematic_simulator.Simulator(Tripod()))
+    assert distance > 0.3
+    assert np.all((contacts > 0.5) & (contacts < 0.7))
+    failed_distance, failed_contacts = run(kinematic_simulator.Simulator(Tripod(), failed_legs=[1, 4]))
+    assert 0 < failed_distance < distance
+    assert failed_contacts[0] == failed_contacts[3] == 0
+
+def test_collisions():
+    simulator = kinematic_simulator.Simulator(SwingController(), collision_fatal=True)
+    try:
+        run(simulator)
+        assert False, "the legs collided"
+    except RuntimeError:
+        assert simulator.t < 1.0
+    run(kinematic_simulator.Simulator(SwingController(), collision_fatal=False))
+    # a failed leg collides with nothing
+    run(kinematic_simulator.Simulator(SwingController(), collision_fatal=True, failed_legs=[2]))
+
+def test_simulator_cache():
+    controller_tools.use_simulator("kinematic")
+    try:
+        assert os.environ["HEXAPOD_SIMULATOR"] == "kinematic"
+        cache = controller_tools.SimulatorCache()
+        simulator = cache.get(Tripod(), failed_legs=[2])
+        first = run(simulator, 500)
+        cache.release(simulator)
+        # restored to its initial state, with the failed legs of the new evaluation
+        simulator = cache.get(Tripod(), failed_legs=[3])
+        assert simulator is cache.simulator and simulator.t == 0.0
+        assert run(simulator, 500)[1][2] == 0
+        cache.release(simulator)
+        simulator = cache.get(Tripod(), failed_legs=[2], physics_rate=120)
+        assert simulator.dt == 1.0/120
+        simulator = cache.get(Tripod(), failed_legs=[2])
+        second = run(simulator, 500)
+        assert first[0] == second[0] and np.array_equal(first[1], second[1])
+        try:
+            controller_tools.use_simulator("mujoco")
+            assert False, "not a simulator"
+        except Exception as error:
+            assert "Invalid simulator" in str(error)
+    finally:
+        controller_tools.use_simulator("pybullet")
+
+if __name__ == "__main__":
+    test_Tripod()
+    test_collisions()
+    test_simulator_cache()
+    print("kinematic simulator ok")
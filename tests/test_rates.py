@@ -0,0 +1,65 @@
+"""Checks the control rate (HeldController), the early termination checks at other physics rates
+and the evaluation rates of the experiment engine
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_rates.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import numpy as np
+import controller_tools
+from experiments import engine
+
+class CountingController:
+    def __init__(self):
+        self.queries = []
+
+    def joint_angles(self, t):
+        self.queries.append(t)
+        return np.full(18, t)
+
+def test_held_controller():
+    physics_rate, control_period, steps = 240, 4, 1199
+    controller = CountingController()
+    held = controller_tools._rate_controller(controller, physics_rate, control_period)
+    t = 0.0
+    for k in range(steps):
+        # the simulator accumulates its time step by step
+        angles = held.joint_angles(t)
+        assert np.allclose(angles, (k // control_period) * control_period / physics_rate)
+        t += 1.0 / physics_rate
+    assert len(controller.queries) == -(-steps // control_period)
+    assert controller_tools._rate_controller(controller, physics_rate, 1) is controller
+
+def test_check_period():
+    assert controller_tools._check_period(controller_tools.PHYSICS_RATE) == controller_tools.EARLY_TERMINATION_CHECK_PERIOD
+    # same simulated time between two checks
+    assert controller_tools._check_period(120) == controller_tools.EARLY_TERMINATION_CHECK_PERIOD // 2
+    assert controller_tools._check_period(1) == 1
+
+def test_engine_rates():
+    assert engine.evaluation_rates() == {}
+    rates = engine.evaluation_rates(physics_rate=120, contact_sample_period=2)
+    assert rates == {"physics_rate": 120, "contact_sample_period": 2}
+    assert engine.output_folder("mboa", "CPG", 20) == os.path.join(engine.OUTPUT, "CPG", "20k")
+    assert engine.output_folder("mboa", "CPG", 20, rates) == os.path.join(engine.OUTPUT, "CPG", "20k", "contact_sample_period_2_physics_rate_120")
+    tasks = engine.expand_grid("mboa", "CPG", 20, 2, [1], rates=rates)
+    assert all(t.rates == rates for t in tasks)
+    # the journal keys do not depend on the rates (every setting has a journal of its own)
+    assert [engine.task_key(t) for t in tasks] == [engine.task_key(t) for t in engine.expand_grid("mboa", "CPG", 20, 2, [1])]
+    # MBOA runs with batches of several controllers are neither skipped as done nor overwritten
+    batched = engine.expand_grid("mboa", "CPG", 20, 2, [1], 4, rates)
+    assert not set(engine.task_key(t) for t in batched) & set(engine.task_key(t) for t in tasks)
+    assert engine.output_folder("mboa", "CPG", 20, rates, 4) == os.path.join(engine.OUTPUT, "CPG", "20k",
+        "batch_size_4_contact_sample_period_2_physics_rate_120")
+    assert engine.output_folder("neat", "CPG", 20, {}, 4) == engine.output_folder("neat", "CPG", 20)
+
+if __name__ == "__main__":
+    test_held_controller()
+    test_check_period()
+    test_engine_rates()
+    print("rates ok")
@@ -0,0 +1,52 @@
+"""Checks the multi-fidelity screening of CVT MAP-Elites (screen_function): the share of screened
+offspring promoted to the full evaluation, whatever the margin
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_screening.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import tempfile
+import numpy as np
+from pymap_elites import common as cm
+from pymap_elites import cvt
+
+def fitness(x):
+    return float(-np.sum((x - 0.5) ** 2)), x[:2].copy()
+
+def screen(x):
+    return float(-np.sum((x[:5] - 0.5) ** 2)), x[:2].copy()
+
+def run(screen_margin, asynchronous=False):
+    """Evolves a small map with screening, returns the screened and promoted counts of its log"""
+    np.random.seed(0)
+    params = {**cm.default_params, "cvt_samples": 2000, "batch_size": 50, "random_init_batch": 50, "dump_period": -1,
+        "parallel": False, "executor": "serial", "screen_margin": screen_margin, "asynchronous": asynchronous, "async_in_flight": 10}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            with open("log.dat", "w") as log:
+                cvt.compute(2, 10, fitness, n_niches=50, max_evals=600, params=params, log_file=log, screen_function=screen)
+            with open("log.dat") as log:
+                last = log.readlines()[-1].split()
+        finally:
+            os.chdir(cwd)
+    return int(last[-2]), int(last[-1])
+
+def test_min_promoted():
+    share = cm.default_params['screen_min_promoted']
+    # nothing ever comes within the margin: the run still ends, promoting the minimum share
+    for asynchronous in [False, True]:
+        screened, promoted = run(-100.0, asynchronous)
+        assert promoted >= share * screened and promoted <= share * screened + 50
+    screened, promoted = run(0.1)
+    assert promoted > share * screened
+
+if __name__ == "__main__":
+    test_min_promoted()
+    print("screening ok")
@@ -0,0 +1,70 @@
+"""Checks that a rollout on the per-process simulator of controller_tools.SimulatorCache is the same
+as on a freshly built Simulator, across evaluations with different damage scenarios set up on the
+same world
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_simulator_cache.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import numpy as np
+import pytest
+import controller_tools
+
+# damage scenarios evaluated one after the other by the same worker process
+SCENARIOS = [([1, 4], False), ([4, 1], False), ([2], False), ([2], True), ([1, 4], False)]
+STEPS = 600
+
+class Tripod:
+    """A tripod gait: legs 1, 3, 5 half a cycle from legs 2, 4, 6, each foot lifted while it swings forwards"""
+    def joint_angles(self, t):
+        phases = 2 * np.pi * t + np.array([0, np.pi] * 3)
+        lift = np.maximum(0.3 * np.sin(phases), 0.0)
+        return np.stack([0.3 * np.cos(phases), lift, -lift], axis=1).ravel()
+
+def rollout(simulator):
+    """Distance along x and number of steps each foot touched the ground"""
+    contacts = np.zeros(6)
+    for _ in range(STEPS):
+        simulator.step()
+        contacts += simulator.supporting_legs()
+    return simulator.base_pos()[0], contacts
+
+def check_scenarios(make_controller, atol=0.0):
+    Simulator = controller_tools.simulator_class()
+    cache = controller_tools.SimulatorCache()
+    first = None
+    for failed_legs, collision_fatal in SCENARIOS:
+        simulator = cache.get(make_controller(), collision_fatal=collision_fatal, failed_legs=failed_legs)
+        # every damage scenario is set up on the same world, without reconnecting
+        first = simulator if first is None else first
+        assert simulator is first and simulator.client is first.client
+        cached = rollout(simulator)
+        cache.release(simulator)
+        fresh_simulator = Simulator(make_controller(), collision_fatal=collision_fatal, failed_legs=failed_legs)
+        fresh = rollout(fresh_simulator)
+        fresh_simulator.terminate()
+        assert abs(cached[0] - fresh[0]) <= atol and np.allclose(cached[1], fresh[1], atol=atol)
+    cache.clear()
+
+def test_kinematic_scenarios():
+    controller_tools.use_simulator("kinematic")
+    try:
+        check_scenarios(Tripod)
+    finally:
+        controller_tools.use_simulator("pybullet")
+
+def test_pybullet_scenarios():
+    pytest.importorskip("hexapod.simulator")
+    from hexapod.controllers.reference_controller import Controller, tripod_gait
+    controller_tools.use_simulator("pybullet")
+    check_scenarios(lambda: Controller(tripod_gait, body_height=0.14, velocity=0.3, crab_angle=-np.pi/6), atol=1e-4)
+
+if __name__ == "__main__":
+    test_kinematic_scenarios()
+    test_pybullet_scenarios()
+    print("simulator cache ok")
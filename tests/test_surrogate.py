@@ -0,0 +1,87 @@
+"""Checks the surrogate model of surrogate-assisted MAP-Elites (pymap_elites/surrogate.py), its
+background fitting and the selection of the offspring it scores
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_surrogate.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import time
+import numpy as np
+from pymap_elites import cvt
+from pymap_elites.archive import Archive
+from pymap_elites.niche_index import make_niche_index
+from pymap_elites.surrogate import Surrogate
+
+DIM_X = 20
+
+def evaluate(x):
+    """Smooth fitness and a descriptor made of the first two genes"""
+    return np.sin(2 * x[:, 2]) + x[:, 3] - x[:, 4] ** 2, x[:, :2].copy()
+
+def test_predictions():
+    rng = np.random.RandomState(0)
+    surrogate = Surrogate(DIM_X, 2, min_samples=200, background=False, seed=0)
+    x = rng.rand(100, DIM_X)
+    surrogate.add(x, *evaluate(x))
+    assert surrogate.predict(x) is None and surrogate.n_fits == 0
+    for _ in range(5):
+        x = rng.rand(400, DIM_X)
+        surrogate.add(x, *evaluate(x))
+    test = rng.rand(500, DIM_X)
+    mean, std, uncertainty = surrogate.predict(test)
+    fitness, desc = evaluate(test)
+    assert mean.shape == std.shape == (500, 3) and uncertainty.shape == (500,)
+    assert np.corrcoef(mean[:, 0], fitness)[0, 1] > 0.9
+    assert np.abs(mean[:, 1:] - desc).mean() < 0.05
+    # genomes far from the evaluations are more uncertain
+    assert surrogate.predict(test + 2.0)[2].mean() > 2 * uncertainty.mean()
+    counts = surrogate.counts()
+    assert counts['scored'] == 1000 and 0 < counts['error'] < fitness.std()
+    assert np.isnan(surrogate.counts()['error'])
+
+def test_background_fit():
+    rng = np.random.RandomState(1)
+    surrogate = Surrogate(DIM_X, 2, min_samples=100, max_samples=300)
+    try:
+        for _ in range(4):
+            x = rng.rand(200, DIM_X)
+            surrogate.add(x, *evaluate(x))
+        assert surrogate.n_samples == 800
+        deadline = time.time() + 30
+        while surrogate.predict(x) is None and time.time() < deadline:
+            time.sleep(0.01)
+        assert surrogate.n_fits > 0
+    finally:
+        surrogate.close()
+    assert not surrogate.thread.is_alive()
+
+def test_selection():
+    rng = np.random.RandomState(2)
+    centroids = rng.rand(50, 2)
+    archive, index = Archive(centroids, DIM_X), make_niche_index(centroids, "brute")
+    x = rng.rand(2000, DIM_X)
+    fitness, desc = evaluate(x)
+    archive.add_batch(index.query(desc), x, desc, fitness)
+    surrogate = Surrogate(DIM_X, 2, min_samples=100, background=False, seed=0)
+    surrogate.add(x, fitness, desc)
+    candidates = [(z, None) for z in rng.rand(400, DIM_X)]
+    params = {"surrogate_explore": 0.25}
+    select = getattr(cvt, "__surrogate_select")
+    chosen = select(candidates, 40, surrogate, archive, index, params)
+    assert len(chosen) == 40 and len({id(t) for t in chosen}) == 40
+    # the exploiting share improves on the elites more than the candidates do on average
+    gain = lambda tasks: np.mean([evaluate(t[0][None])[0][0] - archive.fitness[index.query(evaluate(t[0][None])[1])[0]] for t in tasks])
+    assert gain(chosen[:30]) > gain(candidates)
+    # without a fitted surrogate the first candidates are kept
+    assert select(candidates, 40, Surrogate(DIM_X, 2, background=False), archive, index, params) == candidates[:40]
+
+if __name__ == "__main__":
+    test_predictions()
+    test_background_fit()
+    test_selection()
+    print("surrogate ok")
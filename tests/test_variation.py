@@ -0,0 +1,156 @@
+"""Checks the vectorized variation operators of pymap_elites/common.py against the original scalar ones
+
+Run from the highest level in the directory tree:
+```bash
+python3 tests/test_variation.py
+```
+"""
+import sys
+import os
+sys.path.append(os.path.abspath("."))
+
+import math
+import numpy as np
+from pymap_elites import common as cm
+
+# the operators as they were before the batch versions, applied to one pair of parents at a time
+
+def polynomial_mutation(x):
+    """Cf Deb 2001, p 124 ; param: eta_m
+    """
+    y = x.copy()
+    eta_m = 5.0
+    r = np.random.random(size=len(x))
+    for i in range(0, len(x)):
+        if r[i] < 0.5:
+            delta_i = math.pow(2.0 * r[i], 1.0 / (eta_m + 1.0)) - 1.0
+        else:
+            delta_i = 1 - math.pow(2.0 * (1.0 - r[i]), 1.0 / (eta_m + 1.0))
+        y[i] = delta_i
+    return y
+
+def sbx(x, y, params, eta=10.0):
+    """SBX (cf Deb 2001, p 113) Simulated Binary Crossover
+    """
+    xl = params['min']
+    xu = params['max']
+    z = x.copy()
+    r1 = np.random.random(size=len(x))
+    r2 = np.random.random(size=len(x))
+
+    for i in range(0, len(x)):
+        if abs(x[i] - y[i]) > 1e-15:
+            x1 = min(x[i], y[i])
+            x2 = max(x[i], y[i])
+
+            beta = 1.0 + (2.0 * (x1 - xl) / (x2 - x1))
+            alpha = 2.0 - beta ** -(eta + 1)
+            rand = r1[i]
+            if rand <= 1.0 / alpha:
+                beta_q = (rand * alpha) ** (1.0 / (eta + 1))
+            else:
+                beta_q = (1.0 / (2.0 - rand * alpha)) ** (1.0 / (eta + 1))
+
+            c1 = 0.5 * (x1 + x2 - beta_q * (x2 - x1))
+
+            beta = 1.0 + (2.0 * (xu - x2) / (x2 - x1))
+            alpha = 2.0 - beta ** -(eta + 1)
+            if rand <= 1.0 / alpha:
+                beta_q = (rand * alpha) ** (1.0 / (eta + 1))
+            else:
+                beta_q = (1.0 / (2.0 - rand * alpha)) ** (1.0 / (eta + 1))
+            c2 = 0.5 * (x1 + x2 + beta_q * (x2 - x1))
+
+            c1 = min(max(c1, xl), xu)
+            c2 = min(max(c2, xl), xu)
+
+            if r2[i] <= 0.5:
+                z[i] = c2
+            else:
+                z[i] = c1
+    return z
+
+def iso_dd(x, y, params):
+    """Iso+Line
+    """
+    assert(x.shape == y.shape)
+    p_max = np.array(params["max"])
+    p_min = np.array(params["min"])
+    a = np.random.normal(0, params['iso_sigma'], size=len(x))
+    b = np.random.normal(0, params['line_sigma'])
+    z = x.copy() + a + b * (x - y)
+    return np.clip(z, p_min, p_max)
+
+def parents(n=2000, dim_x=6, seed=0):
+    """Pairs of parents, some of them on the bounds or with equal genes"""
+    rng = np.random.RandomState(seed)
+    x, y = rng.rand(n, dim_x), rng.rand(n, dim_x)
+    x[:, 0], y[:, 0] = 0.0, 1.0
+    y[:, 1] = x[:, 1]
+    x[:, 2] = 1e-3
+    return x, y
+
+def scalar_offspring(operator, x, y, seed, *args):
+    np.random.seed(seed)
+    return np.array([operator(x[i], y[i], *args) for i in range(x.shape[0])])
+
+def test_same_offspring_for_the_same_seed():
+    x, y = parents()
+    for params in [cm.default_params, {**cm.default_params, "iso_sigma": 0.3, "line_sigma": 0.5, "sbx_eta": 2.0}]:
+        for batch, scalar in [(cm.sbx_batch, lambda a, b: sbx(a, b, params, params['sbx_eta'])), (cm.iso_dd_batch, lambda a, b: iso_dd(a, b, params))]:
+            expected = scalar_offspring(scalar, x, y, 1)
+            np.random.seed(1)
+            offspring = batch(x, y, params)
+            assert np.allclose(offspring, expected, rtol=0, atol=1e-12)
+            # the scalar wrappers draw the same numbers as the batch versions
+            operator = {cm.sbx_batch: cm.sbx, cm.iso_dd_batch: cm.iso_dd}[batch]
+            assert np.allclose(scalar_offspring(operator, x, y, 1, params), expected, rtol=0, atol=1e-12)
+    # the batch mutation is the original delta, scaled to the bounds and added to the parent
+    expected = scalar_offspring(lambda a, b: polynomial_mutation(a), x, y, 2)
+    np.random.seed(2)
+    assert np.allclose(cm.polynomial_mutation_batch(x), np.clip(x + expected, 0, 1), rtol=0, atol=1e-12)
+
+def test_moments_and_bounds():
+    x, y = parents(n=20000)
+    params = {**cm.default_params, "iso_sigma": 0.1, "line_sigma": 0.5}
+    for batch, scalar in [(cm.sbx_batch, lambda a, b: sbx(a, b, params)), (cm.iso_dd_batch, lambda a, b: iso_dd(a, b, params))]:
+        # independent draws: the offspring distributions agree
+        expected = scalar_offspring(scalar, x, y, 3)
+        np.random.seed(4)
+        offspring = batch(x, y, params)
+        assert np.allclose(offspring.mean(axis=0), expected.mean(axis=0), atol=0.01)
+        assert np.allclose(offspring.std(axis=0), expected.std(axis=0), atol=0.01)
+        # clipped to the bounds, and as often on them as the original
+        assert offspring.min() >= params['min'] and offspring.max() <= params['max']
+        on_bounds = lambda z: np.mean((z == params['min']) | (z == params['max']), axis=0)
+        assert np.allclose(on_bounds(offspring), on_bounds(expected), atol=0.01)
+    # genes equal in both parents are not crossed
+    np.random.seed(5)
+    assert np.array_equal(cm.sbx_batch(x, y, params)[:, 1], x[:, 1])
+
+def test_params_are_honoured():
+    x, y = parents(n=20000)
+    spread = []
+    for eta in [2.0, 10.0, 50.0]:
+        np.random.seed(6)
+        offspring = cm.sbx_batch(x, y, {**cm.default_params, "sbx_eta": eta})
+        spread.append(np.mean(np.minimum(np.abs(offspring - x), np.abs(offspring - y))[:, 3:]))
+    # a larger eta keeps the offspring closer to their parents
+    assert spread[0] > spread[1] > spread[2]
+    x, y = x[:, 3:] * 0.5 + 0.25, y[:, 3:] * 0.5 + 0.25
+    # no isotropic part: the offspring lie on the line through their parents, at line_sigma times their distance
+    np.random.seed(7)
+    offspring = cm.iso_dd_batch(x, y, {**cm.default_params, "iso_sigma": 0.0, "line_sigma": 0.1})
+    b = np.sum((offspring - x) * (x - y), axis=1) / np.sum((x - y) ** 2, axis=1)
+    assert np.allclose(offspring, x + b[:, None] * (x - y))
+    assert abs(np.std(b) - 0.1) < 0.005
+    # no line part: an isotropic gaussian of iso_sigma around the first parent
+    np.random.seed(8)
+    offspring = cm.iso_dd_batch(x, y, {**cm.default_params, "iso_sigma": 0.02, "line_sigma": 0.0})
+    assert abs(np.std(offspring - x) - 0.02) < 0.001 and abs(np.mean(offspring - x)) < 0.001
+
+if __name__ == "__main__":
+    test_same_offspring_for_the_same_seed()
+    test_moments_and_bounds()
+    test_params_are_honoured()
+    print("variation operators ok")